@@ -0,0 +1,75 @@
+import argparse
+import os
+
+import uvicorn
+from sqlalchemy.engine import make_url
+
+from app.config import settings
+
+# Production server.
+#
+#   python -m app [--workers N] [--host 0.0.0.0] [--port 8000]
+#
+# Runs WEB_CONCURRENCY uvicorn worker processes on one listening socket;
+# the supervisor restarts a worker that dies. Workers are spawned, not
+# forked, so each imports the app and opens its own engine pools. uvloop
+# and httptools are used when installed. On SIGTERM / SIGINT each worker
+# stops accepting, drains its in-flight requests (for up to
+# GRACEFUL_TIMEOUT seconds), then runs the shutdown hooks.
+#
+# The schema is checked once here before the workers start, so they do
+# not race each other's CREATE TABLEs on a fresh database and each one
+# finds the stored schema version current.
+
+def _shared_memory_database() -> bool:
+    url = make_url(settings.DATABASE_URL)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+def prepare_schema():
+    import app.main  # noqa: F401 — registers every model on the metadata
+    from app.database import engine
+    from app.utils import migrations
+
+    try:
+        migrations.ensure_schema()
+    except Exception as e:
+        print(f"⚠️ Schema check failed, workers will retry it: {e}")
+    engine.dispose()
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the API under uvicorn worker processes")
+    parser.add_argument("--host", default=settings.HOST)
+    parser.add_argument("--port", type=int, default=settings.PORT)
+    parser.add_argument("--workers", type=int, default=settings.WEB_CONCURRENCY)
+    parser.add_argument("--reload", action="store_true", help="development: one worker, restart on code changes")
+    args = parser.parse_args()
+
+    workers = max(1, args.workers)
+    if workers > 1 and _shared_memory_database():
+        print("⚠️ In-memory SQLite cannot be shared between workers, running 1 worker")
+        workers = 1
+    # every worker has its own bcrypt pool: split the cores between them
+    if workers > 1 and "HASH_POOL_WORKERS" not in os.environ:
+        os.environ["HASH_POOL_WORKERS"] = str(max(1, (os.cpu_count() or 1) // workers))
+
+    if workers > 1 and not args.reload:
+        prepare_schema()
+
+    print(f"✓ Starting {1 if args.reload else workers} worker(s) on {args.host}:{args.port}")
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=None if args.reload else workers,
+        reload=args.reload,
+        loop="auto",
+        http="auto",
+        backlog=settings.BACKLOG,
+        timeout_keep_alive=settings.KEEPALIVE_TIMEOUT,
+        timeout_graceful_shutdown=settings.GRACEFUL_TIMEOUT,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+    )
+
+if __name__ == "__main__":
+    main()
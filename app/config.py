@@ -0,0 +1,144 @@
+import os
+from typing import Mapping, Optional
+
+from dotenv import load_dotenv
+
+# Application settings.
+#
+# The environment (and .env) is read once, here; modules bind the values
+# they use at import, e.g. `DB_POOL_SIZE = settings.DB_POOL_SIZE`.
+# Attribute names are the environment variable names. A plain class rather
+# than pydantic-settings: this module is on every worker's cold-start path.
+
+load_dotenv()
+
+TRUE_VALUES = ("1", "true", "yes")
+
+class Settings:
+    """Every setting the app reads from the environment"""
+
+    def __init__(self, environ: Mapping[str, str] = os.environ):
+        self._environ = environ
+
+        # Application
+        self.ENVIRONMENT = self._str("ENVIRONMENT", "development")
+
+        # Server (python -m app)
+        self.HOST = self._str("HOST", "0.0.0.0")
+        self.PORT = self._int("PORT", 8000)
+        self.WEB_CONCURRENCY = self._int("WEB_CONCURRENCY", os.cpu_count() or 1)
+        self.KEEPALIVE_TIMEOUT = self._int("KEEPALIVE_TIMEOUT", 5)
+        self.BACKLOG = self._int("BACKLOG", 2048)
+        self.GRACEFUL_TIMEOUT = self._int("GRACEFUL_TIMEOUT", 30)
+        self.FORWARDED_ALLOW_IPS = self._str("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+        # Security
+        self.SECRET_KEY = self._str("SECRET_KEY", "change-me-in-production")
+        self.ALGORITHM = self._str("ALGORITHM", "HS256")
+        self.ACCESS_TOKEN_EXPIRE_MINUTES = self._int("ACCESS_TOKEN_EXPIRE_MINUTES", 60)
+        self.BCRYPT_ROUNDS = self._int("BCRYPT_ROUNDS", 12)
+        self.HASH_POOL_WORKERS = self._int("HASH_POOL_WORKERS", os.cpu_count() or 1)
+        self.HASH_POOL_MAX_QUEUE = self._int("HASH_POOL_MAX_QUEUE", 64)
+        self.HASH_POOL_RETRY_AFTER = self._int("HASH_POOL_RETRY_AFTER", 2)
+        self.TOKEN_CACHE_SIZE = self._int("TOKEN_CACHE_SIZE", 10000)
+
+        # Database
+        self.DATABASE_URL = self._str("DATABASE_URL", "sqlite:///./healthapp.db")
+        self.ASYNC_DATABASE_URL = self._str("ASYNC_DATABASE_URL")
+        self.READ_DATABASE_URL = self._str("READ_DATABASE_URL")
+        self.DB_POOL_SIZE = self._int("DB_POOL_SIZE", 5)
+        self.DB_MAX_OVERFLOW = self._int("DB_MAX_OVERFLOW", 10)
+        self.DB_POOL_TIMEOUT = self._float("DB_POOL_TIMEOUT", 30)
+        self.DB_POOL_RECYCLE = self._int("DB_POOL_RECYCLE", 3600)
+        self.DB_POOL_PRE_PING = self._bool("DB_POOL_PRE_PING", False)
+        self.SQLITE_JOURNAL_MODE = self._str("SQLITE_JOURNAL_MODE", "WAL")
+        self.SQLITE_SYNCHRONOUS = self._str("SQLITE_SYNCHRONOUS", "NORMAL")
+        self.SQLITE_MMAP_SIZE = self._int("SQLITE_MMAP_SIZE", 256 * 1024 * 1024)
+        self.SQLITE_CACHE_SIZE = self._int("SQLITE_CACHE_SIZE", -65536)
+        self.SQLITE_BUSY_TIMEOUT_MS = self._int("SQLITE_BUSY_TIMEOUT_MS", 10000)
+
+        # Schema
+        self.MIGRATE_ON_STARTUP = self._bool("MIGRATE_ON_STARTUP", True)
+        self.SCHEMA_CHECK = self._str("SCHEMA_CHECK", "auto").lower()
+
+        # Observability
+        self.METRICS_ENABLED = self._bool("METRICS_ENABLED", True)
+        self.DB_PROFILE = self._bool("DB_PROFILE", False)
+        self.DB_SLOW_QUERY_MS = self._float("DB_SLOW_QUERY_MS", 100)
+        self.DB_REPEAT_THRESHOLD = self._int("DB_REPEAT_THRESHOLD", 3)
+        self.DB_PROFILE_KEEP = self._int("DB_PROFILE_KEEP", 100)
+
+        # Response cache
+        self.RESPONSE_CACHE_BACKEND = self._str("RESPONSE_CACHE_BACKEND", "memory").lower()
+        self.RESPONSE_CACHE_SIZE = self._int("RESPONSE_CACHE_SIZE", 4096)
+        self.REDIS_URL = self._str("REDIS_URL", "redis://localhost:6379/0")
+        self.RESPONSE_CACHE_TTLS = self._str("RESPONSE_CACHE_TTLS", "")
+        self.FAST_JSON_ROUTERS = self._str("FAST_JSON_ROUTERS", "patients,cases,invoices")
+
+        # Response compression
+        self.COMPRESSION_ENABLED = self._bool("COMPRESSION_ENABLED", True)
+        self.COMPRESSION_MIN_SIZE = self._int("COMPRESSION_MIN_SIZE", 1024)
+        self.COMPRESSION_ENCODINGS = self._str("COMPRESSION_ENCODINGS", "zstd,br,gzip")
+        self.COMPRESSION_GZIP_LEVEL = self._int("COMPRESSION_GZIP_LEVEL", 6)
+        self.COMPRESSION_BROTLI_QUALITY = self._int("COMPRESSION_BROTLI_QUALITY", 4)
+        self.COMPRESSION_ZSTD_LEVEL = self._int("COMPRESSION_ZSTD_LEVEL", 3)
+
+        # Rate limiting and admission control
+        self.RATE_LIMIT_BACKEND = self._str("RATE_LIMIT_BACKEND", "memory").lower()
+        self.RATE_LIMIT_USER = self._str("RATE_LIMIT_USER", "20/s:40")
+        self.RATE_LIMIT_ANONYMOUS = self._str("RATE_LIMIT_ANONYMOUS", "10/s:20")
+        self.RATE_LIMIT_ROUTES = self._str(
+            "RATE_LIMIT_ROUTES", "POST /api/auth/login=30/m:20,POST /api/auth/register=10/m:10",
+        )
+        self.RATE_LIMIT_MAX_KEYS = self._int("RATE_LIMIT_MAX_KEYS", 100_000)
+        self.ADMISSION_MAX_IN_FLIGHT = self._int("ADMISSION_MAX_IN_FLIGHT", 0)  # 0: 4x the DB pool
+        self.ADMISSION_QUEUE = self._int("ADMISSION_QUEUE", 256)
+        self.ADMISSION_QUEUE_TIMEOUT = self._float("ADMISSION_QUEUE_TIMEOUT", 10)
+        self.ADMISSION_RETRY_AFTER = self._int("ADMISSION_RETRY_AFTER", 1)
+
+        # Background jobs
+        self.JOB_WORKER_ENABLED = self._bool("JOB_WORKER_ENABLED", True)
+        self.JOB_CONCURRENCY = self._int("JOB_CONCURRENCY", 4)
+        self.JOB_TYPE_CONCURRENCY = self._str("JOB_TYPE_CONCURRENCY", "")
+        self.JOB_POLL_SECONDS = self._float("JOB_POLL_SECONDS", 1)
+        self.JOB_LEASE_SECONDS = self._int("JOB_LEASE_SECONDS", 900)  # longer than any job's timeout
+        self.JOB_RETRY_BACKOFF_SECONDS = self._float("JOB_RETRY_BACKOFF_SECONDS", 5)
+        self.JOB_THREADS = self._int("JOB_THREADS", 2)
+        self.JOB_RETENTION_DAYS = self._int("JOB_RETENTION_DAYS", 7)
+        self.JOB_EXPORT_DIR = self._str("JOB_EXPORT_DIR", "./exports")
+
+        # Reporting snapshots
+        self.REPORT_DIR = self._str("REPORT_DIR", "./reports")
+        self.REPORT_REFRESH_SECONDS = self._int("REPORT_REFRESH_SECONDS", 300)  # 0: only on demand
+        self.REPORT_REBUILD_HOURS = self._int("REPORT_REBUILD_HOURS", 24)  # 0: never re-extract from scratch
+
+        # Features
+        self.STREAM_BATCH_SIZE = self._int("STREAM_BATCH_SIZE", 1000)
+        self.SUMMARY_RECONCILE_SECONDS = self._int("SUMMARY_RECONCILE_SECONDS", 3600)
+        self.SUMMARY_VISIT_WINDOW_DAYS = self._int("SUMMARY_VISIT_WINDOW_DAYS", 7)
+        self.IMPORT_BATCH_SIZE = self._int("IMPORT_BATCH_SIZE", 1000)
+        self.IMPORT_MAX_ERRORS = self._int("IMPORT_MAX_ERRORS", 1000)
+        self.SYNC_PULL_LIMIT = self._int("SYNC_PULL_LIMIT", 1000)
+        self.SYNC_MAX_OPS = self._int("SYNC_MAX_OPS", 2000)
+        self.SYNC_MAX_PUSH_BYTES = self._int("SYNC_MAX_PUSH_BYTES", 10 * 1024 * 1024)
+        self.SYNC_SETTLE_SECONDS = self._float("SYNC_SETTLE_SECONDS", 2)
+        self.SETTLEMENT_MAX_PAYMENTS = self._int("SETTLEMENT_MAX_PAYMENTS", 10000)
+        self.INVOICE_BATCH_MAX = self._int("INVOICE_BATCH_MAX", 10000)
+        self.PAYMENT_RETRY_AFTER = self._int("PAYMENT_RETRY_AFTER", 1)
+
+    def _str(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._environ.get(name, default)
+
+    def _int(self, name: str, default: int) -> int:
+        value = self._environ.get(name)
+        return int(value) if value not in (None, "") else default
+
+    def _float(self, name: str, default: float) -> float:
+        value = self._environ.get(name)
+        return float(value) if value not in (None, "") else float(default)
+
+    def _bool(self, name: str, default: bool) -> bool:
+        value = self._environ.get(name)
+        return value.lower() in TRUE_VALUES if value not in (None, "") else default
+
+settings = Settings()
@@ -1,24 +1,225 @@
 import os
-from typing import Generator
-from dotenv import load_dotenv
+import threading
+import time
+from typing import AsyncGenerator, Generator, Optional
+from sqlalchemy import event, exc as sa_exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.ext.asyncio import create_async_engine
 from sqlmodel import SQLModel, create_engine, Session
-
-load_dotenv()
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.config import settings
+from app.utils import query_profile
 
 # Get database URL from environment
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./healthapp.db")
-
-# Create engine with optimized settings
-engine = create_engine(
-    DATABASE_URL,
-    echo=False,
-    connect_args={
-        "check_same_thread": False,
-        "timeout": 10
-    } if "sqlite" in DATABASE_URL else {},
-    pool_pre_ping=True,
-    pool_recycle=3600,
-)
+DATABASE_URL = settings.DATABASE_URL
+
+# Async drivers for each supported backend
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgres": "postgresql+asyncpg",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    """Map a sync DATABASE_URL onto its async driver (aiosqlite / asyncpg)"""
+    parsed = make_url(url)
+    backend = parsed.drivername.split("+")[0]
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{parsed.drivername}'")
+    parsed = parsed.set(drivername=ASYNC_DRIVERS[backend])
+    # asyncpg does not understand libpq's sslmode, it takes ssl= instead
+    if "sslmode" in parsed.query:
+        query = dict(parsed.query)
+        query["ssl"] = query.pop("sslmode")
+        parsed = parsed.set(query=query)
+    return parsed.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = settings.ASYNC_DATABASE_URL or to_async_url(DATABASE_URL)
+# Optional second database (e.g. a Postgres replica) for GET handlers
+READ_DATABASE_URL = settings.READ_DATABASE_URL
+
+# Connection pool — per engine, per worker process
+DB_POOL_SIZE = settings.DB_POOL_SIZE
+DB_MAX_OVERFLOW = settings.DB_MAX_OVERFLOW
+DB_POOL_TIMEOUT = settings.DB_POOL_TIMEOUT
+DB_POOL_RECYCLE = settings.DB_POOL_RECYCLE
+# Off by default: pre-ping costs a round-trip on every checkout, and
+# pool_recycle already retires connections before server idle timeouts
+DB_POOL_PRE_PING = settings.DB_POOL_PRE_PING
+
+# SQLite connect-time PRAGMAs. WAL lets GETs read while a writer commits;
+# synchronous=NORMAL is durable across app crashes under WAL (only a power
+# loss can drop the last commits).
+SQLITE_JOURNAL_MODE = settings.SQLITE_JOURNAL_MODE
+SQLITE_SYNCHRONOUS = settings.SQLITE_SYNCHRONOUS
+SQLITE_MMAP_SIZE = settings.SQLITE_MMAP_SIZE
+SQLITE_CACHE_SIZE = settings.SQLITE_CACHE_SIZE  # negative = KiB
+SQLITE_BUSY_TIMEOUT_MS = settings.SQLITE_BUSY_TIMEOUT_MS
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def is_sqlite_memory(url: str) -> bool:
+    parsed = make_url(url)
+    return is_sqlite(url) and (parsed.database in (None, "", ":memory:") or "mode=memory" in str(parsed))
+
+class PoolStats:
+    """Checkout wait times for one engine's pool (in-use counts come from the pool itself)"""
+
+    def __init__(self):
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def snapshot(self, pool) -> dict:
+        return {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_total, 6),
+            "wait_ms_max": round(self.wait_max * 1000, 3),
+        }
+
+class _TimedPool:
+    """Mixin timing how long each checkout waits for a free connection"""
+    stats: Optional[PoolStats] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except sa_exc.TimeoutError:
+            if self.stats:
+                self.stats.observe(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.stats:
+            self.stats.observe(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        # dispose() swaps in a fresh pool; keep the counters
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+def _sqlite_pragmas(read_only: bool = False):
+    pragmas = [
+        f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}",
+        f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size = {SQLITE_CACHE_SIZE}",
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+
+    def on_connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+    return on_connect
+
+def _engine_options(url: str, pool_class, read_only: bool = False) -> dict:
+    options = {
+        "echo": False,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+        "pool_recycle": DB_POOL_RECYCLE,
+    }
+    if is_sqlite(url):
+        connect_args = {"timeout": SQLITE_BUSY_TIMEOUT_MS / 1000}
+        if make_url(url).get_driver_name() != "aiosqlite":
+            connect_args["check_same_thread"] = False
+        options["connect_args"] = connect_args
+        if is_sqlite_memory(url):
+            # one shared connection (StaticPool); a pool would mean many databases
+            return options
+    elif read_only and make_url(url).get_driver_name() == "asyncpg":
+        options["connect_args"] = {"server_settings": {"default_transaction_read_only": "on"}}
+    options.update(
+        poolclass=pool_class,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+    )
+    return options
+
+def _instrument(sync_engine, read_only: bool = False):
+    if is_sqlite(str(sync_engine.url)):
+        event.listen(sync_engine, "connect", _sqlite_pragmas(read_only))
+    if isinstance(sync_engine.pool, _TimedPool):
+        sync_engine.pool.stats = PoolStats()
+
+# Sync engine — table creation and scripts
+engine = create_engine(DATABASE_URL, **_engine_options(DATABASE_URL, TimedQueuePool))
+_instrument(engine)
+
+# Async engine used by the routers — requests wait on the DB without
+# holding a threadpool worker
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+_instrument(async_engine.sync_engine)
+
+# Read-only pool for GET handlers: readers never queue behind writers for a
+# connection, and on SQLite (WAL) they read while a write is committing
+READ_ASYNC_URL = to_async_url(READ_DATABASE_URL) if READ_DATABASE_URL else ASYNC_DATABASE_URL
+if is_sqlite_memory(READ_ASYNC_URL):
+    read_engine = async_engine
+else:
+    read_engine = create_async_engine(
+        READ_ASYNC_URL, **_engine_options(READ_ASYNC_URL, TimedAsyncQueuePool, read_only=True)
+    )
+    _instrument(read_engine.sync_engine, read_only=True)
+
+# Development query profiling (DB_PROFILE=true): time and log every
+# statement per request — see app.utils.query_profile
+if query_profile.DB_PROFILE:
+    query_profile.install()
+
+def pool_status() -> dict:
+    """Pool occupancy and checkout wait stats for /api/status and metrics"""
+    pools = {"write": async_engine.sync_engine.pool}
+    if read_engine is not async_engine:
+        pools["read"] = read_engine.sync_engine.pool
+    return {
+        name: pool.stats.snapshot(pool) if getattr(pool, "stats", None) else {"status": pool.status()}
+        for name, pool in pools.items()
+    }
+
+def _reset_pools_after_fork():
+    """A forked worker (e.g. gunicorn --preload) must not reuse the parent's
+    pooled connections: give it fresh pools, leaving the parent's open"""
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    if read_engine is not async_engine:
+        read_engine.sync_engine.dispose(close=False)
+
+# POSIX only; Windows has no fork
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+async def dispose_engines():
+    """Close every pooled async connection (shutdown)"""
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
 
 def create_db_and_tables():
     """Create all database tables — with error handling"""
@@ -37,4 +238,24 @@ def get_session() -> Generator[Session, None, None]:
             yield session
     except Exception as e:
         print(f"✗ Session error: {e}")
-        raise
\ No newline at end of file
+        raise
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get async database session"""
+    try:
+        # expire_on_commit=False: attribute access after commit must not
+        # trigger an implicit (sync) reload
+        async with AsyncSession(async_engine, expire_on_commit=False) as session:
+            yield session
+    except Exception as e:
+        print(f"✗ Session error: {e}")
+        raise
+
+async def get_read_session() -> AsyncGenerator[AsyncSession, None]:
+    """Get async session on the read-only pool (GET handlers)"""
+    try:
+        async with AsyncSession(read_engine, expire_on_commit=False) as session:
+            yield session
+    except Exception as e:
+        print(f"✗ Session error: {e}")
+        raise
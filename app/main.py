@@ -1,10 +1,15 @@
-import os
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
 
-# Database
-from app.database import create_db_and_tables
+# Settings and database
+from app.config import settings
+from app.database import dispose_engines, pool_status
+from app.utils.security import hashing_pool, token_cache
+from app.utils import cache, compression, jobs, migrations, ratelimit, reports, search, summary, sync, tenancy
+from app.utils.metrics import METRICS_ENABLED, MetricsMiddleware, render_metrics
+from app.utils import query_profile
 
 # Models (auto-register via import)
 from app.models.organization import Organization
@@ -13,12 +18,16 @@ from app.models.patients import Patient
 from app.models.cases import Case
 from app.models.visits import Visit
 from app.models.invoices import Invoice, Payment
+from app.models.dashboard import SummaryCounter
+from app.models.sync import ChangeLog, SyncReceipt
+from app.models.jobs import Job
+from app.models.schema import SchemaMigration, SchemaVersion
 
 # Routers
 from app.routers import auth, patients, cases, visits, invoices, dashboard
-
-# Load environment variables
-load_dotenv()
+from app.routers import jobs as jobs_router
+from app.routers import reports as reports_router
+from app.routers import sync as sync_router
 
 # ------------------------------------------------------
 #                  FASTAPI CONFIGURATION
@@ -29,6 +38,19 @@ app = FastAPI(
     description="A reliable and scalable healthcare management backend for Nuedebri Health."
 )
 
+# ------------------------------------------------------
+#                  TENANT SCOPING
+# ------------------------------------------------------
+# Innermost: requests carrying an org_id claim see only that clinic's rows
+app.add_middleware(tenancy.TenantMiddleware)
+
+# ------------------------------------------------------
+#              RATE LIMITING & ADMISSION
+# ------------------------------------------------------
+# Added first so it runs inside CORS: 429 / 503 answers still carry the
+# CORS headers the frontend needs to read them
+app.add_middleware(ratelimit.AdmissionMiddleware)
+
 # ------------------------------------------------------
 #                       CORS
 # ------------------------------------------------------
@@ -46,8 +68,28 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# ------------------------------------------------------
+#                    COMPRESSION
+# ------------------------------------------------------
+# Outside CORS so its headers go out on compressed responses too; inside
+# metrics so latency includes the compression time
+if compression.COMPRESSION_ENABLED:
+    app.add_middleware(compression.CompressionMiddleware)
+
+# ------------------------------------------------------
+#                       METRICS
+# ------------------------------------------------------
+# Outermost, so latency covers CORS and error handling too
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Development only: per-request query log with N+1 / slow-query flags
+if query_profile.DB_PROFILE:
+    app.add_middleware(query_profile.QueryProfileMiddleware)
+
 # ------------------------------------------------------
 #                SAFE STARTUP INITIALIZATION
 # ------------------------------------------------------
@@ -59,12 +101,77 @@ def startup_event():
     This guarantees CORS still loads and frontend can connect.
     """
     try:
-        create_db_and_tables()
-        print("✓ Database initialized successfully.")
+        if migrations.ensure_schema():
+            print("✓ Database initialized successfully.")
+        else:
+            print("✓ Database schema version current, schema checks skipped.")
     except Exception as e:
         print(f"⚠️ Database initialization failed (non-blocking): {e}")
 
 
+@app.on_event("startup")
+async def start_search_index():
+    """Creates (and on first boot backfills) the patient search index."""
+    try:
+        await search.ensure_index()
+    except Exception as e:
+        print(f"⚠️ Search index initialization failed (non-blocking): {e}")
+
+
+@app.on_event("startup")
+async def start_change_log():
+    """Seeds the sync change log from existing rows on first boot."""
+    try:
+        await sync.ensure_change_log()
+    except Exception as e:
+        print(f"⚠️ Sync change log initialization failed (non-blocking): {e}")
+
+
+@app.on_event("startup")
+async def start_summary_store():
+    """
+    Seeds the dashboard summary counters on first boot and schedules
+    their periodic full recount.
+    """
+    try:
+        await summary.ensure_counters()
+    except Exception as e:
+        print(f"⚠️ Summary store initialization failed (non-blocking): {e}")
+    if summary.SUMMARY_RECONCILE_SECONDS > 0:
+        app.state.summary_task = asyncio.create_task(summary.reconcile_periodically())
+
+
+@app.on_event("startup")
+async def start_job_worker():
+    """Starts this process's background job worker."""
+    if jobs.JOB_WORKER_ENABLED:
+        jobs.worker.start()
+
+
+@app.on_event("startup")
+async def start_report_refresh():
+    """Schedules the periodic refresh of the reporting snapshots."""
+    if reports.REPORT_REFRESH_SECONDS > 0:
+        app.state.report_task = asyncio.create_task(reports.refresh_periodically())
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close pooled async connections and hashing workers so workers exit cleanly."""
+    for name in ("summary_task", "report_task"):
+        task = getattr(app.state, name, None)
+        if task:
+            task.cancel()
+    try:
+        await jobs.worker.stop()
+    except Exception as e:
+        print(f"⚠️ Job worker shutdown failed: {e}")
+    await cache.close()
+    await ratelimit.close()
+    await dispose_engines()
+    hashing_pool.shutdown()
+
+
 # ------------------------------------------------------
 #                      ROUTERS
 # ------------------------------------------------------
@@ -74,6 +181,9 @@ app.include_router(cases.router, prefix="/api/cases", tags=["Cases"])
 app.include_router(visits.router, prefix="/api/visits", tags=["Visits"])
 app.include_router(invoices.router, prefix="/api/invoices", tags=["Invoices"])
 app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"])
+app.include_router(sync_router.router, prefix="/api/sync", tags=["Sync"])
+app.include_router(jobs_router.router, prefix="/api/jobs", tags=["Jobs"])
+app.include_router(reports_router.router, prefix="/api/reports", tags=["Reports"])
 
 
 # ------------------------------------------------------
@@ -87,7 +197,7 @@ def root():
     return {
         "message": "Nuedebri Health App Kenya — Backend Running",
         "version": "1.0.0",
-        "environment": os.getenv("ENVIRONMENT", "development"),
+        "environment": settings.ENVIRONMENT,
         "status": "online"
     }
 
@@ -97,7 +207,13 @@ def status():
     return {
         "status": "ok",
         "service": "Nuedebri Health App Kenya",
-        "environment": os.getenv("ENVIRONMENT", "development"),
+        "environment": settings.ENVIRONMENT,
+        "token_cache": token_cache.stats(),
+        "response_cache": cache.stats(),
+        "compression": compression.stats(),
+        **ratelimit.stats(),
+        "jobs": jobs.stats(),
+        "db_pool": pool_status(),
     }
 
 
@@ -106,6 +222,19 @@ def health():
     return {"status": "healthy"}
 
 
+@app.get("/metrics", tags=["System"], response_class=PlainTextResponse)
+def metrics():
+    """Prometheus scrape endpoint."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
+if query_profile.DB_PROFILE:
+    @app.get("/api/debug/queries", tags=["System"])
+    def flagged_queries():
+        """Most recent requests flagged by the query profiler."""
+        return list(query_profile.recent_reports)
+
+
 # ------------------------------------------------------
 #                 END OF MAIN APPLICATION
 # ------------------------------------------------------
@@ -0,0 +1,28 @@
+"""Indexes for the hot foreign-key query paths.
+
+create_all never touches existing tables, so databases created before
+these indexes were declared on the models only get them from here.
+"""
+from app.utils.migrations import create_index
+
+# Runs outside a transaction: Postgres builds the indexes CONCURRENTLY
+TRANSACTIONAL = False
+
+INDEXES = [
+    # unpaid invoices of one patient: patient_id = ? AND status != 'paid'
+    ("ix_invoices_patient_id_status", "invoices", ["patient_id", "status"]),
+    # visits by date (dashboard "visits today", summary recount) ...
+    ("ix_visits_visit_date", "visits", ["visit_date"]),
+    # ... and a patient's visit history, newest first
+    ("ix_visits_patient_id_visit_date", "visits", ["patient_id", "visit_date"]),
+    ("ix_visits_case_id", "visits", ["case_id"]),
+    ("ix_cases_patient_id", "cases", ["patient_id"]),
+    ("ix_vitals_visit_id", "vitals", ["visit_id"]),
+    ("ix_nurse_activity_logs_visit_id", "nurse_activity_logs", ["visit_id"]),
+    ("ix_wound_records_case_id", "wound_records", ["case_id"]),
+    ("ix_payments_invoice_id", "payments", ["invoice_id"]),
+]
+
+def upgrade(conn):
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
@@ -0,0 +1,17 @@
+"""Atomic payment posting: invoices.paid_amount and unique payment references.
+
+paid_amount is backfilled from the payments already recorded. The unique
+index fails if existing payments share a reference; resolve those rows
+first.
+"""
+from sqlalchemy import text
+
+from app.utils.migrations import add_column, create_index
+
+def upgrade(conn):
+    if add_column(conn, "invoices", "paid_amount", "FLOAT NOT NULL DEFAULT 0"):
+        conn.execute(text(
+            "UPDATE invoices SET paid_amount = COALESCE("
+            "(SELECT SUM(amount) FROM payments WHERE payments.invoice_id = invoices.id), 0)"
+        ))
+    create_index(conn, "ux_payments_reference", "payments", ["reference"], unique=True)
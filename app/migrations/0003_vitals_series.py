@@ -0,0 +1,36 @@
+"""Vitals time series: patient_id and numeric blood pressure on each reading.
+
+patient_id is backfilled from the reading's visit and systolic/diastolic
+are parsed from the existing free-text blood_pressure values.
+"""
+from sqlalchemy import text
+
+from app.utils.migrations import add_column, create_index
+from app.utils.vitals import parse_blood_pressure
+
+BATCH = 5000
+
+def upgrade(conn):
+    add_column(conn, "vitals", "patient_id", "INTEGER REFERENCES patients (id)")
+    add_column(conn, "vitals", "systolic", "INTEGER")
+    add_column(conn, "vitals", "diastolic", "INTEGER")
+    conn.execute(text(
+        "UPDATE vitals SET patient_id = (SELECT visits.patient_id FROM visits WHERE visits.id = vitals.visit_id) "
+        "WHERE patient_id IS NULL"
+    ))
+
+    last_id = 0
+    while True:
+        rows = conn.execute(text(
+            "SELECT id, blood_pressure FROM vitals "
+            "WHERE id > :last AND blood_pressure IS NOT NULL AND systolic IS NULL ORDER BY id LIMIT :n"
+        ), {"last": last_id, "n": BATCH}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+        parsed = [(row.id, *parse_blood_pressure(row.blood_pressure)) for row in rows]
+        updates = [{"id": i, "s": s, "d": d} for i, s, d in parsed if s is not None]
+        if updates:
+            conn.execute(text("UPDATE vitals SET systolic = :s, diastolic = :d WHERE id = :id"), updates)
+
+    create_index(conn, "ix_vitals_patient_id_measured_at", "vitals", ["patient_id", "measured_at"])
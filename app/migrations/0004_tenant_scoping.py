@@ -0,0 +1,52 @@
+"""Tenant scoping: org_id on users, cases, visits and jobs, and (org_id, ...) indexes.
+
+Cases, visits and invoices take their patient's organization. Users
+take the one organization of a single-clinic install, otherwise the one
+organization of every visit, case and invoice they recorded; users that
+match none (or several) keep NULL and are assigned with
+`python -m app.utils.bootstrap`. The summary counters are cleared so the
+next startup recounts them with per-tenant keys.
+"""
+from sqlalchemy import text
+
+from app.utils.migrations import add_column, create_index
+
+ORG_COLUMN = "INTEGER REFERENCES organization (id)"
+
+# the one organization of everything a user recorded, NULL if none or several
+USER_ORG = """
+SELECT MIN(work.org_id) FROM (
+    SELECT recorded_by AS user_id, org_id FROM visits
+    UNION ALL SELECT created_by, org_id FROM cases
+    UNION ALL SELECT created_by, org_id FROM invoices
+) AS work
+WHERE work.user_id = users.id AND work.org_id IS NOT NULL
+HAVING COUNT(DISTINCT work.org_id) = 1
+"""
+
+INDEXES = [
+    ("ix_users_org_id", "users", ["org_id"]),
+    ("ix_patients_org_id_created_at_id", "patients", ["org_id", "created_at", "id"]),
+    ("ix_cases_org_id_created_at_id", "cases", ["org_id", "created_at", "id"]),
+    ("ix_cases_org_id_status", "cases", ["org_id", "status"]),
+    ("ix_invoices_org_id_created_at_id", "invoices", ["org_id", "created_at", "id"]),
+    ("ix_visits_org_id_visit_date", "visits", ["org_id", "visit_date"]),
+    ("ix_jobs_org_id_id", "jobs", ["org_id", "id"]),
+]
+
+def upgrade(conn):
+    for table in ("users", "cases", "visits", "jobs"):
+        add_column(conn, table, "org_id", ORG_COLUMN)
+    for table in ("cases", "visits", "invoices"):
+        conn.execute(text(
+            f"UPDATE {table} SET org_id = (SELECT patients.org_id FROM patients WHERE patients.id = {table}.patient_id) "
+            f"WHERE org_id IS NULL"
+        ))
+    conn.execute(text(
+        "UPDATE users SET org_id = (SELECT MIN(id) FROM organization) "
+        "WHERE org_id IS NULL AND (SELECT COUNT(*) FROM organization) = 1"
+    ))
+    conn.execute(text(f"UPDATE users SET org_id = ({USER_ORG}) WHERE org_id IS NULL"))
+    for name, table, columns in INDEXES:
+        create_index(conn, name, table, columns)
+    conn.execute(text("DELETE FROM summary_counters"))
@@ -0,0 +1,10 @@
+"""User roles: seeing every clinic becomes an explicit "platform" role.
+
+Existing users keep "staff". A user with no org_id and no platform role
+gets 403 instead of unscoped access. Operators assign a clinic or grant
+the role with `python -m app.utils.bootstrap` (see there).
+"""
+from app.utils.migrations import add_column
+
+def upgrade(conn):
+    add_column(conn, "users", "role", "VARCHAR NOT NULL DEFAULT 'staff'")
@@ -0,0 +1,44 @@
+"""Sync tenancy: org_id on change_log and sync_receipts.
+
+Entries and receipts of rows that still exist take that row's
+organization (vitals through their patient, activity logs through their
+visit, wound records through their case). Entries of rows deleted before
+this migration keep NULL: they are only sent to unscoped pulls.
+"""
+from sqlalchemy import text
+
+from app.utils.migrations import add_column, create_index
+
+ORG_COLUMN = "INTEGER REFERENCES organization (id)"
+
+# change_log.table_name -> the org_id of row {row}
+ROW_ORG = {
+    "patients": "SELECT org_id FROM patients WHERE id = {row}",
+    "cases": "SELECT org_id FROM cases WHERE id = {row}",
+    "visits": "SELECT org_id FROM visits WHERE id = {row}",
+    "vitals": "SELECT patients.org_id FROM vitals JOIN patients ON patients.id = vitals.patient_id WHERE vitals.id = {row}",
+}
+# sync_receipts.entity -> the same
+RECEIPT_ORG = {
+    "visit": ROW_ORG["visits"],
+    "vitals": ROW_ORG["vitals"],
+    "activity": "SELECT visits.org_id FROM nurse_activity_logs JOIN visits ON visits.id = nurse_activity_logs.visit_id "
+                "WHERE nurse_activity_logs.id = {row}",
+    "wound": "SELECT cases.org_id FROM wound_records JOIN cases ON cases.id = wound_records.case_id "
+             "WHERE wound_records.id = {row}",
+}
+
+def upgrade(conn):
+    add_column(conn, "change_log", "org_id", ORG_COLUMN)
+    add_column(conn, "sync_receipts", "org_id", ORG_COLUMN)
+    for table, sql in ROW_ORG.items():
+        conn.execute(text(
+            f"UPDATE change_log SET org_id = ({sql.format(row='change_log.row_id')}) "
+            f"WHERE table_name = :table AND org_id IS NULL"
+        ), {"table": table})
+    for entity, sql in RECEIPT_ORG.items():
+        conn.execute(text(
+            f"UPDATE sync_receipts SET org_id = ({sql.format(row='sync_receipts.row_id')}) "
+            f"WHERE entity = :entity AND org_id IS NULL"
+        ), {"entity": entity})
+    create_index(conn, "ix_change_log_org_id_id", "change_log", ["org_id", "id"])
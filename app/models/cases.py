@@ -1,24 +1,46 @@
-from typing import Optional
-from sqlmodel import SQLModel, Field
+from typing import TYPE_CHECKING, List, Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from app.models.invoices import Invoice
+    from app.models.patients import Patient
+    from app.models.visits import Visit
+
 class Case(SQLModel, table=True):
     __tablename__ = "cases"
+    # keyset pagination order (see app.utils.pagination)
+    __table_args__ = (
+        Index("ix_cases_created_at_id", "created_at", "id"),
+        # tenant-scoped listing and critical cases (migration 0004)
+        Index("ix_cases_org_id_created_at_id", "org_id", "created_at", "id"),
+        Index("ix_cases_org_id_status", "org_id", "status"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    patient_id: int = Field(foreign_key="patients.id")
+    patient_id: int = Field(foreign_key="patients.id", index=True)
+    # the patient's, copied so tenant queries need no join (see app.utils.tenancy)
+    org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
     title: str
     description: Optional[str] = None
-    status: str = "open"
+    status: str = Field(default="open", index=True)
     created_by: Optional[int] = Field(default=None, foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+    patient: Optional["Patient"] = Relationship(back_populates="cases")
+    wounds: List["WoundRecord"] = Relationship(back_populates="case", passive_deletes=True)
+    visits: List["Visit"] = Relationship(back_populates="case", passive_deletes=True)
+    invoices: List["Invoice"] = Relationship(back_populates="case", passive_deletes=True)
+
 class WoundRecord(SQLModel, table=True):
     __tablename__ = "wound_records"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    case_id: Optional[int] = Field(default=None, foreign_key="cases.id")
+    case_id: Optional[int] = Field(default=None, foreign_key="cases.id", index=True)
     description: Optional[str] = None
     severity: Optional[str] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    case: Optional[Case] = Relationship(back_populates="wounds")
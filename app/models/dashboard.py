@@ -0,0 +1,9 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class SummaryCounter(SQLModel, table=True):
+    __tablename__ = "summary_counters"
+
+    key: str = Field(primary_key=True)
+    value: int = 0
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
@@ -1,28 +1,51 @@
-from typing import Optional
-from sqlmodel import SQLModel, Field
+from typing import TYPE_CHECKING, List, Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from app.models.cases import Case
+    from app.models.patients import Patient
+
 class Invoice(SQLModel, table=True):
     __tablename__ = "invoices"
+    # keyset pagination order (see app.utils.pagination)
+    __table_args__ = (
+        Index("ix_invoices_created_at_id", "created_at", "id"),
+        # unpaid invoices of one patient (migration 0001)
+        Index("ix_invoices_patient_id_status", "patient_id", "status"),
+        # tenant-scoped unpaid list (migration 0004)
+        Index("ix_invoices_org_id_created_at_id", "org_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patients.id")
     case_id: Optional[int] = Field(default=None, foreign_key="cases.id")
     org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
     amount: float
+    # running total of payments, only ever changed by app.utils.payments
+    paid_amount: float = Field(default=0, sa_column_kwargs={"server_default": "0"})
     status: str = "pending"
     invoice_date: datetime = Field(default_factory=datetime.utcnow)
     created_by: Optional[int] = Field(default=None, foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    patient: Optional["Patient"] = Relationship(back_populates="invoices")
+    case: Optional["Case"] = Relationship(back_populates="invoices")
+    payments: List["Payment"] = Relationship(back_populates="invoice", passive_deletes=True)
+
 class Payment(SQLModel, table=True):
     __tablename__ = "payments"
+    # one payment per mobile-money receipt: replayed callbacks are idempotent (migration 0002)
+    __table_args__ = (Index("ux_payments_reference", "reference", unique=True),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    invoice_id: int = Field(foreign_key="invoices.id")
+    invoice_id: int = Field(foreign_key="invoices.id", index=True)
     amount: float
     method: Optional[str] = None
     reference: Optional[str] = None
     paid_at: datetime = Field(default_factory=datetime.utcnow)
     created_by: Optional[int] = Field(default=None, foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+    invoice: Optional[Invoice] = Relationship(back_populates="payments")
@@ -0,0 +1,34 @@
+from typing import Optional
+from sqlalchemy import Column, Index, JSON
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class Job(SQLModel, table=True):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # the worker's claim query: oldest due job of a type (see app.utils.jobs)
+        Index("ix_jobs_status_type_run_after", "status", "type", "run_after"),
+        # a tenant's jobs, newest first (migration 0004)
+        Index("ix_jobs_org_id_id", "org_id", "id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    type: str
+    # queued -> running -> succeeded | failed (a failed attempt with retries left goes back to queued)
+    status: str = "queued"
+    payload: dict = Field(default_factory=dict, sa_column=Column(JSON, nullable=False))
+    result: Optional[dict] = Field(default=None, sa_column=Column(JSON))
+    error: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 3
+    # not claimed before this time (retry backoff)
+    run_after: datetime = Field(default_factory=datetime.utcnow)
+    # worker holding the job and when it claimed it; a lease older than JOB_LEASE_SECONDS is requeued
+    locked_by: Optional[str] = None
+    locked_at: Optional[datetime] = None
+    created_by: Optional[str] = None
+    # tenant that enqueued it; the handler runs scoped to it
+    org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,9 +1,21 @@
-from typing import Optional
-from sqlmodel import SQLModel, Field
+from typing import TYPE_CHECKING, List, Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from app.models.cases import Case
+    from app.models.invoices import Invoice
+    from app.models.visits import Visit
+
 class Patient(SQLModel, table=True):
     __tablename__ = "patients"
+    # keyset pagination order (see app.utils.pagination)
+    __table_args__ = (
+        Index("ix_patients_created_at_id", "created_at", "id"),
+        # the same order within one tenant (migration 0004)
+        Index("ix_patients_org_id_created_at_id", "org_id", "created_at", "id"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     first_name: str = Field(index=True)
@@ -15,4 +27,9 @@ class Patient(SQLModel, table=True):
     location: Optional[str] = None
     org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+    # collections are never lazy-loaded in async code: use selectinload
+    cases: List["Case"] = Relationship(back_populates="patient", passive_deletes=True)
+    visits: List["Visit"] = Relationship(back_populates="patient", passive_deletes=True)
+    invoices: List["Invoice"] = Relationship(back_populates="patient", passive_deletes=True)
\ No newline at end of file
@@ -0,0 +1,18 @@
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class SchemaMigration(SQLModel, table=True):
+    __tablename__ = "schema_migrations"
+
+    # file prefix of an applied migration in app/migrations, e.g. "0001"
+    version: str = Field(primary_key=True)
+    name: str
+    applied_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SchemaVersion(SQLModel, table=True):
+    __tablename__ = "schema_version"
+
+    # single row: fingerprint of the schema the database was last checked against
+    id: int = Field(default=1, primary_key=True)
+    fingerprint: str
+    checked_at: datetime = Field(default_factory=datetime.utcnow)
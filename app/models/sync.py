@@ -0,0 +1,30 @@
+from typing import Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field
+from datetime import datetime
+
+class ChangeLog(SQLModel, table=True):
+    __tablename__ = "change_log"
+    # one tenant's changes after a token (migration 0006)
+    __table_args__ = (Index("ix_change_log_org_id_id", "org_id", "id"),)
+
+    # monotonically increasing: the sync change token is the last id seen
+    id: Optional[int] = Field(default=None, primary_key=True)
+    table_name: str
+    row_id: int
+    # the changed row's tenant, so a pull only reads its own clinic's entries
+    org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    deleted: bool = False
+    changed_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SyncReceipt(SQLModel, table=True):
+    __tablename__ = "sync_receipts"
+
+    # client-generated idempotency key of one pushed operation
+    key: str = Field(primary_key=True, max_length=64)
+    entity: str
+    row_id: int
+    # tenant that pushed the op: receipts are only looked up within it
+    org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    device_id: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
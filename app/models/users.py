@@ -10,6 +10,10 @@ class User(SQLModel, table=True):
     email: str = Field(unique=True, index=True)
     password: str  # Hashed password
     full_name: str
+    # the clinic whose data the user sees (see app.utils.tenancy)
+    org_id: Optional[int] = Field(default=None, foreign_key="organization.id", index=True)
+    # "staff", or "platform": no clinic, sees every clinic. Set by operators, never by the API
+    role: str = Field(default="staff")
     is_active: bool = True
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
@@ -1,35 +1,64 @@
-from typing import Optional
-from sqlmodel import SQLModel, Field
+from typing import TYPE_CHECKING, List, Optional
+from sqlalchemy import Index
+from sqlmodel import SQLModel, Field, Relationship
 from datetime import datetime
 
+if TYPE_CHECKING:
+    from app.models.cases import Case
+    from app.models.patients import Patient
+
 class Visit(SQLModel, table=True):
     __tablename__ = "visits"
+    # a patient's visit history (migration 0001)
+    __table_args__ = (
+        Index("ix_visits_patient_id_visit_date", "patient_id", "visit_date"),
+        # a tenant's visits by date, for its summary counters (migration 0004)
+        Index("ix_visits_org_id_visit_date", "org_id", "visit_date"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     patient_id: int = Field(foreign_key="patients.id")
-    case_id: Optional[int] = Field(default=None, foreign_key="cases.id")
-    visit_date: datetime
+    case_id: Optional[int] = Field(default=None, foreign_key="cases.id", index=True)
+    # the patient's, copied so tenant queries need no join (see app.utils.tenancy)
+    org_id: Optional[int] = Field(default=None, foreign_key="organization.id")
+    visit_date: datetime = Field(index=True)
     notes: Optional[str] = None
     recorded_by: Optional[int] = Field(default=None, foreign_key="users.id")
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+    patient: Optional["Patient"] = Relationship(back_populates="visits")
+    case: Optional["Case"] = Relationship(back_populates="visits")
+    vitals: List["Vitals"] = Relationship(back_populates="visit", passive_deletes=True)
+    activities: List["NurseActivityLog"] = Relationship(back_populates="visit", passive_deletes=True)
+
 class Vitals(SQLModel, table=True):
     __tablename__ = "vitals"
+    # a patient's readings over time, for trend queries (migration 0003)
+    __table_args__ = (Index("ix_vitals_patient_id_measured_at", "patient_id", "measured_at"),)
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    visit_id: int = Field(foreign_key="visits.id")
+    visit_id: int = Field(foreign_key="visits.id", index=True)
+    # copied from the visit on write, so trends need no join
+    patient_id: Optional[int] = Field(default=None, foreign_key="patients.id")
     temperature: Optional[float] = None
     pulse: Optional[int] = None
     blood_pressure: Optional[str] = None
+    # parsed from blood_pressure ("120/80") by app.utils.vitals
+    systolic: Optional[int] = None
+    diastolic: Optional[int] = None
     respiratory_rate: Optional[int] = None
     spo2: Optional[int] = None
     measured_at: datetime = Field(default_factory=datetime.utcnow)
 
+    visit: Optional[Visit] = Relationship(back_populates="vitals")
+
 class NurseActivityLog(SQLModel, table=True):
     __tablename__ = "nurse_activity_logs"
 
     id: Optional[int] = Field(default=None, primary_key=True)
-    visit_id: int = Field(foreign_key="visits.id")
+    visit_id: int = Field(foreign_key="visits.id", index=True)
     nurse_id: int = Field(foreign_key="users.id")
     activity: Optional[str] = None
     timestamp: datetime = Field(default_factory=datetime.utcnow)
+
+    visit: Optional[Visit] = Relationship(back_populates="activities")
@@ -1,13 +1,19 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Optional
 from pydantic import BaseModel, EmailStr
-from app.database import get_session
+from app.database import get_async_session
+from app.models.organization import Organization
 from app.models.users import User
+from app.utils.tenancy import current_org
 from app.utils.security import (
-    hash_password,
-    verify_password,
+    PLATFORM_ROLE,
+    hash_password_async,
+    verify_and_update_password_async,
     create_access_token,
+    get_current_user,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
 
@@ -22,6 +28,7 @@ class RegisterRequest(BaseModel):
     email: EmailStr
     password: str
     full_name: str
+    org_id: Optional[int] = None
 
 class TokenResponse(BaseModel):
     access_token: str
@@ -32,25 +39,47 @@ class RegisterResponse(BaseModel):
     username: str
     email: EmailStr
     full_name: str
+    org_id: Optional[int] = None
 
 @router.post("/login", response_model=TokenResponse)
-def login(request: LoginRequest, session: Session = Depends(get_session)):
+async def login(request: LoginRequest, session: AsyncSession = Depends(get_async_session)):
     """Login user and return JWT token"""
     # Find user
     stmt = select(User).where(User.username == request.username)
-    user = session.exec(stmt).first()
+    user = (await session.exec(stmt)).first()
+    # Hand the connection back to the pool before the slow hash
+    await session.commit()
     
-    if not user or not verify_password(request.password, user.password):
+    # bcrypt runs on the hashing pool, not the event loop
+    verified, new_hash = False, None
+    if user:
+        verified, new_hash = await verify_and_update_password_async(request.password, user.password)
+
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
+
+    # Stored hash uses an old bcrypt cost — upgrade it transparently
+    if new_hash:
+        user.password = new_hash
+        session.add(user)
+        await session.commit()
     
-    # Create token
+    # Create token; org_id scopes every request made with it (app.utils.tenancy).
+    # Only the platform role may go without one.
+    claims = {"sub": user.username}
+    if user.org_id is not None:
+        claims["org_id"] = user.org_id
+    elif user.role == PLATFORM_ROLE:
+        claims["role"] = PLATFORM_ROLE
+    else:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Account is not assigned to a clinic")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username},
+        data=claims,
         expires_delta=access_token_expires
     )
     
@@ -60,32 +89,56 @@ def login(request: LoginRequest, session: Session = Depends(get_session)):
         "username": user.username
     }
 
-@router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED)
-def register(request: RegisterRequest, session: Session = Depends(get_session)):
-    """Register new user"""
+@router.post("/register", response_model=RegisterResponse, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(get_current_user)])
+async def register(
+    request: RegisterRequest,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Register clinic staff - PROTECTED.
+
+    A clinic's token registers staff into that clinic; the platform role
+    must name the clinic in `org_id`. Every account gets a clinic: the
+    platform role is never granted here.
+    """
+    org_id = current_org()
+    if org_id is None:
+        if request.org_id is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="org_id is required")
+        org_id = request.org_id
+    elif request.org_id not in (None, org_id):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Cannot register staff for another clinic")
     # Check if user exists
     stmt = select(User).where(User.username == request.username)
-    if session.exec(stmt).first():
+    if (await session.exec(stmt)).first():
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Username already registered"
         )
+    if not await session.get(Organization, org_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown organization"
+        )
+    await session.commit()
     
     # Create new user
     user = User(
         username=request.username,
         email=str(request.email),
-        password=hash_password(request.password),
+        password=await hash_password_async(request.password),
         full_name=request.full_name,
+        org_id=org_id,
     )
     
     session.add(user)
-    session.commit()
-    session.refresh(user)
+    await session.commit()
+    await session.refresh(user)
     
     return RegisterResponse(
         id=user.id,
         username=user.username,
         email=user.email,
-        full_name=user.full_name
+        full_name=user.full_name,
+        org_id=user.org_id
     )
\ No newline at end of file
@@ -1,32 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
-from app.database import get_session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from app.database import get_async_session, get_read_session
 from app.models.cases import Case, WoundRecord
 from app.models.patients import Patient
+from app.utils import cache, fastjson
+from app.utils import summary as counters
+from app.utils.pagination import keyset, ndjson_response, set_next_cursor
+from app.utils.security import get_current_user
 
-router = APIRouter(tags=["Cases"], prefix="/cases")
+router = APIRouter(tags=["Cases"], prefix="/cases", dependencies=[Depends(get_current_user)])
+
+LIST_CASES = cache.CachedRoute("list_cases", [cache.CASES], ttl=60)
+FAST_JSON = fastjson.enabled("cases")
+CASE_ROWS = fastjson.RowSchema(Case)
 
 @router.post("/", response_model=Case)
-def create_case(case: Case, session: Session = Depends(get_session)):
-    if not session.get(Patient, case.patient_id):
+async def create_case(case: Case, session: AsyncSession = Depends(get_async_session)):
+    if not await session.get(Patient, case.patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
     session.add(case)
-    session.commit()
-    session.refresh(case)
+    await session.flush()  # takes the patient's org_id
+    await counters.bump(session, {
+        counters.CASES: 1,
+        counters.CRITICAL_CASES: 1 if case.status == "critical" else 0,
+    }, case.org_id)
+    await session.commit()
+    await cache.invalidate(cache.CASES)
+    await session.refresh(case)
     return case
 
 @router.get("/", response_model=List[Case])
-def list_cases(session: Session = Depends(get_session)):
-    return session.exec(select(Case)).all()
+async def list_cases(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Resume after a page; taken from the X-Next-Cursor header"),
+    limit: int = 100,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson streams every case"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    fast = FAST_JSON and format == "json"
+    stmt = keyset(CASE_ROWS.select() if fast else select(Case), Case, cursor)
+    if format == "ndjson":
+        return ndjson_response(stmt)
+    cached = await cache.lookup(request, LIST_CASES)
+    if cached.hit:
+        return cached.hit
+    cases = (await session.exec(stmt.limit(limit))).all()
+    set_next_cursor(response, cases, limit)
+    return await cached.fill(fastjson.dumps(CASE_ROWS, cases) if fast else cases, response)
 
 @router.post("/{case_id}/wounds", response_model=WoundRecord)
-def add_wound(case_id: int, record: WoundRecord, session: Session = Depends(get_session)):
-    c = session.get(Case, case_id)
+async def add_wound(case_id: int, record: WoundRecord, session: AsyncSession = Depends(get_async_session)):
+    c = await session.get(Case, case_id)
     if not c:
         raise HTTPException(status_code=404, detail="Case not found")
     record.case_id = case_id
     session.add(record)
-    session.commit()
-    session.refresh(record)
+    await session.commit()
+    await session.refresh(record)
     return record
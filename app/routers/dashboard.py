@@ -1,46 +1,55 @@
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select, func
-from app.database import get_session
-from app.models.patients import Patient
+from fastapi import APIRouter, Depends, HTTPException, Request
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session, get_read_session
 from app.models.cases import Case
-from app.models.invoices import Invoice
-from app.models.visits import Visit
-from datetime import datetime, timedelta
+from app.utils import cache, tenancy
+from app.utils import summary as counters
+from app.utils.security import get_current_user, is_platform
+from datetime import datetime
 
-router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"], dependencies=[Depends(get_current_user)])
+
+# short TTL: "visits today" rolls over at midnight and reconciles run in the background
+SUMMARY = cache.CachedRoute("dashboard_summary", cache.SCOPES, ttl=10)
 
 @router.get("/summary")
-def summary(session: Session = Depends(get_session)):
-    total_patients = session.exec(select(func.count()).select_from(Patient)).one()
-    total_cases = session.exec(select(func.count()).select_from(Case)).one()
-    total_unpaid = session.exec(
-        select(func.count()).select_from(Invoice).where(Invoice.status != "paid")
-    ).one()
+async def summary(request: Request, session: AsyncSession = Depends(get_read_session)):
+    cached = await cache.lookup(request, SUMMARY)
+    if cached.hit:
+        return cached.hit
+
+    # totals come from the incrementally maintained summary store
+    totals = await counters.read_summary(session, tenancy.current_org())
 
     # sample of critical cases
-    critical = session.exec(select(Case).where(Case.critical == True).limit(10)).all()
-
-    # visits scheduled today
-    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-    end = start + timedelta(days=1)
-    visits_today = session.exec(
-        select(func.count()).select_from(Visit).where(
-            Visit.scheduled_time >= start, Visit.scheduled_time < end
-        )
-    ).one()
-
-    return {
-        "total_patients": total_patients,
-        "total_cases": total_cases,
-        "critical_cases_count": len(critical),
+    critical = (await session.exec(
+        select(Case).where(Case.status == "critical").order_by(Case.id.desc()).limit(10)
+    )).all()
+
+    return await cached.fill({
+        "total_patients": totals[counters.PATIENTS],
+        "total_cases": totals[counters.CASES],
+        "critical_cases_count": totals[counters.CRITICAL_CASES],
         "critical_cases_sample": [
             {
                 "id": c.id,
                 "patient_id": c.patient_id,
-                "primary_diagnosis": c.primary_diagnosis,
+                "title": c.title,
             }
             for c in critical
         ],
-        "total_unpaid_invoices": total_unpaid,
-        "visits_today": visits_today,
-    }
+        "total_unpaid_invoices": totals[counters.UNPAID_INVOICES],
+        "visits_today": totals[counters.visits_key(datetime.utcnow().date())],
+    })
+
+@router.post("/summary/reconcile")
+async def reconcile(user: dict = Depends(get_current_user), session: AsyncSession = Depends(get_async_session)):
+    """Recount every summary counter from the source tables - platform role only.
+
+    The recount covers every clinic, so clinic staff cannot trigger it;
+    the periodic reconciliation keeps their counters honest.
+    """
+    if not is_platform(user):
+        raise HTTPException(status_code=403, detail="Reconciliation needs the platform role")
+    return await counters.recount(session)
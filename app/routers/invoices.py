@@ -1,46 +1,134 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
-from typing import List
-from app.database import get_session
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import List, Optional
+from app.database import get_async_session, get_read_session
 from app.models.invoices import Invoice, Payment
 from app.models.patients import Patient
 from app.models.cases import Case
+from app.utils import cache, fastjson, jobs
+from app.utils import summary as counters
+from app.utils.billing_jobs import INVOICE_BATCH, INVOICE_BATCH_MAX, UNPAID_EXPORT
+from app.utils.payments import SETTLEMENT_MAX_PAYMENTS, Settlement, post_payment
+from app.routers.jobs import JobAccepted, accepted
+from app.utils.pagination import keyset, ndjson_response, set_next_cursor
+from app.utils.security import get_current_user
 
-router = APIRouter(tags=["Billing"], prefix="/billing")
+router = APIRouter(tags=["Billing"], prefix="/billing", dependencies=[Depends(get_current_user)])
+
+UNPAID = cache.CachedRoute("unpaid", [cache.INVOICES], ttl=60)
+FAST_JSON = fastjson.enabled("invoices")
+INVOICE_ROWS = fastjson.RowSchema(Invoice)
+
+class SettlementPayment(BaseModel):
+    invoice_id: int
+    amount: float
+    reference: str = Field(..., min_length=1, max_length=64, description="Mobile-money receipt number")
+    method: Optional[str] = "mpesa"
+    paid_at: Optional[datetime] = None
+
+class SettlementBatch(BaseModel):
+    payments: List[SettlementPayment] = Field(..., max_length=SETTLEMENT_MAX_PAYMENTS)
+
+class InvoiceDraft(BaseModel):
+    patient_id: int
+    case_id: Optional[int] = None
+    amount: float = Field(..., gt=0)
+    invoice_date: Optional[datetime] = None
+    created_by: Optional[int] = None
+
+class InvoiceBatch(BaseModel):
+    invoices: List[InvoiceDraft] = Field(..., min_length=1, max_length=INVOICE_BATCH_MAX)
+
+class SettlementError(BaseModel):
+    index: int
+    reference: Optional[str]
+    error: str
+
+class SettlementReport(BaseModel):
+    received: int
+    applied: int
+    duplicates: List[str]
+    failed: int
+    errors: List[SettlementError]
+    invoices_updated: int
+    invoices_paid: int
 
 @router.post("/invoice", response_model=Invoice)
-def create_invoice(invoice: Invoice, session: Session = Depends(get_session)):
-    if invoice.patient_id and not session.get(Patient, invoice.patient_id):
+async def create_invoice(invoice: Invoice, session: AsyncSession = Depends(get_async_session)):
+    if invoice.patient_id and not await session.get(Patient, invoice.patient_id):
         raise HTTPException(status_code=404, detail="Patient not found")
-    if invoice.case_id and not session.get(Case, invoice.case_id):
+    if invoice.case_id and not await session.get(Case, invoice.case_id):
         raise HTTPException(status_code=404, detail="Case not found")
-    # compute totals if items supplied
-    if invoice.items:
-        subtotal = sum(item.get("total", 0) for item in invoice.items)
-        invoice.subtotal = subtotal
-        invoice.total = subtotal + (invoice.tax or 0)
+    invoice.paid_amount = 0  # payments only move it through app.utils.payments
     session.add(invoice)
-    session.commit()
-    session.refresh(invoice)
+    await session.flush()  # takes the patient's org_id
+    if invoice.status != "paid":
+        await counters.bump(session, {counters.UNPAID_INVOICES: 1}, invoice.org_id)
+    await session.commit()
+    await cache.invalidate(cache.INVOICES)
+    await session.refresh(invoice)
     return invoice
 
 @router.post("/invoice/{invoice_id}/pay", response_model=Payment)
-def pay_invoice(invoice_id: int, payment: Payment, session: Session = Depends(get_session)):
-    inv = session.get(Invoice, invoice_id)
-    if not inv:
-        raise HTTPException(status_code=404, detail="Invoice not found")
-    payment.invoice_id = invoice_id
-    session.add(payment)
-    inv.paid_amount = (inv.paid_amount or 0) + payment.amount
-    if inv.total and inv.paid_amount >= inv.total:
-        inv.status = "paid"
-    else:
-        inv.status = "partially_paid" if inv.paid_amount > 0 else "unpaid"
-    session.add(inv)
-    session.commit()
-    session.refresh(payment)
+async def pay_invoice(
+    invoice_id: int,
+    payment: Payment,
+    response: Response,
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Apply a payment atomically; a repeated reference returns the original payment"""
+    payment, created = await post_payment(session, invoice_id, payment)
+    if not created:
+        response.headers["Idempotent-Replay"] = "true"
     return payment
 
+@router.post("/settlements", response_model=SettlementReport)
+async def settle(batch: SettlementBatch, session: AsyncSession = Depends(get_async_session)):
+    """Apply a reconciled batch of mobile-money payments in one transaction"""
+    return await Settlement(session).run(batch.payments)
+
+@router.post("/invoices/batch", response_model=JobAccepted, status_code=202)
+async def create_invoice_batch(batch: InvoiceBatch, response: Response, session: AsyncSession = Depends(get_async_session)):
+    """Queue a batch of invoices (e.g. month-end statements); poll the returned job for the outcome"""
+    job = await jobs.enqueue(session, INVOICE_BATCH, {"invoices": [i.model_dump(mode="json") for i in batch.invoices]})
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return accepted(job)
+
+@router.post("/invoices/unpaid/export", response_model=JobAccepted, status_code=202)
+async def export_unpaid(
+    response: Response,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    patient_id: Optional[int] = Query(None, description="Only this patient's unpaid invoices"),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Queue an export of every unpaid invoice; the finished job's file is at /api/jobs/{id}/download"""
+    job = await jobs.enqueue(session, UNPAID_EXPORT, {"format": format, "patient_id": patient_id})
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return accepted(job)
+
 @router.get("/invoices/unpaid", response_model=List[Invoice])
-def unpaid(session: Session = Depends(get_session)):
-    return session.exec(select(Invoice).where(Invoice.status != "paid")).all()
+async def unpaid(
+    request: Request,
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Resume after a page; taken from the X-Next-Cursor header"),
+    limit: int = 100,
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson streams every unpaid invoice"),
+    patient_id: Optional[int] = Query(None, description="Only this patient's unpaid invoices"),
+    session: AsyncSession = Depends(get_read_session),
+):
+    fast = FAST_JSON and format == "json"
+    stmt = (INVOICE_ROWS.select() if fast else select(Invoice)).where(Invoice.status != "paid")
+    if patient_id is not None:
+        stmt = stmt.where(Invoice.patient_id == patient_id)
+    stmt = keyset(stmt, Invoice, cursor)
+    if format == "ndjson":
+        return ndjson_response(stmt)
+    cached = await cache.lookup(request, UNPAID)
+    if cached.hit:
+        return cached.hit
+    invoices = (await session.exec(stmt.limit(limit))).all()
+    set_next_cursor(response, invoices, limit)
+    return await cached.fill(fastjson.dumps(INVOICE_ROWS, invoices) if fast else invoices, response)
@@ -0,0 +1,67 @@
+import os
+from typing import Dict, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_read_session
+from app.models.jobs import Job
+from app.utils import jobs
+from app.utils.security import get_current_user
+
+router = APIRouter(tags=["Jobs"], dependencies=[Depends(get_current_user)])
+
+class JobAccepted(BaseModel):
+    job_id: int
+    status: str
+    status_url: str
+
+class QueueDepth(BaseModel):
+    type: str
+    status: str
+    count: int
+
+def accepted(job: Job) -> Dict:
+    """202 body for a route that enqueued `job`"""
+    return {"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"}
+
+@router.get("/", response_model=List[Job])
+async def list_jobs(
+    type: Optional[str] = None,
+    status: Optional[str] = Query(None, pattern="^(queued|running|succeeded|failed)$"),
+    limit: int = Query(50, le=500),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Most recent jobs first"""
+    stmt = select(Job).order_by(Job.id.desc()).limit(limit)
+    if type:
+        stmt = stmt.where(Job.type == type)
+    if status:
+        stmt = stmt.where(Job.status == status)
+    return (await session.exec(stmt)).all()
+
+@router.get("/queue", response_model=List[QueueDepth])
+async def queue(session: AsyncSession = Depends(get_read_session)):
+    """Jobs per type and status"""
+    return await jobs.queue_depth(session)
+
+@router.get("/{job_id}", response_model=Job)
+async def get_job(job_id: int, session: AsyncSession = Depends(get_read_session)):
+    job = await session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/{job_id}/download")
+async def download(job_id: int, session: AsyncSession = Depends(get_read_session)):
+    """The file a finished export job wrote"""
+    job = await session.get(Job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != jobs.SUCCEEDED or not (job.result or {}).get("file"):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}, no file to download")
+    path = jobs.export_path(job.result["file"])
+    if not os.path.exists(path):
+        raise HTTPException(status_code=410, detail="Export file expired")
+    return FileResponse(path, filename=job.result["file"])
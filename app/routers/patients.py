@@ -1,90 +1,169 @@
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, Header
-from sqlmodel import Session, select
-from app.database import get_session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from pydantic import BaseModel
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session, get_read_session
 from app.models.patients import Patient
-from app.utils.security import verify_token
+from app.utils import cache, conditional, fastjson, search, timeline
+from app.utils import vitals as vitals_series
+from app.utils import summary as counters
+from app.utils.pagination import keyset, ndjson_response, set_next_cursor
+from app.utils.patient_import import IMPORT_BATCH_SIZE, PatientImporter, iter_rows
+from app.utils.security import get_current_user
 
-router = APIRouter(tags=["Patients"])
+# Every patients route is PROTECTED by the same (cached) token check
+router = APIRouter(tags=["Patients"], dependencies=[Depends(get_current_user)])
+
+GET_PATIENT = cache.CachedRoute("get_patient", [cache.PATIENTS], ttl=300)
+FAST_JSON = fastjson.enabled("patients")
+PATIENT_ROWS = fastjson.RowSchema(Patient)
+
+class ImportRowError(BaseModel):
+    row: int
+    error: str
+
+class ImportReport(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int
+    failed: int
+    errors: List[ImportRowError]
+    errors_truncated: bool
 
 @router.post("/", response_model=Patient)
-def create_patient(
+async def create_patient(
     payload: Patient,
-    session: Session = Depends(get_session),
-    authorization: str = Header(None)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Create a new patient - PROTECTED"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    verify_token(token)  # Verify token
-    
     session.add(payload)
-    session.commit()
-    session.refresh(payload)
+    await session.flush()
+    await search.index_patients(session, [payload])
+    await counters.bump(session, {counters.PATIENTS: 1}, payload.org_id)
+    await session.commit()
+    await cache.invalidate(cache.PATIENTS)
+    await session.refresh(payload)
     return payload
 
+@router.post("/import", response_model=ImportReport)
+async def import_patients(
+    file: UploadFile = File(..., description="CSV with a header row, or NDJSON (one patient per line)"),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the file extension"),
+    batch_size: int = Query(IMPORT_BATCH_SIZE, ge=1, le=10000),
+    session: AsyncSession = Depends(get_async_session)
+):
+    """Bulk import patients, skipping duplicate emails/phones - PROTECTED"""
+    if not format:
+        name = (file.filename or "").lower()
+        format = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "csv"
+    importer = PatientImporter(session, batch_size=batch_size)
+    return await importer.run(iter_rows(file.file, format))
+
 @router.get("/", response_model=List[Patient])
-def list_patients(
+async def list_patients(
+    response: Response,
     q: Optional[str] = Query(None, description="Search by name or phone"),
-    skip: int = 0,
+    cursor: Optional[str] = Query(None, description="Resume after a page; taken from the X-Next-Cursor header"),
+    skip: int = Query(0, deprecated=True, description="Offset paging, slow on deep pages; use cursor"),
     limit: int = 100,
-    session: Session = Depends(get_session),
-    authorization: str = Header(None)
+    format: str = Query("json", pattern="^(json|ndjson)$", description="ndjson streams every patient (ignored with q)"),
+    session: AsyncSession = Depends(get_read_session)
 ):
     """List all patients with optional search - PROTECTED"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    verify_token(token)  # Verify token
+    if q:
+        # ranked search; pages by skip since relevance order has no keyset
+        ids = await search.search_patient_ids(session, q, limit=limit, offset=skip)
+        if ids is not None:
+            found = {p.id: p for p in (await session.exec(select(Patient).where(Patient.id.in_(ids)))).all()}
+            return [found[i] for i in ids if i in found]
     
-    stmt = select(Patient).offset(skip).limit(limit)
+    fast = FAST_JSON and format == "json"
+    stmt = PATIENT_ROWS.select() if fast else select(Patient)
     
     if q:
         qterm = f"%{q}%"
-        stmt = select(Patient).where(
+        stmt = stmt.where(
             (Patient.first_name.ilike(qterm)) |
             (Patient.last_name.ilike(qterm)) |
             (Patient.phone.ilike(qterm))
-        ).offset(skip).limit(limit)
+        )
+    
+    stmt = keyset(stmt, Patient, cursor)
+    if format == "ndjson":
+        return ndjson_response(stmt)
+    if skip and not cursor:
+        stmt = stmt.offset(skip)
     
-    return session.exec(stmt).all()
+    patients = (await session.exec(stmt.limit(limit))).all()
+    set_next_cursor(response, patients, limit)
+    if fast:
+        return fastjson.respond(PATIENT_ROWS, patients, response)
+    return patients
 
 @router.get("/{patient_id}", response_model=Patient)
-def get_patient(
+async def get_patient(
     patient_id: int,
-    session: Session = Depends(get_session),
-    authorization: str = Header(None)
+    request: Request,
+    session: AsyncSession = Depends(get_read_session)
 ):
-    """Get specific patient - PROTECTED"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    verify_token(token)  # Verify token
-    
-    patient = session.get(Patient, patient_id)
+    """Get specific patient (ETag / Last-Modified from updated_at, 304 when unchanged) - PROTECTED"""
+    cached = await cache.lookup(request, GET_PATIENT)
+    if cached.hit:
+        return cached.hit
+    patient = await session.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
-    return patient
+    return await cached.fill(patient, etag=conditional.resource_etag(patient), last_modified=patient.updated_at)
+
+@router.get("/{patient_id}/timeline")
+async def patient_timeline(
+    patient_id: int,
+    since: Optional[datetime] = Query(None, description="Only visits, wounds and invoices from this time"),
+    until: Optional[datetime] = Query(None, description="... and before this time (exclusive)"),
+    fields: Optional[str] = Query(None, description=f"Comma-separated sections: {', '.join(timeline.SECTIONS)}"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """Whole patient chart in one call, in a fixed number of queries - PROTECTED"""
+    sections = timeline.parse_sections(fields)
+    patient = await timeline.load_timeline(session, patient_id, sections, since, until)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return timeline.timeline_dict(patient, sections)
+
+@router.get("/{patient_id}/vitals")
+async def patient_vitals(
+    patient_id: int,
+    since: Optional[datetime] = Query(None, description="Start of the window (default: 90 days before until)"),
+    until: Optional[datetime] = Query(None, description="End of the window, exclusive (default: now)"),
+    bucket: str = Query("auto", pattern=r"^(auto|\d+[mhdw])$", description="Bucket width, e.g. 1h, 1d, 1w"),
+    max_points: int = Query(500, ge=10, le=5000, description="Upper bound on buckets when bucket=auto"),
+    metrics: Optional[str] = Query(None, description=f"Comma-separated: {', '.join(vitals_series.METRICS)}"),
+    session: AsyncSession = Depends(get_read_session)
+):
+    """Downsampled vitals trend (min/max/avg per bucket) - PROTECTED"""
+    until = vitals_series.naive_utc(until) or datetime.utcnow()
+    since = vitals_series.naive_utc(since) or until - vitals_series.DEFAULT_WINDOW
+    if since >= until:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    wanted = vitals_series.parse_metrics(metrics)
+    if bucket == "auto":
+        bucket = vitals_series.choose_bucket(since, until, max_points)
+    elif vitals_series.bucket_seconds(bucket) <= 0:
+        raise HTTPException(status_code=400, detail="bucket must be positive")
+    if not await session.get(Patient, patient_id):
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return await vitals_series.downsample(session, patient_id, since, until, bucket, wanted)
 
 @router.put("/{patient_id}", response_model=Patient)
-def update_patient(
+async def update_patient(
     patient_id: int,
     payload: Patient,
-    session: Session = Depends(get_session),
-    authorization: str = Header(None)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Update patient - PROTECTED"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    verify_token(token)  # Verify token
-    
-    patient = session.get(Patient, patient_id)
+    patient = await session.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
@@ -95,29 +174,28 @@ def update_patient(
     patient.date_of_birth = payload.date_of_birth
     patient.gender = payload.gender
     patient.location = payload.location
+    patient.updated_at = datetime.utcnow()  # new ETag / Last-Modified for get_patient
     
     session.add(patient)
-    session.commit()
-    session.refresh(patient)
+    await search.index_patients(session, [patient])
+    await session.commit()
+    await cache.invalidate(cache.PATIENTS)
+    await session.refresh(patient)
     return patient
 
 @router.delete("/{patient_id}")
-def delete_patient(
+async def delete_patient(
     patient_id: int,
-    session: Session = Depends(get_session),
-    authorization: str = Header(None)
+    session: AsyncSession = Depends(get_async_session)
 ):
     """Delete patient - PROTECTED"""
-    if not authorization:
-        raise HTTPException(status_code=401, detail="Missing authorization header")
-    
-    token = authorization.replace("Bearer ", "")
-    verify_token(token)  # Verify token
-    
-    patient = session.get(Patient, patient_id)
+    patient = await session.get(Patient, patient_id)
     if not patient:
         raise HTTPException(status_code=404, detail="Patient not found")
     
-    session.delete(patient)
-    session.commit()
+    await session.delete(patient)
+    await search.remove_patient(session, patient_id)
+    await counters.bump(session, {counters.PATIENTS: -1}, patient.org_id)
+    await session.commit()
+    await cache.invalidate(cache.PATIENTS)
     return {"deleted": True}
\ No newline at end of file
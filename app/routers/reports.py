@@ -0,0 +1,91 @@
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from pydantic import BaseModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session
+from app.routers.jobs import JobAccepted, accepted
+from app.utils import jobs, reports
+from app.utils.security import get_current_user, is_platform
+from app.utils.tenancy import current_org
+
+# KPIs from the reporting snapshots (app.utils.reports), never from the
+# live tables: figures are as of the snapshot's `as_of`.
+router = APIRouter(tags=["Reports"], dependencies=[Depends(get_current_user)])
+
+Row = TypeVar("Row")
+
+class Report(BaseModel, Generic[Row]):
+    as_of: Optional[datetime]
+    rows: List[Row]
+
+class RevenueMonth(BaseModel):
+    month: str
+    invoiced: float
+    collected: float
+    collection_rate: Optional[float]
+    received: float
+
+class AgeingBucket(BaseModel):
+    bucket: str
+    invoices: int
+    outstanding: float
+
+class NurseVisits(BaseModel):
+    month: str
+    nurse_id: Optional[int]
+    visits: int
+
+class WoundTrend(BaseModel):
+    month: str
+    severity: str
+    count: int
+
+def _report(figure: str, months: Optional[int] = None):
+    document = reports.read_kpis(current_org())
+    if document is None:
+        raise HTTPException(status_code=503, detail="Reports are not built yet; POST /api/reports/refresh")
+    rows = document[figure]
+    if months is not None and document["as_of"]:
+        as_of = datetime.fromisoformat(document["as_of"])
+        first = reports.month_label(as_of.year * 12 + as_of.month - months)
+        rows = [row for row in rows if row["month"] >= first]
+    return {"as_of": document["as_of"], "rows": rows}
+
+@router.get("/revenue", response_model=Report[RevenueMonth])
+async def revenue(months: int = Query(12, ge=1, le=120)):
+    """Invoiced, collected (against that month's invoices) and received per month"""
+    return _report("revenue", months)
+
+@router.get("/ageing", response_model=Report[AgeingBucket])
+async def ageing():
+    """Outstanding invoices by days since the invoice date"""
+    return _report("ageing")
+
+@router.get("/nurses", response_model=Report[NurseVisits])
+async def nurse_visits(months: int = Query(3, ge=1, le=120)):
+    """Visits recorded per nurse per month, busiest first"""
+    return _report("nurses", months)
+
+@router.get("/wounds", response_model=Report[WoundTrend])
+async def wound_trends(months: int = Query(12, ge=1, le=120)):
+    """Wound records per severity per month"""
+    return _report("wounds", months)
+
+@router.post("/refresh", response_model=JobAccepted, status_code=202)
+async def refresh(
+    response: Response,
+    rebuild: bool = Query(False, description="Re-extract every row instead of only the new ones (platform role)"),
+    user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Queue a snapshot refresh now rather than at the next REPORT_REFRESH_SECONDS tick.
+
+    A rebuild drops and re-extracts every clinic's data, so only the
+    platform role may force one; clinic staff queue incremental refreshes.
+    """
+    if rebuild and not is_platform(user):
+        raise HTTPException(status_code=403, detail="A rebuild needs the platform role")
+    job = await jobs.enqueue(session, reports.REPORT_REFRESH, {"rebuild": rebuild})
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return accepted(job)
@@ -0,0 +1,67 @@
+import json
+from typing import Any, Dict, List, Literal, Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from pydantic import BaseModel, Field, ValidationError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from app.database import get_async_session, get_read_session
+from app.models.users import User
+from app.utils.security import get_current_user
+from app.utils.sync import (
+    SYNC_MAX_OPS, SYNC_PULL_LIMIT, PushProcessor, decode_token, pull_changes, read_push_body,
+)
+
+router = APIRouter(tags=["Sync"], dependencies=[Depends(get_current_user)])
+
+class PushOp(BaseModel):
+    key: str = Field(..., min_length=8, max_length=64, description="Client idempotency key (e.g. a UUID)")
+    type: Literal["visit", "vitals", "activity", "wound"]
+    visit_key: Optional[str] = Field(None, description="Key of a visit pushed offline, for vitals/activity")
+    data: Dict[str, Any]
+
+class PushBatch(BaseModel):
+    device_id: Optional[str] = Field(None, max_length=64)
+    ops: List[PushOp] = Field(..., max_length=SYNC_MAX_OPS)
+
+class PushResult(BaseModel):
+    key: str
+    status: str
+    id: Optional[int]
+    error: Optional[str]
+
+class PushReport(BaseModel):
+    created: int
+    duplicates: int
+    failed: int
+    results: List[PushResult]
+
+@router.post("/push", response_model=PushReport)
+async def push(
+    request: Request,
+    content_encoding: Optional[str] = Header(None),
+    user: dict = Depends(get_current_user),
+    session: AsyncSession = Depends(get_async_session),
+):
+    """Apply a device's offline work in one request (body may be gzip-compressed)."""
+    body = read_push_body(await request.body(), content_encoding)
+    try:
+        batch = PushBatch.model_validate_json(body)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=json.loads(e.json()))
+
+    nurse_id = (await session.exec(select(User.id).where(User.username == user.get("sub")))).first()
+    if nurse_id is None:
+        raise HTTPException(status_code=401, detail="Unknown user")
+    return await PushProcessor(session, nurse_id, batch.device_id).run(batch.ops)
+
+@router.get("/pull")
+async def pull(
+    token: Optional[str] = Query(None, description="Token from the previous pull; omit for a full sync"),
+    limit: int = Query(SYNC_PULL_LIMIT, ge=1, le=10000),
+    session: AsyncSession = Depends(get_read_session),
+):
+    """Rows changed since `token`; repeat with the returned token while has_more.
+
+    Compressed per Accept-Encoding by CompressionMiddleware (app.utils.compression)."""
+    payload = json.dumps(await pull_changes(session, decode_token(token), limit)).encode()
+    return Response(payload, media_type="application/json")
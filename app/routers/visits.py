@@ -1,45 +1,61 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlmodel import Session, select
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import List
-from app.database import get_session
+from datetime import datetime
+from app.database import get_async_session
 from app.models.visits import Visit, Vitals, NurseActivityLog
 from app.models.cases import Case
+from app.utils import cache
+from app.utils import summary as counters
+from app.utils.vitals import normalize
+from app.utils.security import get_current_user
 
-router = APIRouter(tags=["Visits"], prefix="/visits")
+router = APIRouter(tags=["Visits"], prefix="/visits", dependencies=[Depends(get_current_user)])
 
 @router.post("/", response_model=Visit)
-def schedule_visit(visit: Visit, session: Session = Depends(get_session)):
-    if not session.get(Case, visit.case_id):
+async def schedule_visit(visit: Visit, session: AsyncSession = Depends(get_async_session)):
+    case = await session.get(Case, visit.case_id) if visit.case_id is not None else None
+    if not case:
         raise HTTPException(status_code=404, detail="Case not found")
+    # the case is tenant-scoped and the visit's patient must be the case's
+    if visit.patient_id is None:
+        visit.patient_id = case.patient_id
+    elif visit.patient_id != case.patient_id:
+        raise HTTPException(status_code=400, detail="Patient does not match the case")
+    # table models skip validation, so the body's date is still a string
+    if isinstance(visit.visit_date, str):
+        visit.visit_date = datetime.fromisoformat(visit.visit_date)
     session.add(visit)
-    session.commit()
-    session.refresh(visit)
+    await session.flush()  # takes the tenant's org_id (unscoped: the case patient's)
+    await counters.bump(session, {counters.visits_key(visit.visit_date.date()): 1}, visit.org_id)
+    await session.commit()
+    await cache.invalidate(cache.VISITS)
+    await session.refresh(visit)
     return visit
 
 @router.post("/{visit_id}/vitals", response_model=Vitals)
-def record_vitals(visit_id: int, vitals: Vitals, session: Session = Depends(get_session)):
-    v = session.get(Visit, visit_id)
+async def record_vitals(visit_id: int, vitals: Vitals, session: AsyncSession = Depends(get_async_session)):
+    v = await session.get(Visit, visit_id)
     if not v:
         raise HTTPException(status_code=404, detail="Visit not found")
     vitals.visit_id = visit_id
-    if not vitals.patient_id:
-        # derive patient via case
-        case = session.get(Case, v.case_id)
-        if case:
-            vitals.patient_id = case.patient_id
+    vitals.patient_id = v.patient_id
+    if isinstance(vitals.measured_at, str):
+        vitals.measured_at = datetime.fromisoformat(vitals.measured_at)
+    normalize(vitals)
     session.add(vitals)
-    session.commit()
-    session.refresh(vitals)
+    await session.commit()
+    await session.refresh(vitals)
     return vitals
 
 @router.post("/{visit_id}/activity", response_model=NurseActivityLog)
-def log_activity(visit_id: int, activity: NurseActivityLog, session: Session = Depends(get_session)):
-    v = session.get(Visit, visit_id)
+async def log_activity(visit_id: int, activity: NurseActivityLog, session: AsyncSession = Depends(get_async_session)):
+    v = await session.get(Visit, visit_id)
     if not v:
         raise HTTPException(status_code=404, detail="Visit not found")
     activity.visit_id = visit_id
-    activity.case_id = v.case_id
     session.add(activity)
-    session.commit()
-    session.refresh(activity)
+    await session.commit()
+    await session.refresh(activity)
     return activity
@@ -0,0 +1,112 @@
+import csv
+import json
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import insert
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_engine, engine
+from app.models.cases import Case
+from app.models.invoices import Invoice
+from app.models.patients import Patient
+from app.utils import cache, fastjson, jobs
+from app.utils import summary as counters
+from app.utils.pagination import STREAM_BATCH_SIZE
+
+# Billing background jobs: month-end invoice batches and unpaid-invoice exports.
+
+# Invoices per batch job (one transaction, so a retried job never half-applies)
+INVOICE_BATCH_MAX = settings.INVOICE_BATCH_MAX
+# Row errors listed in a batch's result; the counts stay exact past this
+BATCH_MAX_ERRORS = settings.IMPORT_MAX_ERRORS
+
+INVOICE_BATCH = "invoice_batch"
+UNPAID_EXPORT = "unpaid_export"
+
+EXPORT_FORMATS = ("csv", "ndjson")
+
+@jobs.job_type(INVOICE_BATCH, concurrency=1)
+async def generate_invoices(run: jobs.JobRun) -> Dict:
+    """Insert a batch of invoices; ones for unknown patients or cases are reported, not inserted.
+
+    Runs scoped to the tenant that queued it: other clinics' patients are unknown.
+    """
+    items = run.payload["invoices"]
+    errors: List[Dict] = []
+    failed = 0
+    async with AsyncSession(async_engine) as session:
+        patients = dict((await session.exec(
+            select(Patient.id, Patient.org_id).where(Patient.id.in_({item["patient_id"] for item in items}))
+        )).all())
+        case_ids = {item["case_id"] for item in items if item.get("case_id")}
+        cases = set((await session.exec(select(Case.id).where(Case.id.in_(case_ids)))).all()) if case_ids else set()
+
+        rows = []
+        now = datetime.utcnow()
+        for index, item in enumerate(items):
+            if item["patient_id"] not in patients:
+                message = f"Patient {item['patient_id']} not found"
+            elif item.get("case_id") and item["case_id"] not in cases:
+                message = f"Case {item['case_id']} not found"
+            else:
+                invoice_date = item.get("invoice_date")
+                rows.append({
+                    "patient_id": item["patient_id"], "case_id": item.get("case_id"),
+                    "org_id": patients[item["patient_id"]],
+                    "amount": item["amount"], "paid_amount": 0, "status": "pending",
+                    "invoice_date": datetime.fromisoformat(invoice_date) if invoice_date else now,
+                    "created_by": item.get("created_by"), "created_at": now,
+                })
+                continue
+            failed += 1
+            if len(errors) < BATCH_MAX_ERRORS:
+                errors.append({"index": index, "error": message})
+
+        if rows:
+            await session.execute(insert(Invoice), rows)
+            for org_id, n in Counter(row["org_id"] for row in rows).items():
+                await counters.bump(session, {counters.UNPAID_INVOICES: n}, org_id)
+        await session.commit()
+    if rows:
+        await cache.invalidate(cache.INVOICES)
+    return {"received": len(items), "created": len(rows), "failed": failed, "errors": errors}
+
+def _json_default(value):
+    return value.isoformat()
+
+@jobs.job_type(UNPAID_EXPORT, concurrency=1)
+def export_unpaid(run: jobs.JobRun) -> Dict:
+    """Write every unpaid invoice to a file in JOB_EXPORT_DIR.
+
+    A plain function, so it runs on the job thread pool: the rows are
+    streamed from a server-side cursor and formatted off the event loop.
+    The file appears under its final name only once complete.
+    """
+    fmt = run.payload.get("format", "csv")
+    stmt = fastjson.RowSchema(Invoice).select().where(Invoice.status != "paid")
+    if run.payload.get("patient_id") is not None:
+        stmt = stmt.where(Invoice.patient_id == run.payload["patient_id"])
+    stmt = stmt.order_by(Invoice.created_at, Invoice.id)
+
+    os.makedirs(jobs.JOB_EXPORT_DIR, exist_ok=True)
+    path = jobs.export_path(f"unpaid-invoices-{run.id}.{fmt}")
+    rows = 0
+    with Session(engine) as session, open(path + ".part", "w", newline="", encoding="utf-8") as f:
+        result = session.execute(stmt.execution_options(yield_per=STREAM_BATCH_SIZE))
+        keys = list(result.keys())
+        writer = csv.writer(f)
+        if fmt == "csv":
+            writer.writerow(keys)
+        for batch in result.partitions():
+            if fmt == "csv":
+                writer.writerows(batch)
+            else:
+                f.write("".join(json.dumps(dict(zip(keys, row)), default=_json_default) + "\n" for row in batch))
+            rows += len(batch)
+    os.replace(path + ".part", path)
+    return {"rows": rows, "format": fmt, "file": os.path.basename(path), "bytes": os.path.getsize(path)}
@@ -0,0 +1,84 @@
+import argparse
+import getpass
+from datetime import datetime
+from typing import Optional
+
+from sqlmodel import Session, select
+
+from app.models.organization import Organization
+from app.models.users import User
+from app.utils.security import PLATFORM_ROLE, hash_password
+
+# First accounts.
+#
+# Registration needs a signed-in caller (routers.auth.register), so a fresh
+# install has nobody who can sign in, and after migration 0004 an upgraded
+# one may have users it could not match to a clinic (login answers 403).
+# This command creates or updates one account directly in the database:
+#
+#   python -m app.utils.bootstrap admin --platform               # operator, sees every clinic
+#   python -m app.utils.bootstrap nurse1 --org "Kibera Clinic"   # staff of that clinic
+#
+# --org names an organization; it is created when no organization has that
+# name. An existing user keeps their password unless --password is given;
+# a new user is prompted for one. The platform account can then register
+# staff for any clinic through the API.
+
+def bootstrap(session: Session, username: str, org: Optional[str] = None, platform: bool = False,
+              password: Optional[str] = None, email: Optional[str] = None,
+              full_name: Optional[str] = None) -> User:
+    """Create or update `username` as staff of organization `org`, or as a platform user"""
+    org_id = None
+    if org:
+        organization = session.exec(select(Organization).where(Organization.name == org)).first()
+        if organization is None:
+            organization = Organization(name=org)
+            session.add(organization)
+            session.flush()
+        org_id = organization.id
+
+    user = session.exec(select(User).where(User.username == username)).first()
+    if user is None:
+        if not password:
+            raise ValueError(f"User {username} does not exist: a password is required")
+        user = User(username=username, email=email or f"{username}@localhost", full_name=full_name or username,
+                    password=hash_password(password))
+    elif password:
+        user.password = hash_password(password)
+    # platform accounts stay clinic-less: a token's org_id would scope them
+    user.org_id = None if platform else org_id
+    user.role = PLATFORM_ROLE if platform else "staff"
+    user.updated_at = datetime.utcnow()
+    session.add(user)
+    session.commit()
+    session.refresh(user)
+    return user
+
+def main():
+    parser = argparse.ArgumentParser(description="Create or update an account without the API")
+    parser.add_argument("username")
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--org", help="clinic name; created if no organization has it")
+    target.add_argument("--platform", action="store_true", help="operator account that sees every clinic")
+    parser.add_argument("--password", help="prompted for when a new user is created without one")
+    parser.add_argument("--email")
+    parser.add_argument("--full-name")
+    args = parser.parse_args()
+
+    import app.main  # noqa: F401 — registers every model on the metadata
+    from app.database import engine
+    from app.utils import migrations
+
+    migrations.ensure_schema()
+    with Session(engine) as session:
+        password = args.password
+        exists = session.exec(select(User.id).where(User.username == args.username)).first() is not None
+        if not password and not exists:
+            password = getpass.getpass(f"Password for {args.username}: ")
+        user = bootstrap(session, args.username, args.org, args.platform, password, args.email, args.full_name)
+        where = "every clinic" if args.platform else f"organization {user.org_id} ({args.org})"
+        print(f"✓ {user.username}: {user.role}, {where}")
+    engine.dispose()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.utils.conditional import http_date, is_fresh
+from app.utils.tenancy import current_org
+
+# Response cache for read-heavy GETs.
+#
+# Entries are keyed by route, query and the current *generation* of every
+# scope (patients, cases, ...) the route reads. Writers bump a scope's
+# generation after their commit, which orphans every entry built on the
+# old data at once; orphans age out through the LRU / TTL. Generations are
+# read before the handler queries, so a response racing a write is stored
+# under the old generation and never served after the bump.
+#
+# Each tenant (app.utils.tenancy) has its own entries and generations:
+# a tenant reads and bumps "<scope>@<org>", so one clinic's writes leave
+# the others' entries alone, plus "<scope>@*", which unscoped readers
+# (seeing every tenant) depend on. An unscoped write bumps the bare scope,
+# which everyone depends on.
+#
+# "memory" is per process: with several workers use "redis" so a write in
+# one worker invalidates the others. REDIS_URL=fake:// runs the redis code
+# path against an in-process stand-in (tests and benchmarks).
+RESPONSE_CACHE_BACKEND = settings.RESPONSE_CACHE_BACKEND
+RESPONSE_CACHE_SIZE = settings.RESPONSE_CACHE_SIZE
+REDIS_URL = settings.REDIS_URL
+# Per-route TTL overrides in seconds, e.g. "get_patient=600,dashboard_summary=5"
+RESPONSE_CACHE_TTLS = {
+    name.strip(): float(ttl)
+    for name, ttl in (item.split("=", 1) for item in settings.RESPONSE_CACHE_TTLS.split(",") if "=" in item)
+}
+
+PATIENTS = "patients"
+CASES = "cases"
+INVOICES = "invoices"
+VISITS = "visits"
+SCOPES = (PATIENTS, CASES, INVOICES, VISITS)
+
+REDIS_PREFIX = "neudebri:rc:"
+
+# etag, headers, body
+Entry = Tuple[str, Dict[str, str], bytes]
+
+class CachedRoute:
+    """A cacheable GET: its name, the scopes whose writes invalidate it, its TTL"""
+
+    def __init__(self, name: str, scopes: Sequence[str], ttl: float):
+        self.name = name
+        self.scopes = tuple(scopes)
+        self.ttl = RESPONSE_CACHE_TTLS.get(name, ttl)
+
+class MemoryBackend:
+    """Per-process LRU with per-entry expiry"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, Entry]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+
+    async def generations(self, scopes: Sequence[str]) -> List[int]:
+        return [self._generations.get(scope, 0) for scope in scopes]
+
+    async def bump(self, scopes: Sequence[str]):
+        for scope in scopes:
+            self._generations[scope] = self._generations.get(scope, 0) + 1
+
+    async def get(self, key: str) -> Optional[Entry]:
+        item = self._entries.get(key)
+        if item is None:
+            return None
+        if item[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return item[1]
+
+    async def set(self, key: str, entry: Entry, ttl: float):
+        self._entries[key] = (time.monotonic() + ttl, entry)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def size(self) -> int:
+        return len(self._entries)
+
+    async def close(self):
+        pass
+
+class RedisBackend:
+    """Shared cache in Redis: generations are INCR counters, entries expire via PX"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def generations(self, scopes: Sequence[str]) -> List[int]:
+        values = await self.client.mget([f"{REDIS_PREFIX}gen:{scope}" for scope in scopes])
+        return [int(value or 0) for value in values]
+
+    async def bump(self, scopes: Sequence[str]):
+        for scope in scopes:
+            await self.client.incr(f"{REDIS_PREFIX}gen:{scope}")
+
+    async def get(self, key: str) -> Optional[Entry]:
+        raw = await self.client.get(REDIS_PREFIX + key)
+        if raw is None:
+            return None
+        etag, headers, body = raw.split(b"\n", 2)
+        return etag.decode(), json.loads(headers), body
+
+    async def set(self, key: str, entry: Entry, ttl: float):
+        etag, headers, body = entry
+        raw = b"\n".join([etag.encode(), json.dumps(headers).encode(), body])
+        await self.client.set(REDIS_PREFIX + key, raw, px=max(1, int(ttl * 1000)))
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def close(self):
+        await self.client.aclose()
+
+class FakeRedis:
+    """In-process stand-in for the redis.asyncio commands RedisBackend uses"""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+
+    @staticmethod
+    def _bytes(value) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        if item[0] is not None and item[0] <= time.monotonic():
+            del self._data[key]
+            return None
+        return item[1]
+
+    async def mget(self, keys: Sequence[str]) -> List[Optional[bytes]]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value, px: Optional[int] = None):
+        self._data[key] = (time.monotonic() + px / 1000 if px else None, self._bytes(value))
+        return True
+
+    async def incr(self, key: str) -> int:
+        value = int(await self.get(key) or 0) + 1
+        self._data[key] = (None, self._bytes(value))
+        return value
+
+    async def aclose(self):
+        pass
+
+def _make_backend():
+    if RESPONSE_CACHE_BACKEND in ("off", "none", ""):
+        return None
+    if RESPONSE_CACHE_BACKEND == "redis":
+        if REDIS_URL.startswith("fake://"):
+            return RedisBackend(FakeRedis())
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            print("⚠️ RESPONSE_CACHE_BACKEND=redis but the redis package is not installed; using memory")
+            return MemoryBackend(RESPONSE_CACHE_SIZE)
+        return RedisBackend(redis.Redis.from_url(REDIS_URL))
+    return MemoryBackend(RESPONSE_CACHE_SIZE)
+
+backend = _make_backend()
+_stats = {"hits": 0, "misses": 0, "not_modified": 0, "errors": 0}
+
+def _backend_failed(action: str, error: Exception):
+    # the cache is an optimisation: an outage degrades to uncached reads
+    _stats["errors"] += 1
+    if _stats["errors"] == 1 or _stats["errors"] % 1000 == 0:
+        print(f"⚠️ Response cache {action} failed ({_stats['errors']} errors so far): {error}")
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _respond(request: Request, entry: Entry, outcome: str) -> Response:
+    etag, headers, body = entry
+    validators = {"ETag": etag, "Cache-Control": "private, no-cache", "X-Cache": outcome}
+    last_modified = headers.get("Last-Modified")
+    if last_modified:
+        validators["Last-Modified"] = last_modified
+    if is_fresh(request, etag, last_modified):
+        _stats["not_modified"] += 1
+        return Response(status_code=304, headers=validators)
+    return Response(body, media_type="application/json", headers={**headers, **validators})
+
+class Lookup:
+    """Result of `lookup`: `hit` is a ready response, else call `fill`"""
+
+    def __init__(self, request: Request, route: CachedRoute, key: Optional[str], hit: Optional[Response]):
+        self.request = request
+        self.route = route
+        self.key = key
+        self.hit = hit
+
+    async def fill(self, content, response: Optional[Response] = None,
+                   etag: Optional[str] = None, last_modified: Optional[datetime] = None) -> Response:
+        """Serialize `content` like a JSON route would (bytes are taken as
+        already-encoded JSON), cache it, and answer (304 if the client
+        already has it). Headers set on the route's injected `response`
+        (e.g. X-Next-Cursor) are kept with the entry. `etag` and
+        `last_modified` replace the body-hash ETag with the resource's own
+        validators (app.utils.conditional)."""
+        if isinstance(content, bytes):
+            body = content
+        else:
+            body = json.dumps(
+                jsonable_encoder(content), ensure_ascii=False, allow_nan=False, separators=(",", ":"),
+            ).encode()
+        headers = {}
+        if response is not None:
+            headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+        if last_modified is not None:
+            headers["Last-Modified"] = http_date(last_modified)
+        entry = (etag or _etag(body), headers, body)
+        if self.key is not None:
+            try:
+                await backend.set(self.key, entry, self.route.ttl)
+            except Exception as e:
+                _backend_failed("store", e)
+        return _respond(self.request, entry, "MISS")
+
+async def lookup(request: Request, route: CachedRoute) -> Lookup:
+    """Cached response for this request, keyed on the route's current generations"""
+    if backend is None or route.ttl <= 0:
+        return Lookup(request, route, None, None)
+    org_id = current_org()
+    tenant = "*" if org_id is None else str(org_id)
+    try:
+        generations = await backend.generations([*route.scopes, *(f"{scope}@{tenant}" for scope in route.scopes)])
+        query = urlencode(sorted(request.query_params.multi_items()))
+        key = f"{route.name}:{'.'.join(map(str, generations))}:{tenant}:{request.url.path}?{query}"
+        entry = await backend.get(key)
+    except Exception as e:
+        _backend_failed("lookup", e)
+        return Lookup(request, route, None, None)
+    if entry is None:
+        _stats["misses"] += 1
+        return Lookup(request, route, key, None)
+    _stats["hits"] += 1
+    return Lookup(request, route, key, _respond(request, entry, "HIT"))
+
+async def invalidate(*scopes: str):
+    """Orphan every cached response reading `scopes`; call after the commit"""
+    if backend is None or not scopes:
+        return
+    org_id = current_org()
+    if org_id is not None:
+        scopes = [*(f"{scope}@{org_id}" for scope in scopes), *(f"{scope}@*" for scope in scopes)]
+    try:
+        await backend.bump(scopes)
+    except Exception as e:
+        _backend_failed("invalidation", e)
+
+def stats() -> Dict:
+    lookups = _stats["hits"] + _stats["misses"]
+    return {
+        "backend": type(backend).__name__ if backend else "off",
+        "size": backend.size() if backend else 0,
+        **_stats,
+        "hit_ratio": round(_stats["hits"] / lookups, 3) if lookups else None,
+    }
+
+async def close():
+    if backend is not None:
+        await backend.close()
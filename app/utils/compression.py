@@ -0,0 +1,262 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+from starlette.datastructures import Headers, MutableHeaders
+
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # optional: br is offered only when installed
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional: zstd is offered only when installed
+    zstandard = None
+
+# Response compression.
+#
+# Most clients are mobile browsers on metered data, so text responses are
+# compressed with the best coding the client accepts: zstd or br when the
+# package is installed, gzip always. Bodies under COMPRESSION_MIN_SIZE go
+# out as they are (the framing would eat the saving). A streamed body
+# (NDJSON exports, file downloads) is compressed chunk by chunk and flushed
+# each time, so the client still receives rows as they are produced.
+#
+# A compressed body is a different representation, so a strong ETag gets
+# the coding appended ("<tag>-gzip"). Incoming If-None-Match tags have the
+# suffix removed before the route compares them, and a 304 echoes back
+# the tag the client sent.
+
+COMPRESSION_ENABLED = settings.COMPRESSION_ENABLED
+COMPRESSION_MIN_SIZE = settings.COMPRESSION_MIN_SIZE
+# Server preference, best first; codings whose package is missing are skipped
+COMPRESSION_ENCODINGS = [name.strip() for name in settings.COMPRESSION_ENCODINGS.split(",") if name.strip()]
+COMPRESSION_GZIP_LEVEL = settings.COMPRESSION_GZIP_LEVEL
+COMPRESSION_BROTLI_QUALITY = settings.COMPRESSION_BROTLI_QUALITY
+COMPRESSION_ZSTD_LEVEL = settings.COMPRESSION_ZSTD_LEVEL
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/x-ndjson", "application/problem+json",
+    "application/javascript", "application/xml", "image/svg+xml",
+)
+
+class Gzip:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self.level = level
+
+    def _compressobj(self):
+        # wbits=31: gzip framing
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = self._compressobj()
+        return compressor.compress(data) + compressor.flush()
+
+    def stream(self) -> "Stream":
+        compressor = self._compressobj()
+        return Stream(
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH),
+            compressor.flush,
+        )
+
+class Brotli:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self.quality = quality
+
+    def compress(self, data: bytes) -> bytes:
+        return brotli.compress(data, quality=self.quality)
+
+    def stream(self) -> "Stream":
+        compressor = brotli.Compressor(quality=self.quality)
+        return Stream(lambda chunk: compressor.process(chunk) + compressor.flush(), compressor.finish)
+
+class Zstd:
+    name = "zstd"
+
+    def __init__(self, level: int):
+        self.compressor = zstandard.ZstdCompressor(level=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self.compressor.compress(data)
+
+    def stream(self) -> "Stream":
+        compressor = self.compressor.compressobj()
+        return Stream(
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush,
+        )
+
+class Stream:
+    """Incremental compressor: `chunk` returns flushed output, `finish` the trailer"""
+    __slots__ = ("chunk", "finish")
+
+    def __init__(self, chunk, finish):
+        self.chunk = chunk
+        self.finish = finish
+
+def _make_encoders() -> Dict[str, object]:
+    available = {"gzip": lambda: Gzip(COMPRESSION_GZIP_LEVEL)}
+    if brotli is not None:
+        available["br"] = lambda: Brotli(COMPRESSION_BROTLI_QUALITY)
+    if zstandard is not None:
+        available["zstd"] = lambda: Zstd(COMPRESSION_ZSTD_LEVEL)
+    return {name: available[name]() for name in COMPRESSION_ENCODINGS if name in available}
+
+encoders = _make_encoders()
+# per coding: responses, bytes before and after
+_stats: Dict[str, List[int]] = {}
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    """The coding to use for this Accept-Encoding header, None for identity.
+
+    Highest q-value wins; ties go to the server's preference order.
+    """
+    if not accept_encoding or not encoders:
+        return None
+    weights: Dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        coding, _, params = item.partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding.strip()] = q
+    best, best_q = None, 0.0
+    for name in encoders:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+def _strip_suffixes(header: str) -> Tuple[str, Dict[str, str]]:
+    """If-None-Match without our coding suffixes, and base tag -> tag as sent"""
+    restored = {}
+    tags = []
+    for tag in header.split(","):
+        tag = tag.strip()
+        if not tag.startswith("W/"):
+            for name in encoders:
+                suffix = f'-{name}"'
+                if tag.endswith(suffix):
+                    base = tag[: -len(suffix)] + '"'
+                    restored[base] = tag
+                    tag = base
+                    break
+        tags.append(tag)
+    return ", ".join(tags), restored
+
+def _compressible(headers: MutableHeaders) -> bool:
+    if "content-encoding" in headers or "no-transform" in headers.get("cache-control", ""):
+        return False
+    return headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+
+def _record(name: str, before: int, after: int, responses: int = 1):
+    counts = _stats.setdefault(name, [0, 0, 0])
+    counts[0] += responses
+    counts[1] += before
+    counts[2] += after
+
+def _mark_encoded(headers: MutableHeaders, name: str):
+    headers["Content-Encoding"] = name
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/") and etag.endswith('"'):
+        headers["ETag"] = f'{etag[:-1]}-{name}"'
+
+class CompressionMiddleware:
+    """Pure ASGI middleware: negotiated, size-gated, streaming-aware compression"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoder = encoders.get(negotiate(request_headers.get("accept-encoding")))
+        restored: Dict[str, str] = {}
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match:
+            stripped, restored = _strip_suffixes(if_none_match)
+            if restored:
+                # in place: outer middleware reads what the router records in scope
+                raw = [(k, v) for k, v in scope["headers"] if k != b"if-none-match"]
+                scope["headers"] = [*raw, (b"if-none-match", stripped.encode("latin-1"))]
+
+        start = None
+        stream = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, stream, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = MutableHeaders(scope=start)
+                etag = headers.get("etag")
+                if start["status"] == 304 and etag in restored:
+                    headers["ETag"] = restored[etag]
+                if start["status"] < 200 or start["status"] in (204, 304) or not _compressible(headers):
+                    passthrough = True
+                    await send(start)
+                    return
+                headers.add_vary_header("Accept-Encoding")
+                if encoder is None:
+                    passthrough = True
+                    await send(start)
+                return
+
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if stream is None:
+                headers = MutableHeaders(scope=start)
+                if not more_body:
+                    # whole body in one message: compress it in one go, if it is worth it
+                    if len(body) >= COMPRESSION_MIN_SIZE:
+                        compressed = encoder.compress(body)
+                        _record(encoder.name, len(body), len(compressed))
+                        _mark_encoded(headers, encoder.name)
+                        headers["Content-Length"] = str(len(compressed))
+                        body = compressed
+                    await send(start)
+                    await send({"type": "http.response.body", "body": body})
+                    return
+                # streamed: length unknown up front
+                stream = encoder.stream()
+                _record(encoder.name, 0, 0)
+                _mark_encoded(headers, encoder.name)
+                del headers["Content-Length"]
+                await send(start)
+
+            chunk = stream.chunk(body) if body else b""
+            if not more_body:
+                chunk += stream.finish()
+            _record(encoder.name, len(body), len(chunk), responses=0)
+            await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+def stats() -> Dict:
+    result = {"encodings": list(encoders), "min_size": COMPRESSION_MIN_SIZE}
+    for name, (responses, before, after) in _stats.items():
+        result[name] = {
+            "responses": responses,
+            "bytes_in": before,
+            "bytes_out": after,
+            "ratio": round(after / before, 3) if before else None,
+        }
+    return result
@@ -0,0 +1,50 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+
+# Conditional GETs.
+#
+# Single-resource GETs (e.g. get_patient) carry validators taken from the
+# row's updated_at rather than from its body: a strong ETag over table,
+# id, updated_at and the column list (so a schema change re-tags every
+# row), and Last-Modified. A client revalidating with If-None-Match or
+# If-Modified-Since gets an empty 304 when the row has not changed.
+# Writers of such a row must bump updated_at.
+
+def resource_etag(row) -> str:
+    """Strong ETag for a table row with `id` and `updated_at`"""
+    table = row.__table__
+    raw = f"{table.name}:{row.id}:{row.updated_at.isoformat()}:{','.join(c.name for c in table.columns)}"
+    return '"' + hashlib.blake2b(raw.encode(), digest_size=16).hexdigest() + '"'
+
+def http_date(value: datetime) -> str:
+    """IMF-fixdate for a naive-UTC or aware datetime (seconds precision)"""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return format_datetime(value.astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+def _parse_date(value: str) -> Optional[datetime]:
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def is_fresh(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    """Whether the client's cached copy is current (answer 304).
+
+    If-None-Match wins when present (weak comparison, as for any GET);
+    If-Modified-Since is only consulted without it.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if not if_modified_since or not last_modified:
+        return False
+    since, modified = _parse_date(if_modified_since), _parse_date(last_modified)
+    return since is not None and modified is not None and modified <= since
@@ -0,0 +1,344 @@
+import asyncio
+import contextvars
+import functools
+import os
+import socket
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+
+from sqlalchemy import delete, func, insert, update
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_engine
+from app.models.jobs import Job
+from app.utils.tenancy import current_org, scoped_to
+
+# Background jobs.
+#
+# Work too slow for a request (month-end invoice batches, exports) is
+# enqueued as a row in `jobs` and the route answers 202 with the job id;
+# clients poll GET /api/jobs/{id}. Every app process runs one Worker on
+# its event loop: it claims due jobs with a single UPDATE ... RETURNING
+# (FOR UPDATE SKIP LOCKED on Postgres), so processes never run the same
+# job twice, and runs each as a task. Async handlers run on the loop,
+# plain functions on a small thread pool.
+#
+# A failed attempt is retried after JOB_RETRY_BACKOFF_SECONDS, doubling
+# each time, until the type's max_attempts; PermanentError fails at once.
+# A job whose worker died mid-run is requeued once its lease expires. A
+# plain-function handler past its timeout cannot be stopped, so its job
+# stays leased until the thread returns and is only then retried.
+# Concurrency is capped per process, overall and per job type.
+
+JOB_WORKER_ENABLED = settings.JOB_WORKER_ENABLED
+# Jobs in progress per process, all types together
+JOB_CONCURRENCY = settings.JOB_CONCURRENCY
+# "<type>=<n>" pairs overriding a type's own limit, e.g. "unpaid_export=1"
+JOB_TYPE_CONCURRENCY = {
+    name.strip(): int(n)
+    for name, n in (item.split("=", 1) for item in settings.JOB_TYPE_CONCURRENCY.split(",") if "=" in item)
+}
+# Idle workers look for due jobs this often; enqueues in the same process wake them at once
+JOB_POLL_SECONDS = settings.JOB_POLL_SECONDS
+JOB_LEASE_SECONDS = settings.JOB_LEASE_SECONDS
+JOB_RETRY_BACKOFF_SECONDS = settings.JOB_RETRY_BACKOFF_SECONDS
+# Threads for handlers that are plain (blocking) functions
+JOB_THREADS = settings.JOB_THREADS
+# Finished jobs, and files in JOB_EXPORT_DIR, are deleted after this many days (0 keeps them)
+JOB_RETENTION_DAYS = settings.JOB_RETENTION_DAYS
+# Where jobs write files for download (GET /api/jobs/{id}/download)
+JOB_EXPORT_DIR = settings.JOB_EXPORT_DIR
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+class PermanentError(Exception):
+    """Raised by a handler for a job that would fail the same way again: no retry"""
+
+class JobRun(NamedTuple):
+    """What a handler is given: the claimed job"""
+    id: int
+    type: str
+    payload: Dict[str, Any]
+    attempt: int
+    org_id: Optional[int]
+
+class JobType:
+    def __init__(self, name: str, handler: Callable, concurrency: int, max_attempts: int, timeout: float):
+        self.name = name
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+        self.blocking = not asyncio.iscoroutinefunction(handler)
+
+REGISTRY: Dict[str, JobType] = {}
+
+def job_type(name: str, concurrency: int = 1, max_attempts: int = 3, timeout: float = 600):
+    """Register `handler(run: JobRun) -> dict` as the handler of a job type.
+
+    The returned dict is stored as the job's result.
+    """
+    def register(handler):
+        REGISTRY[name] = JobType(name, handler, JOB_TYPE_CONCURRENCY.get(name, concurrency), max_attempts, timeout)
+        return handler
+    return register
+
+async def enqueue(session: AsyncSession, type: str, payload: Dict, created_by: Optional[str] = None) -> Job:
+    """Persist one job and wake this process's worker"""
+    job = Job(type=type, payload=payload, max_attempts=REGISTRY[type].max_attempts, created_by=created_by)
+    session.add(job)
+    await session.commit()
+    await session.refresh(job)
+    worker.wake()
+    return job
+
+async def enqueue_many(session: AsyncSession, type: str, payloads: Iterable[Dict],
+                       created_by: Optional[str] = None) -> int:
+    """Persist many jobs of one type in a single INSERT"""
+    now = datetime.utcnow()
+    org_id = current_org()
+    max_attempts = REGISTRY[type].max_attempts
+    rows = [
+        {"type": type, "status": QUEUED, "payload": payload, "attempts": 0, "max_attempts": max_attempts,
+         "run_after": now, "created_by": created_by, "org_id": org_id, "created_at": now}
+        for payload in payloads
+    ]
+    if rows:
+        await session.execute(insert(Job), rows)
+        await session.commit()
+        worker.wake()
+    return len(rows)
+
+def export_path(name: str) -> str:
+    """Path of a job's output file, by the name its result reports as `file`"""
+    return os.path.join(JOB_EXPORT_DIR, os.path.basename(name))
+
+def backoff(attempt: int) -> float:
+    return JOB_RETRY_BACKOFF_SECONDS * 2 ** (attempt - 1)
+
+class Worker:
+    """Claims and runs due jobs for this process"""
+
+    def __init__(self, concurrency: int = JOB_CONCURRENCY, poll_seconds: float = JOB_POLL_SECONDS):
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self.running: Counter = Counter()
+        self.counts = {"claimed": 0, "succeeded": 0, "retried": 0, "failed": 0}
+        self._tasks: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def wake(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def start(self):
+        # the id is taken here, not at import: `python -m app` forks workers after importing
+        self.id = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Cancel running jobs and hand them back to the queue for the next process"""
+        if self._loop_task is None:
+            return
+        self._loop_task.cancel()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(self._loop_task, *self._tasks, return_exceptions=True)
+        self._loop_task = None
+        async with AsyncSession(async_engine) as session:
+            await session.execute(
+                update(Job).where(Job.status == RUNNING, Job.locked_by == self.id)
+                .values(status=QUEUED, attempts=Job.attempts - 1, locked_by=None, locked_at=None)
+            )
+            await session.commit()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def _run(self):
+        next_sweep = 0.0
+        while True:
+            if time.monotonic() >= next_sweep:
+                try:
+                    await self.sweep()
+                except Exception as e:
+                    print(f"⚠️ Job sweep failed: {e}")
+                next_sweep = time.monotonic() + max(1.0, JOB_LEASE_SECONDS / 2)
+            self._wake.clear()
+            try:
+                claimed = await self.claim()
+            except Exception as e:
+                print(f"⚠️ Job claim failed: {e}")
+                claimed = 0
+            if not claimed:
+                try:
+                    async with asyncio.timeout(self.poll_seconds):
+                        await self._wake.wait()
+                except TimeoutError:
+                    pass
+
+    async def claim(self) -> int:
+        """Start as many due jobs as the concurrency limits allow"""
+        free = self.concurrency - sum(self.running.values())
+        claimed = 0
+        for job_type in REGISTRY.values():
+            n = min(free - claimed, job_type.concurrency - self.running[job_type.name])
+            if n <= 0:
+                continue
+            for row in await self._claim(job_type.name, n):
+                run = JobRun(row.id, job_type.name, row.payload, row.attempts, row.org_id)
+                self._start(job_type, run, row.max_attempts)
+                claimed += 1
+        self.counts["claimed"] += claimed
+        return claimed
+
+    async def _claim(self, name: str, n: int):
+        now = datetime.utcnow()
+        async with AsyncSession(async_engine) as session:
+            due = (
+                select(Job.id)
+                .where(Job.status == QUEUED, Job.type == name, Job.run_after <= now)
+                .order_by(Job.run_after, Job.id)
+                .limit(n)
+            )
+            if session.bind.dialect.name == "postgresql":
+                due = due.with_for_update(skip_locked=True)
+            rows = (await session.execute(
+                update(Job)
+                .where(Job.id.in_(due.scalar_subquery()), Job.status == QUEUED)
+                .values(status=RUNNING, attempts=Job.attempts + 1, locked_by=self.id, locked_at=now, started_at=now)
+                .returning(Job.id, Job.payload, Job.attempts, Job.max_attempts, Job.org_id)
+            )).all()
+            await session.commit()
+        return rows
+
+    def _start(self, job_type: JobType, run: JobRun, max_attempts: int):
+        self.running[job_type.name] += 1
+        task = asyncio.create_task(self._execute(job_type, run, max_attempts))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job_type: JobType, run: JobRun, max_attempts: int):
+        try:
+            try:
+                # the handler sees the data of the tenant that queued the job
+                with scoped_to(run.org_id):
+                    if job_type.blocking:
+                        result = await self._run_blocking(job_type, run)
+                    else:
+                        async with asyncio.timeout(job_type.timeout):
+                            result = await job_type.handler(run)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._failed(run, max_attempts, e)
+            else:
+                await self._finish(run.id, status=SUCCEEDED, result=result, error=None)
+                self.counts["succeeded"] += 1
+        finally:
+            self.running[job_type.name] -= 1
+            self.wake()
+
+    async def _run_blocking(self, job_type: JobType, run: JobRun):
+        """Run a plain-function handler on the thread pool.
+
+        A thread cannot be interrupted: on timeout the job keeps its lease
+        (and its concurrency slot) until the handler returns, so the retry
+        never runs alongside the attempt that timed out.
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(JOB_THREADS, thread_name_prefix="job")
+        loop = asyncio.get_running_loop()
+        call = functools.partial(contextvars.copy_context().run, job_type.handler, run)
+        future = loop.run_in_executor(self._executor, call)
+        try:
+            async with asyncio.timeout(job_type.timeout):
+                return await asyncio.shield(future)
+        except TimeoutError:
+            while not future.done():
+                await asyncio.wait({future}, timeout=JOB_LEASE_SECONDS / 2)
+                await self._renew(run.id)
+            future.exception()  # the attempt's outcome no longer matters: it timed out
+            raise
+
+    async def _renew(self, job_id: int):
+        """Push back the lease of a job this worker still holds"""
+        async with AsyncSession(async_engine) as session:
+            await session.execute(
+                update(Job).where(Job.id == job_id, Job.locked_by == self.id).values(locked_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def _failed(self, run: JobRun, max_attempts: int, error: Exception):
+        message = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        if run.attempt < max_attempts and not isinstance(error, PermanentError):
+            run_after = datetime.utcnow() + timedelta(seconds=backoff(run.attempt))
+            await self._finish(run.id, status=QUEUED, error=message, run_after=run_after, finished_at=None)
+            self.counts["retried"] += 1
+        else:
+            await self._finish(run.id, status=FAILED, error=message)
+            self.counts["failed"] += 1
+            print(f"⚠️ Job {run.id} ({run.type}) failed after {run.attempt} attempt(s): {message}")
+
+    async def _finish(self, job_id: int, **values):
+        values.setdefault("finished_at", datetime.utcnow())
+        async with AsyncSession(async_engine) as session:
+            await session.execute(
+                update(Job).where(Job.id == job_id, Job.locked_by == self.id)
+                .values(locked_by=None, locked_at=None, **values)
+            )
+            await session.commit()
+
+    async def sweep(self):
+        """Requeue jobs whose lease expired (their worker died); drop old finished jobs and files"""
+        now = datetime.utcnow()
+        expired = (Job.status == RUNNING) & (Job.locked_at < now - timedelta(seconds=JOB_LEASE_SECONDS))
+        async with AsyncSession(async_engine) as session:
+            await session.execute(
+                update(Job).where(expired, Job.attempts >= Job.max_attempts)
+                .values(status=FAILED, error="Lease expired", locked_by=None, locked_at=None, finished_at=now)
+            )
+            await session.execute(
+                update(Job).where(expired).values(status=QUEUED, locked_by=None, locked_at=None, run_after=now)
+            )
+            if JOB_RETENTION_DAYS > 0:
+                await session.execute(delete(Job).where(
+                    Job.status.in_([SUCCEEDED, FAILED]), Job.finished_at < now - timedelta(days=JOB_RETENTION_DAYS),
+                ))
+            await session.commit()
+        if JOB_RETENTION_DAYS > 0 and os.path.isdir(JOB_EXPORT_DIR):
+            cutoff = time.time() - JOB_RETENTION_DAYS * 86400
+            for entry in os.scandir(JOB_EXPORT_DIR):
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+
+    def stats(self) -> Dict:
+        return {
+            "worker": self.id if self._loop_task else None,
+            "concurrency": self.concurrency,
+            "running": {name: n for name, n in self.running.items() if n},
+            **self.counts,
+        }
+
+worker = Worker()
+
+def stats() -> Dict:
+    return worker.stats()
+
+async def queue_depth(session: AsyncSession) -> List[Dict]:
+    """Jobs per type and status, for the jobs overview"""
+    rows = (await session.exec(
+        select(Job.type, Job.status, func.count()).group_by(Job.type, Job.status).order_by(Job.type, Job.status)
+    )).all()
+    return [{"type": t, "status": s, "count": n} for t, s, n in rows]
@@ -0,0 +1,195 @@
+import argparse
+import hashlib
+import importlib
+import os
+import re
+from typing import List, Optional, Sequence
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlmodel import SQLModel, select
+
+from app.config import settings
+from app.models.schema import SchemaMigration, SchemaVersion
+
+# Built-in schema migrations.
+#
+# Each file app/migrations/NNNN_name.py defines upgrade(conn) and runs
+# once per database, in version order; applied versions are recorded in
+# schema_migrations. Migrations run transactionally unless the module
+# sets TRANSACTIONAL = False (e.g. CREATE INDEX CONCURRENTLY on Postgres).
+#
+#   python -m app.utils.migrations            # apply pending migrations
+#   python -m app.utils.migrations status     # list applied / pending
+#
+# Startup skips create_all and the migration scan when the database's
+# stored schema version (a fingerprint of every table, column, index and
+# migration this build declares) matches: one query instead of a DDL check
+# per table on every worker boot.
+
+# Apply pending migrations when the app starts
+MIGRATE_ON_STARTUP = settings.MIGRATE_ON_STARTUP
+# auto: check the schema only when the stored version differs; always; off
+# (deploys run `python -m app.utils.migrations` instead)
+SCHEMA_CHECK = settings.SCHEMA_CHECK
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE = re.compile(r"^(\d{4})_(\w+)\.py$")
+# Postgres advisory lock key: one migrator at a time across workers
+ADVISORY_LOCK_ID = 7_420_250_001
+
+class Migration:
+    def __init__(self, version: str, name: str):
+        self.version = version
+        self.name = name
+
+    @property
+    def module(self):
+        return importlib.import_module(f"app.migrations.{self.version}_{self.name}")
+
+def discover() -> List[Migration]:
+    """Every migration file, in version order"""
+    migrations = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = MIGRATION_FILE.match(filename)
+        if match:
+            migrations.append(Migration(*match.groups()))
+    return migrations
+
+def create_index(conn: Connection, name: str, table: str, columns: Sequence[str], where: Optional[str] = None,
+                 unique: bool = False):
+    """CREATE INDEX IF NOT EXISTS, built CONCURRENTLY on Postgres outside a transaction"""
+    autocommit = conn.get_execution_options().get("isolation_level") == "AUTOCOMMIT"
+    concurrently = conn.dialect.name == "postgresql" and autocommit
+    sql = (
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX {'CONCURRENTLY ' if concurrently else ''}IF NOT EXISTS {name} "
+        f"ON {table} ({', '.join(columns)})"
+    )
+    if where:
+        sql += f" WHERE {where}"
+    conn.execute(text(sql))
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> bool:
+    """ALTER TABLE ... ADD COLUMN unless the table (e.g. made by create_all) has it"""
+    if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+        return False
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+    return True
+
+def applied_versions(engine: Engine) -> set:
+    SchemaMigration.__table__.create(engine, checkfirst=True)
+    with engine.connect() as conn:
+        return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+def _apply(engine: Engine, migration: Migration):
+    module = migration.module
+    if getattr(module, "TRANSACTIONAL", True):
+        with engine.begin() as conn:
+            module.upgrade(conn)
+            conn.execute(SchemaMigration.__table__.insert().values(version=migration.version, name=migration.name))
+        return
+    # non-transactional: every statement autocommits, so upgrade() must be
+    # idempotent (IF NOT EXISTS) in case a previous run died half-way
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        module.upgrade(conn)
+    try:
+        with engine.begin() as conn:
+            conn.execute(SchemaMigration.__table__.insert().values(version=migration.version, name=migration.name))
+    except IntegrityError:
+        pass  # another worker recorded it first
+
+def upgrade(engine: Optional[Engine] = None) -> List[str]:
+    """Apply every pending migration; returns the versions applied"""
+    if engine is None:
+        from app.database import engine
+    done = []
+    lock = None
+    if engine.dialect.name == "postgresql":
+        lock = engine.connect()
+        lock.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+    try:
+        applied = applied_versions(engine)
+        for migration in discover():
+            if migration.version in applied:
+                continue
+            _apply(engine, migration)
+            print(f"✓ Migration {migration.version}_{migration.name} applied")
+            done.append(migration.version)
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+            lock.close()
+    return done
+
+def schema_version() -> str:
+    """Fingerprint of the schema this build declares (models must be imported)"""
+    digest = hashlib.blake2b(digest_size=12)
+    for table in sorted(SQLModel.metadata.tables.values(), key=lambda t: t.name):
+        digest.update(f"table {table.name}\n".encode())
+        for column in table.columns:
+            digest.update(f"{column.name} {column.type} {column.nullable} {column.primary_key}\n".encode())
+        for index in sorted(table.indexes, key=lambda i: i.name):
+            digest.update(f"index {index.name} {[c.name for c in index.columns]} {index.unique}\n".encode())
+    for migration in discover():
+        digest.update(f"migration {migration.version}_{migration.name}\n".encode())
+    return digest.hexdigest()
+
+def stored_schema_version(engine: Engine) -> Optional[str]:
+    try:
+        with engine.connect() as conn:
+            return conn.execute(select(SchemaVersion.fingerprint).where(SchemaVersion.id == 1)).scalar()
+    except DBAPIError:
+        return None  # no schema_version table yet
+
+def record_schema_version(engine: Engine, fingerprint: str):
+    with engine.begin() as conn:
+        conn.execute(SchemaVersion.__table__.delete())
+        conn.execute(SchemaVersion.__table__.insert().values(id=1, fingerprint=fingerprint))
+
+def ensure_schema(engine: Optional[Engine] = None) -> bool:
+    """Startup schema check: create tables and apply pending migrations,
+    unless the stored schema version is current. Returns whether it ran."""
+    from app.database import create_db_and_tables
+    if engine is None:
+        from app.database import engine
+    if SCHEMA_CHECK == "off":
+        return False
+    fingerprint = schema_version()
+    if SCHEMA_CHECK == "auto" and stored_schema_version(engine) == fingerprint:
+        return False
+    create_db_and_tables()
+    if MIGRATE_ON_STARTUP:
+        upgrade(engine)
+    if all(m["applied"] for m in status(engine)):
+        record_schema_version(engine, fingerprint)
+    return True
+
+def status(engine: Optional[Engine] = None) -> List[dict]:
+    if engine is None:
+        from app.database import engine
+    applied = applied_versions(engine)
+    return [
+        {"version": m.version, "name": m.name, "applied": m.version in applied}
+        for m in discover()
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply or list schema migrations")
+    parser.add_argument("command", nargs="?", choices=["upgrade", "status"], default="upgrade")
+    args = parser.parse_args()
+
+    from app.database import create_db_and_tables, engine
+    if args.command == "status":
+        for m in status(engine):
+            print(f"{'✓' if m['applied'] else '·'} {m['version']}_{m['name']}")
+        return
+    # tables first: migrations alter what create_all made
+    import app.main  # noqa: F401 — registers every model on the metadata
+    create_db_and_tables()
+    applied = upgrade(engine)
+    record_schema_version(engine, schema_version())
+    print(f"✓ {len(applied)} migration(s) applied" if applied else "✓ Schema up to date")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import tuple_
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import read_engine
+
+# Rows fetched per round-trip when streaming NDJSON exports
+STREAM_BATCH_SIZE = settings.STREAM_BATCH_SIZE
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor — 400 on anything we did not issue"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset(stmt, model, cursor: Optional[str] = None):
+    """Order `stmt` by (created_at, id) and start after `cursor`.
+
+    Unlike OFFSET, the database seeks straight to the cursor position, so
+    page 1000 costs the same as page 1.
+    """
+    stmt = stmt.order_by(model.created_at, model.id)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(model.created_at, model.id) > tuple_(created_at, row_id))
+    return stmt
+
+def set_next_cursor(response: Response, rows: Sequence, limit: int):
+    """Expose the cursor for the following page when this one was full"""
+    if rows and len(rows) >= limit:
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+
+def ndjson_response(stmt) -> StreamingResponse:
+    """Stream every row of `stmt` as NDJSON from a server-side cursor.
+
+    Rows are fetched STREAM_BATCH_SIZE at a time and released once written,
+    so memory stays flat however large the export is. The stream owns its
+    own session because it outlives the request's dependencies.
+    """
+    async def lines():
+        async with AsyncSession(read_engine) as session:
+            result = await session.stream_scalars(
+                stmt.execution_options(yield_per=STREAM_BATCH_SIZE)
+            )
+            async for batch in result.partitions():
+                yield "".join(row.model_dump_json() + "\n" for row in batch)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
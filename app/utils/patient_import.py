@@ -0,0 +1,199 @@
+import codecs
+import csv
+import json
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.patients import Patient
+from app.utils import cache, search
+from app.utils import sync
+from app.utils import summary as counters
+from app.utils.tenancy import current_org
+
+# Rows per INSERT ... VALUES batch (and per transaction)
+IMPORT_BATCH_SIZE = settings.IMPORT_BATCH_SIZE
+# Row errors listed in the report; the counts stay exact past this
+IMPORT_MAX_ERRORS = settings.IMPORT_MAX_ERRORS
+
+IMPORT_FIELDS = ("first_name", "last_name", "email", "phone", "date_of_birth", "gender", "location", "org_id")
+
+def iter_rows(stream, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Lazily yield (row number, raw record) from a CSV or NDJSON byte stream"""
+    text = codecs.iterdecode(stream, "utf-8-sig")
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, record
+        return
+    for number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError as e:
+            yield number, e
+
+def phone_variants(phone: str) -> List[str]:
+    """Spellings of one number as it may already be stored (0712.., +254712.., 254712..)"""
+    normalized = search.normalize_phone(phone)
+    variants = {phone, normalized}
+    if normalized.startswith("254"):
+        local = normalized[3:]
+        variants.update({"0" + local, "+254" + local})
+    return [v for v in variants if v]
+
+class ImportReport:
+    def __init__(self):
+        self.received = 0
+        self.inserted = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+
+    def reject(self, row: int, message: str, duplicate: bool = False):
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < IMPORT_MAX_ERRORS:
+            self.errors.append({"row": row, "error": message})
+
+    def as_dict(self) -> Dict:
+        return {
+            "received": self.received,
+            "inserted": self.inserted,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.duplicates + self.failed > len(self.errors),
+        }
+
+def validate(record) -> Dict:
+    """Validate one raw record against the Patient model; returns insertable values"""
+    if isinstance(record, Exception):
+        raise ValueError(f"invalid JSON: {record}")
+    if not isinstance(record, dict):
+        raise ValueError("expected an object")
+    # CSV has no nulls: treat empty cells as missing
+    data = {k: v for k, v in record.items() if k in IMPORT_FIELDS and v not in ("", None)}
+    patient = Patient.model_validate(data)
+    values = patient.model_dump(exclude={"id"})
+    if values["email"]:
+        values["email"] = values["email"].strip().lower()
+    return values
+
+class PatientImporter:
+    """Validate, de-duplicate and batch-insert patients, one transaction per batch"""
+
+    def __init__(self, session: AsyncSession, batch_size: int = IMPORT_BATCH_SIZE):
+        self.session = session
+        self.batch_size = max(1, batch_size)
+        self.report = ImportReport()
+        self.seen_emails: Set[str] = set()
+        self.seen_phones: Set[str] = set()
+        self.batch: List[Tuple[int, Dict]] = []
+
+    async def run(self, rows: Iterator[Tuple[int, object]]) -> Dict:
+        for number, record in rows:
+            self.report.received += 1
+            try:
+                values = validate(record)
+            except ValidationError as e:
+                self.report.reject(number, _describe(e))
+                continue
+            except ValueError as e:
+                self.report.reject(number, str(e))
+                continue
+            duplicate = self._seen(values)
+            if duplicate:
+                self.report.reject(number, f"duplicate {duplicate} in upload", duplicate=True)
+                continue
+            self.batch.append((number, values))
+            if len(self.batch) >= self.batch_size:
+                await self.flush()
+        await self.flush()
+        return self.report.as_dict()
+
+    def _seen(self, values: Dict) -> Optional[str]:
+        email, phone = values["email"], search.normalize_phone(values["phone"])
+        if email and email in self.seen_emails:
+            return f"email {email}"
+        if phone and phone in self.seen_phones:
+            return f"phone {values['phone']}"
+        if email:
+            self.seen_emails.add(email)
+        if phone:
+            self.seen_phones.add(phone)
+        return None
+
+    async def _existing(self, batch: List[Tuple[int, Dict]]) -> Tuple[Set[str], Set[str]]:
+        emails = [v["email"] for _, v in batch if v["email"]]
+        phones = [p for _, v in batch if v["phone"] for p in phone_variants(v["phone"])]
+        taken_emails, taken_phones = set(), set()
+        if emails:
+            taken_emails = set((await self.session.exec(
+                select(Patient.email).where(Patient.email.in_(emails))
+            )).all())
+        if phones:
+            taken_phones = {search.normalize_phone(p) for p in (await self.session.exec(
+                select(Patient.phone).where(Patient.phone.in_(phones))
+            )).all()}
+        return taken_emails, taken_phones
+
+    async def flush(self):
+        batch, self.batch = self.batch, []
+        if not batch:
+            return
+        taken_emails, taken_phones = await self._existing(batch)
+        fresh = []
+        for number, values in batch:
+            if values["email"] and values["email"] in taken_emails:
+                self.report.reject(number, f"duplicate email {values['email']} already registered", duplicate=True)
+            elif values["phone"] and search.normalize_phone(values["phone"]) in taken_phones:
+                self.report.reject(number, f"duplicate phone {values['phone']} already registered", duplicate=True)
+            else:
+                fresh.append((number, values))
+        if not fresh:
+            await self.session.commit()
+            return
+        try:
+            await self._insert(fresh)
+        except IntegrityError:
+            # a concurrent writer won a race: isolate the offending rows
+            await self.session.rollback()
+            for number, values in fresh:
+                try:
+                    await self._insert([(number, values)])
+                except IntegrityError as e:
+                    await self.session.rollback()
+                    self.report.reject(number, f"conflict: {e.orig}")
+
+    async def _insert(self, rows: List[Tuple[int, Dict]]):
+        # Core insert on the table (not the ORM entity): one executemany,
+        # batched into multi-row VALUES by the driver layer. RETURNING gives
+        # back exactly what the search index needs, so row order is irrelevant.
+        # a tenant's import lands in its own organisation, whatever the file says
+        org_id = current_org()
+        values = [{**row, "org_id": org_id} if org_id is not None else row for _, row in rows]
+        table = Patient.__table__
+        result = await self.session.execute(
+            insert(table).returning(table.c.id, table.c.first_name, table.c.last_name, table.c.phone, table.c.org_id),
+            values,
+        )
+        inserted = result.all()
+        await search.index_patients(self.session, inserted)
+        await sync.record_changes(self.session, "patients", [(row.id, row.org_id) for row in inserted])
+        for org, n in Counter(row.get("org_id") for row in values).items():
+            await counters.bump(self.session, {counters.PATIENTS: n}, org)
+        await self.session.commit()
+        await cache.invalidate(cache.PATIENTS)
+        self.report.inserted += len(rows)
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors())
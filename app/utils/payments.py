@@ -0,0 +1,204 @@
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import bindparam, case, insert, update
+from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.models.invoices import Invoice, Payment
+from app.utils import cache
+from app.utils import summary as counters
+
+# Payment posting.
+#
+# A single payment is applied with one UPDATE ... SET paid_amount =
+# paid_amount + :x RETURNING, so concurrent callbacks for the same invoice
+# never lose an update and need no application-level serialisation.
+# Payment.reference (the M-Pesa receipt number) is unique: a replayed
+# callback gets the original payment back instead of paying twice.
+
+# Payments per settlement request (one transaction)
+SETTLEMENT_MAX_PAYMENTS = settings.SETTLEMENT_MAX_PAYMENTS
+# Retry-After for a payment that waited out SQLite's busy_timeout
+PAYMENT_RETRY_AFTER = settings.PAYMENT_RETRY_AFTER
+
+PAID = "paid"
+PARTIALLY_PAID = "partially_paid"
+
+def _status(paid_amount, amount):
+    """Invoice status for a paid amount (SQL expression or plain values)"""
+    if isinstance(paid_amount, (int, float)):
+        return PAID if paid_amount >= amount else PARTIALLY_PAID
+    return case((paid_amount >= amount, PAID), else_=PARTIALLY_PAID)
+
+async def _ledger_busy(session: AsyncSession, error: OperationalError):
+    """SQLite's single writer was held past busy_timeout: nothing was applied,
+    so ask the caller (e.g. the M-Pesa gateway) to retry rather than fail"""
+    if "database is locked" not in str(error.orig):
+        raise error
+    await session.rollback()
+    raise HTTPException(
+        status_code=503,
+        detail="Payment ledger busy, please retry",
+        headers={"Retry-After": str(PAYMENT_RETRY_AFTER)},
+    )
+
+async def _replayed(session: AsyncSession, invoice_id: int, reference: str) -> Payment:
+    existing = (await session.exec(select(Payment).where(Payment.reference == reference))).first()
+    if existing is None:
+        raise HTTPException(status_code=409, detail="Payment conflicts with a concurrent write, retry")
+    if existing.invoice_id != invoice_id:
+        raise HTTPException(status_code=409, detail=f"Reference {reference} already paid invoice {existing.invoice_id}")
+    return existing
+
+async def post_payment(session: AsyncSession, invoice_id: int, payment: Payment) -> Tuple[Payment, bool]:
+    """Apply one payment atomically; returns (payment, created).
+
+    A payment whose reference was already posted returns the original
+    with created=False and changes nothing.
+    """
+    if not payment.amount or payment.amount <= 0:
+        raise HTTPException(status_code=400, detail="Payment amount must be positive")
+    if payment.reference:
+        existing = (await session.exec(select(Payment).where(Payment.reference == payment.reference))).first()
+        if existing is not None:
+            return await _replayed(session, invoice_id, payment.reference), False
+
+    # the UPDATE takes the invoice's row (Postgres) or write (SQLite) lock
+    # first, so a racing duplicate reference blocks here and then fails
+    # the unique index below instead of double-counting
+    try:
+        row = (await session.execute(
+            update(Invoice)
+            .where(Invoice.id == invoice_id)
+            .values(
+                paid_amount=Invoice.paid_amount + payment.amount,
+                status=_status(Invoice.paid_amount + payment.amount, Invoice.amount),
+            )
+            .returning(Invoice.paid_amount, Invoice.amount, Invoice.org_id)
+        )).first()
+    except OperationalError as e:
+        await _ledger_busy(session, e)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Invoice not found")
+
+    payment.id = None
+    payment.invoice_id = invoice_id
+    session.add(payment)
+    try:
+        await session.flush()
+    except IntegrityError:
+        await session.rollback()
+        return await _replayed(session, invoice_id, payment.reference), False
+
+    paid_amount, amount, org_id = row
+    if paid_amount >= amount and paid_amount - payment.amount < amount:
+        await counters.bump(session, {counters.UNPAID_INVOICES: -1}, org_id)
+    await session.commit()
+    await cache.invalidate(cache.INVOICES)
+    await session.refresh(payment)
+    return payment, True
+
+class Settlement:
+    """Apply a reconciled batch of mobile-money payments in one transaction.
+
+    Payments whose reference is already posted (or repeated in the batch)
+    are reported as duplicates; payments for unknown invoices or with a
+    non-positive amount are reported as errors. Everything else is
+    inserted in one executemany, and each touched invoice gets a single
+    update with the batch's total for it.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.duplicates: List[str] = []
+        self.errors: List[Dict] = []
+
+    def _fail(self, index: int, reference: Optional[str], message: str):
+        self.errors.append({"index": index, "reference": reference, "error": message})
+
+    async def run(self, items: List) -> Dict:
+        references = {item.reference for item in items}
+        posted = set((await self.session.exec(
+            select(Payment.reference).where(Payment.reference.in_(references))
+        )).all())
+        known = set((await self.session.exec(
+            select(Invoice.id).where(Invoice.id.in_({item.invoice_id for item in items}))
+        )).all())
+
+        rows: List[Dict] = []
+        seen = set()
+        now = datetime.utcnow()
+        for i, item in enumerate(items):
+            if item.reference in posted or item.reference in seen:
+                self.duplicates.append(item.reference)
+            elif item.invoice_id not in known:
+                self._fail(i, item.reference, f"Invoice {item.invoice_id} not found")
+            elif item.amount <= 0:
+                self._fail(i, item.reference, "Payment amount must be positive")
+            else:
+                seen.add(item.reference)
+                rows.append({
+                    "invoice_id": item.invoice_id, "amount": item.amount, "method": item.method,
+                    "reference": item.reference, "paid_at": item.paid_at or now, "created_at": now,
+                })
+
+        invoices_updated = newly_paid = 0
+        if rows:
+            try:
+                await self.session.execute(insert(Payment), rows)
+            except IntegrityError:
+                await self.session.rollback()
+                raise HTTPException(status_code=409, detail="A payment in the batch was posted concurrently, retry")
+            except OperationalError as e:
+                await _ledger_busy(self.session, e)
+            invoices_updated, paid_per_org = await self._apply(rows)
+            newly_paid = sum(paid_per_org.values())
+            for org_id, n in paid_per_org.items():
+                await counters.bump(self.session, {counters.UNPAID_INVOICES: -n}, org_id)
+        await self.session.commit()
+        if rows:
+            await cache.invalidate(cache.INVOICES)
+
+        return {
+            "received": len(items),
+            "applied": len(rows),
+            "duplicates": self.duplicates,
+            "failed": len(self.errors),
+            "errors": self.errors,
+            "invoices_updated": invoices_updated,
+            "invoices_paid": newly_paid,
+        }
+
+    async def _apply(self, rows: List[Dict]) -> Tuple[int, Dict[Optional[int], int]]:
+        """Add each invoice's batch total; returns (invoices updated, invoices newly paid per org)"""
+        totals: Dict[int, float] = {}
+        for row in rows:
+            totals[row["invoice_id"]] = totals.get(row["invoice_id"], 0) + row["amount"]
+
+        # Lock the invoices (FOR UPDATE on Postgres, in id order so two
+        # settlements cannot deadlock; SQLite already holds the write lock
+        # from the insert above), then write each new total once.
+        current = (await self.session.exec(
+            select(Invoice.id, Invoice.paid_amount, Invoice.amount, Invoice.org_id)
+            .where(Invoice.id.in_(totals))
+            .order_by(Invoice.id)
+            .with_for_update()
+        )).all()
+        updates = []
+        newly_paid: Dict[Optional[int], int] = {}
+        for invoice_id, paid_amount, amount, org_id in current:
+            new_paid = paid_amount + totals[invoice_id]
+            if paid_amount < amount <= new_paid:
+                newly_paid[org_id] = newly_paid.get(org_id, 0) + 1
+            updates.append({"_id": invoice_id, "_paid": new_paid, "_status": _status(new_paid, amount)})
+        await self.session.execute(
+            update(Invoice.__table__)
+            .where(Invoice.__table__.c.id == bindparam("_id"))
+            .values(paid_amount=bindparam("_paid"), status=bindparam("_status")),
+            updates,
+        )
+        return len(updates), newly_paid
@@ -0,0 +1,127 @@
+import json
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.config import settings
+
+# Development query profiler: per-request statement log, flagging
+# repeated statements (N+1 lookups) and slow ones. Off unless DB_PROFILE
+# is set; tests bound the queries an endpoint runs with capture_queries,
+# through the query_budget fixture (tests/conftest.py).
+
+DB_PROFILE = settings.DB_PROFILE
+# Statements slower than this are reported
+DB_SLOW_QUERY_MS = settings.DB_SLOW_QUERY_MS
+# Same SQL this many times in one request is reported as a likely N+1
+DB_REPEAT_THRESHOLD = settings.DB_REPEAT_THRESHOLD
+# Flagged reports kept for /api/debug/queries
+DB_PROFILE_KEEP = settings.DB_PROFILE_KEEP
+
+class QueryLog:
+    """Statements executed within one request (or one capture block)"""
+
+    def __init__(self):
+        self.statements: List[Dict] = []
+
+    def record(self, statement: str, parameters, seconds: float):
+        self.statements.append({"sql": statement, "params": repr(parameters), "ms": seconds * 1000})
+
+    def __len__(self):
+        return len(self.statements)
+
+    def report(self, route: Optional[str] = None, method: Optional[str] = None) -> Dict:
+        by_sql = Counter(s["sql"] for s in self.statements)
+        by_call = Counter((s["sql"], s["params"]) for s in self.statements)
+        repeated = [
+            {"sql": sql, "count": count} for sql, count in by_sql.most_common()
+            if count >= DB_REPEAT_THRESHOLD
+        ]
+        duplicates = [
+            {"sql": sql, "params": params, "count": count} for (sql, params), count in by_call.most_common()
+            if count > 1
+        ]
+        slow = [
+            {"sql": s["sql"], "ms": round(s["ms"], 2)} for s in self.statements
+            if s["ms"] >= DB_SLOW_QUERY_MS
+        ]
+        return {
+            "route": route,
+            "method": method,
+            "queries": len(self.statements),
+            "db_ms": round(sum(s["ms"] for s in self.statements), 2),
+            "repeated": repeated,
+            "duplicates": duplicates,
+            "slow": slow,
+            "flagged": bool(repeated or duplicates or slow),
+        }
+
+    def describe(self) -> str:
+        return "\n".join(f"  {i}. {s['sql']}  {s['params']}" for i, s in enumerate(self.statements, 1))
+
+# The request being profiled (set by the middleware)
+current_log: ContextVar[Optional[QueryLog]] = ContextVar("current_query_log", default=None)
+# Process-wide captures: TestClient serves requests on another thread, so
+# a test's capture cannot rely on the contextvar
+_captures: List[QueryLog] = []
+recent_reports = deque(maxlen=DB_PROFILE_KEEP)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["profile_query_start"] = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = conn.info.pop("profile_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    log = current_log.get()
+    if log is not None:
+        log.record(statement, parameters, elapsed)
+    for capture in _captures:
+        capture.record(statement, parameters, elapsed)
+
+def install():
+    """Attach the statement hooks to every engine (idempotent)"""
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+@contextmanager
+def capture_queries():
+    """Collect every statement run (on any thread) inside the block"""
+    install()
+    log = QueryLog()
+    _captures.append(log)
+    try:
+        yield log
+    finally:
+        _captures.remove(log)
+
+class QueryProfileMiddleware:
+    """Pure ASGI middleware: logs one structured profile report per request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        log = QueryLog()
+        token = current_log.set(log)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_log.reset(token)
+            route = getattr(scope.get("route"), "path", scope["path"])
+            report = log.report(route, scope["method"])
+            if report["flagged"]:
+                recent_reports.append(report)
+                print(f"⚠️ db-profile {json.dumps(report)}")
+            else:
+                print(f"db-profile {scope['method']} {route} queries={report['queries']} db_ms={report['db_ms']}")
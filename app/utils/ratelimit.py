@@ -0,0 +1,300 @@
+import asyncio
+import json
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from app.config import settings
+from app.database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from app.utils import cache
+from app.utils.security import verify_token_cached
+
+# Rate limiting and admission control.
+#
+# Token buckets, refilled continuously: an authenticated client is keyed
+# by its JWT subject, an anonymous one by IP, and RATE_LIMIT_ROUTES adds a
+# bucket per client per route (e.g. login, against credential stuffing).
+# A request over its budget gets 429 with Retry-After. Buckets live in
+# process memory, or in Redis (one atomic script per request) so every
+# worker shares them; REDIS_URL=fake:// runs the redis path against an
+# in-process stand-in. A store outage lets requests through.
+#
+# Admission control caps requests in progress per worker: beyond
+# ADMISSION_MAX_IN_FLIGHT they wait in a bounded queue, and are shed with
+# 503 + Retry-After once the queue is full or they have waited
+# ADMISSION_QUEUE_TIMEOUT — well before DB_POOL_TIMEOUT would fail them
+# with a 500 from an exhausted pool.
+
+RATE_LIMIT_BACKEND = settings.RATE_LIMIT_BACKEND
+REDIS_URL = settings.REDIS_URL
+# "<count>/<s|m|h>[:burst]", e.g. "20/s:40"; empty or 0 disables
+RATE_LIMIT_USER = settings.RATE_LIMIT_USER
+RATE_LIMIT_ANONYMOUS = settings.RATE_LIMIT_ANONYMOUS
+# "<METHOD> <path>=<limit>" pairs, comma-separated
+RATE_LIMIT_ROUTES = settings.RATE_LIMIT_ROUTES
+# Buckets kept in memory (least recently used are dropped — a dropped bucket is a full one)
+RATE_LIMIT_MAX_KEYS = settings.RATE_LIMIT_MAX_KEYS
+
+ADMISSION_MAX_IN_FLIGHT = settings.ADMISSION_MAX_IN_FLIGHT or 4 * (DB_POOL_SIZE + DB_MAX_OVERFLOW)
+ADMISSION_QUEUE = settings.ADMISSION_QUEUE
+ADMISSION_QUEUE_TIMEOUT = settings.ADMISSION_QUEUE_TIMEOUT
+ADMISSION_RETRY_AFTER = settings.ADMISSION_RETRY_AFTER
+
+# Never limited: probes, scrapes and CORS preflights
+EXEMPT_PATHS = ("/health", "/metrics", "/api/status")
+
+REDIS_PREFIX = "neudebri:rl:"
+PERIOD_SECONDS = {"s": 1, "m": 60, "h": 3600}
+
+class Limit:
+    """`rate` tokens per second, up to `burst` saved up"""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+
+    @classmethod
+    def parse(cls, spec: str) -> Optional["Limit"]:
+        spec = (spec or "").strip()
+        if spec in ("", "0"):
+            return None
+        amount, _, burst = spec.partition(":")
+        count, _, period = amount.partition("/")
+        rate = float(count) / PERIOD_SECONDS[period.strip() or "s"]
+        return cls(rate, float(burst) if burst else max(1.0, float(count)))
+
+def parse_routes(spec: str) -> Dict[Tuple[str, str], Limit]:
+    routes = {}
+    for item in (spec or "").split(","):
+        if "=" not in item:
+            continue
+        route, limit = item.rsplit("=", 1)
+        method, _, path = route.strip().partition(" ")
+        parsed = Limit.parse(limit)
+        if parsed:
+            routes[(method.upper(), path.strip())] = parsed
+    return routes
+
+def refill(tokens: float, last: float, now: float, limit: Limit) -> Tuple[float, float]:
+    """Take one token: (tokens left, 0) if allowed, else (tokens, seconds until one is due)"""
+    tokens = min(limit.burst, tokens + max(0.0, now - last) * limit.rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / limit.rate
+
+class MemoryStore:
+    """Per-process buckets, LRU-bounded"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    async def take(self, key: str, limit: Limit) -> float:
+        now = time.monotonic()
+        tokens, last = self._buckets.get(key, (limit.burst, now))
+        tokens, wait = refill(tokens, last, now, limit)
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        while len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def size(self) -> int:
+        return len(self._buckets)
+
+    async def close(self):
+        pass
+
+# One round-trip per request; the bucket's clock is the Redis server's
+TOKEN_BUCKET = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 't', 'ts')
+local tokens = tonumber(state[1]) or burst
+local last = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - last) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 't', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+class RedisStore:
+    """Buckets shared by every worker, updated atomically by TOKEN_BUCKET"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def take(self, key: str, limit: Limit) -> float:
+        wait = await self.client.eval(TOKEN_BUCKET, 1, REDIS_PREFIX + key, limit.rate, limit.burst)
+        return float(wait)
+
+    def size(self) -> Optional[int]:
+        return None
+
+    async def close(self):
+        await self.client.aclose()
+
+class FakeRedis(cache.FakeRedis):
+    """cache.FakeRedis plus EVAL of TOKEN_BUCKET, run as the same logic in Python"""
+
+    async def eval(self, script: str, numkeys: int, key: str, rate: float, burst: float) -> bytes:
+        limit = Limit(float(rate), float(burst))
+        now = time.time()
+        raw = await self.get(key)
+        tokens, last = json.loads(raw) if raw else (limit.burst, now)
+        tokens, wait = refill(tokens, last, now, limit)
+        await self.set(key, json.dumps([tokens, now]), px=math.ceil(limit.burst / limit.rate * 1000) + 1000)
+        return str(wait).encode()
+
+def _make_store():
+    if RATE_LIMIT_BACKEND in ("off", "none", ""):
+        return None
+    if RATE_LIMIT_BACKEND == "redis":
+        if REDIS_URL.startswith("fake://"):
+            return RedisStore(FakeRedis())
+        try:
+            import redis.asyncio as redis
+        except ImportError:
+            print("⚠️ RATE_LIMIT_BACKEND=redis but the redis package is not installed; using memory")
+            return MemoryStore(RATE_LIMIT_MAX_KEYS)
+        return RedisStore(redis.Redis.from_url(REDIS_URL))
+    return MemoryStore(RATE_LIMIT_MAX_KEYS)
+
+class RateLimiter:
+    def __init__(self, store, user: Optional[Limit], anonymous: Optional[Limit], routes: Dict[Tuple[str, str], Limit]):
+        self.store = store
+        self.user = user
+        self.anonymous = anonymous
+        self.routes = routes
+        self.stats = {"allowed": 0, "limited": 0, "errors": 0}
+
+    @staticmethod
+    def client(scope) -> Tuple[str, bool]:
+        """("user:<sub>", True) for a valid bearer token, else ("ip:<address>", False)"""
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                token = value.decode("latin-1").replace("Bearer ", "")
+                try:
+                    return f"user:{verify_token_cached(token)['sub']}", True
+                except HTTPException:
+                    break
+        address = scope.get("client")
+        return f"ip:{address[0] if address else 'unknown'}", False
+
+    async def check(self, scope) -> float:
+        """Seconds the client must wait (0 = go ahead)"""
+        client, authenticated = self.client(scope)
+        buckets: List[Tuple[str, Limit]] = []
+        limit = self.user if authenticated else self.anonymous
+        if limit:
+            buckets.append((client, limit))
+        route = self.routes.get((scope["method"], scope["path"]))
+        if route:
+            buckets.append((f"{scope['method']} {scope['path']}:{client}", route))
+        wait = 0.0
+        try:
+            for key, limit in buckets:
+                wait = max(wait, await self.store.take(key, limit))
+        except Exception as e:
+            self.stats["errors"] += 1
+            if self.stats["errors"] == 1 or self.stats["errors"] % 1000 == 0:
+                print(f"⚠️ Rate limit store failed ({self.stats['errors']} errors so far): {e}")
+            return 0.0
+        self.stats["limited" if wait else "allowed"] += 1
+        return wait
+
+class Admission:
+    """At most `limit` requests in progress; `queue` more may wait up to `timeout` seconds"""
+
+    def __init__(self, limit: int, queue: int, timeout: float):
+        self.limit = limit
+        self.queue = queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.waiting = 0
+        self.shed = 0
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+        if self._slots.locked() and self.waiting >= self.queue:
+            self.shed += 1
+            return False
+        self.waiting += 1
+        try:
+            async with asyncio.timeout(self.timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            self.shed += 1
+            return False
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict:
+        return {"limit": self.limit, "in_flight": self.in_flight, "waiting": self.waiting,
+                "queue": self.queue, "shed": self.shed}
+
+limiter = RateLimiter(
+    _make_store(), Limit.parse(RATE_LIMIT_USER), Limit.parse(RATE_LIMIT_ANONYMOUS), parse_routes(RATE_LIMIT_ROUTES),
+)
+admission = Admission(ADMISSION_MAX_IN_FLIGHT, ADMISSION_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode()
+    await send({"type": "http.response.start", "status": status, "headers": [
+        (b"content-type", b"application/json"),
+        (b"content-length", str(len(body)).encode()),
+        (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+    ]})
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware: rate limits first (cheap), then the in-flight cap"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+        if limiter.store is not None:
+            wait = await limiter.check(scope)
+            if wait:
+                await _reject(send, 429, "Too many requests, slow down", wait)
+                return
+        if not await admission.acquire():
+            await _reject(send, 503, "Server busy, please retry", ADMISSION_RETRY_AFTER)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            admission.release()
+
+def stats() -> Dict:
+    store = limiter.store
+    return {
+        "rate_limit": {
+            "backend": type(store).__name__ if store else "off",
+            "buckets": store.size() if store else 0,
+            **limiter.stats,
+        },
+        "admission": admission.stats(),
+    }
+
+async def close():
+    if limiter.store is not None:
+        await limiter.store.close()
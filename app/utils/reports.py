@@ -0,0 +1,449 @@
+import array
+import asyncio
+import os
+import shutil
+import time
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_engine, engine
+from app.models.cases import Case, WoundRecord
+from app.models.invoices import Invoice, Payment
+from app.models.jobs import Job
+from app.models.visits import Visit
+from app.utils import jobs
+from app.utils.pagination import STREAM_BATCH_SIZE
+from app.utils.tenancy import scoped_to
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Reporting snapshots.
+#
+# Management KPIs (revenue by month, collection rate, outstanding ageing,
+# visits per nurse, wound severity trends) are not GROUP BYs on the OLTP
+# tables. A report_refresh job copies the rows added since its last run
+# (id > watermark) into append-only column files under REPORT_DIR — one
+# typed array per column, in the machine layout `array.tofile` writes —
+# and folds them into per-tenant monthly rollups. The KPIs are then
+# written out as one small JSON file per tenant, which the /api/reports
+# endpoints serve as they are.
+#
+# Extracts are append-only, so rows edited or deleted after they were
+# copied are only picked up by the full re-extract every
+# REPORT_REBUILD_HOURS (or when a table's row count stops matching).
+# Only the process that ran the last refresh keeps the rollups in memory;
+# another one reloads them from the column files first.
+
+REPORT_DIR = settings.REPORT_DIR
+REPORT_REFRESH_SECONDS = settings.REPORT_REFRESH_SECONDS
+REPORT_REBUILD_HOURS = settings.REPORT_REBUILD_HOURS
+
+REPORT_REFRESH = "report_refresh"
+
+COLUMN_DIR = os.path.join(REPORT_DIR, "columns")
+KPI_DIR = os.path.join(REPORT_DIR, "kpis")
+MANIFEST = os.path.join(REPORT_DIR, "manifest.json")
+
+# rows without an organisation (unscoped deployments): in the totals only
+NO_ORG = -1
+ALL = "*"
+# outstanding invoices by days since the invoice date
+AGEING = ((30, "0-30"), (60, "31-60"), (90, "61-90"), (None, "90+"))
+
+class Table(NamedTuple):
+    name: str
+    model: type
+    # (column, array typecode); dates are stored as proleptic ordinals
+    columns: Tuple[Tuple[str, str], ...]
+
+TABLES = (
+    Table("invoices", Invoice, (("id", "q"), ("org_id", "i"), ("amount", "d"), ("day", "i"), ("settled", "b"))),
+    Table("payments", Payment, (("id", "q"), ("invoice_id", "q"), ("amount", "d"), ("day", "i"))),
+    Table("visits", Visit, (("id", "q"), ("org_id", "i"), ("nurse_id", "i"), ("day", "i"))),
+    Table("wounds", WoundRecord, (("id", "q"), ("org_id", "i"), ("severity", "h"), ("day", "i"))),
+)
+
+def _source(table: Table):
+    """SELECT of one table's extract, in column order"""
+    if table.name == "invoices":
+        return select(Invoice.id, Invoice.org_id, Invoice.amount, Invoice.invoice_date, Invoice.status)
+    if table.name == "payments":
+        return select(Payment.id, Payment.invoice_id, Payment.amount, Payment.paid_at)
+    if table.name == "visits":
+        return select(Visit.id, Visit.org_id, Visit.recorded_by, Visit.visit_date)
+    return (select(WoundRecord.id, Case.org_id, WoundRecord.severity, WoundRecord.created_at)
+            .outerjoin(Case, WoundRecord.case_id == Case.id))
+
+def _column_path(table: Table, column: str) -> str:
+    return os.path.join(COLUMN_DIR, f"{table.name}.{column}")
+
+def month_label(month: int) -> str:
+    return f"{month // 12:04d}-{month % 12 + 1:02d}"
+
+def _write_json(path: str, data) -> None:
+    with open(path + ".part", "wb") as f:
+        f.write(orjson.dumps(data))
+    os.replace(path + ".part", path)
+
+def _read_manifest() -> Optional[Dict]:
+    try:
+        with open(MANIFEST, "rb") as f:
+            return orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+
+class Snapshot:
+    """The column files' manifest and the rollups folded from them"""
+
+    def __init__(self, manifest: Optional[Dict] = None):
+        self.manifest = manifest or {
+            "version": 0, "rebuilt_at": datetime.utcnow().isoformat(), "refreshed_at": None, "severities": [],
+            "tables": {table.name: {"watermark": 0, "rows": 0} for table in TABLES},
+        }
+        # invoice id -> its org and month, for folding its payments
+        self.invoice_org = array.array("i")
+        self.invoice_month = array.array("i")
+        # invoice id -> [amount still owed, org, invoice day]
+        self.outstanding: Dict[int, list] = {}
+        self.invoiced = defaultdict(float)  # (org, month) -> amount invoiced
+        self.collected = defaultdict(float)  # (org, invoice month) -> paid against those invoices
+        self.received = defaultdict(float)  # (org, payment month) -> cash received
+        self.visits = defaultdict(int)  # (org, month, nurse) -> visits recorded
+        self.wounds = defaultdict(int)  # (org, month, severity code) -> wound records
+        self._months: Dict[int, int] = {}
+        self._severity_codes = {name: code for code, name in enumerate(self.manifest["severities"])}
+
+    @property
+    def version(self) -> int:
+        return self.manifest["version"]
+
+    @classmethod
+    def load(cls) -> "Snapshot":
+        """Rebuild the rollups from the column files (a fresh snapshot if there are none)"""
+        manifest = _read_manifest()
+        if manifest is None:
+            return cls.empty()
+        snapshot = cls(manifest)
+        try:
+            for table in TABLES:
+                rows = manifest["tables"][table.name]["rows"]
+                columns = []
+                for column, code in table.columns:
+                    values = array.array(code)
+                    if rows:
+                        with open(_column_path(table, column), "rb") as f:
+                            values.fromfile(f, rows)
+                    columns.append(values)
+                snapshot._fold(table, columns)
+        except (OSError, EOFError) as e:
+            print(f"⚠️ Report columns unreadable, re-extracting: {e}")
+            return cls.empty()
+        return snapshot
+
+    @classmethod
+    def empty(cls) -> "Snapshot":
+        """A snapshot with no rows; removes the old column files"""
+        shutil.rmtree(COLUMN_DIR, ignore_errors=True)
+        os.makedirs(COLUMN_DIR, exist_ok=True)
+        previous = _read_manifest()
+        snapshot = cls()
+        snapshot.manifest["version"] = previous["version"] if previous else 0
+        return snapshot
+
+    def due_for_rebuild(self) -> bool:
+        if REPORT_REBUILD_HOURS <= 0:
+            return False
+        rebuilt_at = datetime.fromisoformat(self.manifest["rebuilt_at"])
+        return datetime.utcnow() - rebuilt_at > timedelta(hours=REPORT_REBUILD_HOURS)
+
+    def consistent(self, session: Session) -> bool:
+        """Whether every table still has exactly the rows copied so far (nothing deleted)"""
+        for table in TABLES:
+            meta = self.manifest["tables"][table.name]
+            if meta["rows"]:
+                count = session.exec(
+                    select(func.count()).select_from(table.model).where(table.model.id <= meta["watermark"])
+                ).one()
+                if count != meta["rows"]:
+                    return False
+        return True
+
+    # -- extract ---------------------------------------------------------
+
+    def extract(self, session: Session, table: Table, upto: Optional[int] = None) -> int:
+        """Append the table's rows with id > watermark (and <= `upto`); returns how many"""
+        meta = self.manifest["tables"][table.name]
+        stmt = _source(table).where(table.model.id > meta["watermark"])
+        if upto is not None:
+            stmt = stmt.where(table.model.id <= upto)
+        stmt = stmt.order_by(table.model.id).execution_options(yield_per=STREAM_BATCH_SIZE)
+        convert = getattr(self, f"_{table.name}_row")
+
+        files = []
+        try:
+            for column, code in table.columns:
+                f = open(_column_path(table, column), "ab")
+                # drop what a crashed refresh appended past the manifest
+                f.truncate(meta["rows"] * array.array(code).itemsize)
+                files.append(f)
+            added = 0
+            for batch in session.execute(stmt).partitions():
+                columns = [array.array(code) for _, code in table.columns]
+                for row in batch:
+                    for values, value in zip(columns, convert(row)):
+                        values.append(value)
+                for values, f in zip(columns, files):
+                    values.tofile(f)
+                self._fold(table, columns)
+                meta["watermark"] = columns[0][-1]
+                meta["rows"] += len(batch)
+                added += len(batch)
+        finally:
+            for f in files:
+                f.close()
+        return added
+
+    def _invoices_row(self, row):
+        return row[0], NO_ORG if row[1] is None else row[1], row[2], row[3].toordinal(), row[4] == "paid"
+
+    def _payments_row(self, row):
+        return row[0], row[1], row[2], row[3].toordinal()
+
+    def _visits_row(self, row):
+        return row[0], NO_ORG if row[1] is None else row[1], NO_ORG if row[2] is None else row[2], row[3].toordinal()
+
+    def _wounds_row(self, row):
+        severity = (row[2] or "unspecified").strip().lower()
+        code = self._severity_codes.get(severity)
+        if code is None:
+            code = self._severity_codes[severity] = len(self.manifest["severities"])
+            self.manifest["severities"].append(severity)
+        return row[0], NO_ORG if row[1] is None else row[1], code, row[3].toordinal()
+
+    # -- rollups ---------------------------------------------------------
+
+    def _month(self, day: int) -> int:
+        month = self._months.get(day)
+        if month is None:
+            d = date.fromordinal(day)
+            month = self._months[day] = d.year * 12 + d.month - 1
+        return month
+
+    def _fold(self, table: Table, columns: List[array.array]) -> None:
+        if not columns[0]:
+            return
+        month = self._month
+        if table.name == "invoices":
+            ids, orgs, amounts, days, settled = columns
+            grow = max(ids) + 1 - len(self.invoice_org)
+            if grow > 0:
+                self.invoice_org.extend(array.array("i", [NO_ORG]) * grow)
+                self.invoice_month.extend(array.array("i", [0]) * grow)
+            for invoice_id, org, amount, day, paid in zip(ids, orgs, amounts, days, settled):
+                m = month(day)
+                self.invoice_org[invoice_id] = org
+                self.invoice_month[invoice_id] = m
+                self.invoiced[org, m] += amount
+                if not paid:
+                    self.outstanding[invoice_id] = [amount, org, day]
+        elif table.name == "payments":
+            _, invoice_ids, amounts, days = columns
+            known = len(self.invoice_org)
+            for invoice_id, amount, day in zip(invoice_ids, amounts, days):
+                org = self.invoice_org[invoice_id] if invoice_id < known else NO_ORG
+                self.received[org, month(day)] += amount
+                if invoice_id < known:
+                    self.collected[org, self.invoice_month[invoice_id]] += amount
+                owed = self.outstanding.get(invoice_id)
+                if owed is not None:
+                    owed[0] -= amount
+                    if owed[0] <= 0.005:
+                        del self.outstanding[invoice_id]
+        elif table.name == "visits":
+            _, orgs, nurses, days = columns
+            for org, nurse, day in zip(orgs, nurses, days):
+                self.visits[org, month(day), nurse] += 1
+        else:
+            _, orgs, severities, days = columns
+            for org, severity, day in zip(orgs, severities, days):
+                self.wounds[org, month(day), severity] += 1
+
+    def kpis(self) -> Dict[str, Dict]:
+        """The KPI document of every tenant, and of all of them (ALL)"""
+        as_of = datetime.utcnow()
+        today = as_of.date().toordinal()
+        tenants = defaultdict(lambda: {
+            "revenue": defaultdict(lambda: [0.0, 0.0, 0.0]),
+            "ageing": [[0, 0.0] for _ in AGEING],
+            "nurses": defaultdict(int),
+            "wounds": defaultdict(int),
+        })
+
+        def targets(org):
+            return (ALL,) if org == NO_ORG else (ALL, org)
+
+        for figure, rollup in enumerate((self.invoiced, self.collected, self.received)):
+            for (org, month), amount in rollup.items():
+                for tenant in targets(org):
+                    tenants[tenant]["revenue"][month][figure] += amount
+        for owed, org, day in self.outstanding.values():
+            age = today - day
+            bucket = next(i for i, (days, _) in enumerate(AGEING) if days is None or age <= days)
+            for tenant in targets(org):
+                tenants[tenant]["ageing"][bucket][0] += 1
+                tenants[tenant]["ageing"][bucket][1] += owed
+        for (org, month, nurse), n in self.visits.items():
+            for tenant in targets(org):
+                tenants[tenant]["nurses"][month, nurse] += n
+        for (org, month, severity), n in self.wounds.items():
+            for tenant in targets(org):
+                tenants[tenant]["wounds"][month, severity] += n
+
+        severities = self.manifest["severities"]
+        documents = {}
+        for tenant, figures in tenants.items():
+            documents[tenant] = {
+                "as_of": as_of.isoformat(),
+                "revenue": [
+                    {"month": month_label(month), "invoiced": round(invoiced, 2), "collected": round(collected, 2),
+                     "collection_rate": round(collected / invoiced, 4) if invoiced else None,
+                     "received": round(received, 2)}
+                    for month, (invoiced, collected, received) in sorted(figures["revenue"].items())
+                ],
+                "ageing": [
+                    {"bucket": label, "invoices": n, "outstanding": round(owed, 2)}
+                    for (_, label), (n, owed) in zip(AGEING, figures["ageing"])
+                ],
+                "nurses": [
+                    {"month": month_label(month), "nurse_id": None if nurse == NO_ORG else nurse, "visits": n}
+                    for (month, nurse), n in sorted(figures["nurses"].items(), key=lambda item: (item[0][0], -item[1]))
+                ],
+                "wounds": [
+                    {"month": month_label(month), "severity": severities[severity], "count": n}
+                    for (month, severity), n in sorted(figures["wounds"].items())
+                ],
+            }
+        documents.setdefault(ALL, empty_report(as_of.isoformat()))
+        return documents
+
+    def save(self) -> None:
+        self.manifest["version"] += 1
+        self.manifest["refreshed_at"] = datetime.utcnow().isoformat()
+        _write_json(MANIFEST, self.manifest)
+        os.makedirs(KPI_DIR, exist_ok=True)
+        documents = self.kpis()
+        names = {_kpi_name(None if tenant == ALL else tenant) for tenant in documents}
+        for tenant, document in documents.items():
+            _write_json(os.path.join(KPI_DIR, _kpi_name(None if tenant == ALL else tenant)), document)
+        for name in os.listdir(KPI_DIR):
+            if name not in names:
+                os.remove(os.path.join(KPI_DIR, name))
+
+def _try_lock(lock) -> bool:
+    """Non-blocking exclusive lock on an open file, released when it is closed"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(lock.fileno(), msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+# the rollups of the last refresh run in this process
+_snapshot: Optional[Snapshot] = None
+
+@jobs.job_type(REPORT_REFRESH, concurrency=1, max_attempts=2)
+def refresh(run: Optional[jobs.JobRun] = None) -> Dict:
+    """Copy new rows into the column files and rewrite the KPI documents.
+
+    A plain function: it runs on the job thread pool. A file lock keeps a
+    second process from refreshing at the same time.
+    """
+    global _snapshot
+    # a forced rebuild only when the platform role queued it (its jobs have no org_id)
+    rebuild = bool(run and run.payload.get("rebuild") and run.org_id is None)
+    os.makedirs(COLUMN_DIR, exist_ok=True)
+    with open(os.path.join(REPORT_DIR, ".lock"), "w") as lock:
+        if not _try_lock(lock):
+            return {"skipped": "another refresh is running"}
+        started = time.perf_counter()
+        manifest = _read_manifest()
+        snapshot = _snapshot
+        if snapshot is None or manifest is None or snapshot.version != manifest["version"]:
+            snapshot = Snapshot.load()
+        # every tenant's rows, whoever queued the refresh
+        with scoped_to(None), Session(engine) as session:
+            rebuilt = rebuild or snapshot.due_for_rebuild() or not snapshot.consistent(session)
+            if rebuilt:
+                snapshot = Snapshot.empty()
+            # payments only up to here, read before invoices: each one's invoice is then copied too
+            last_payment = session.exec(select(func.max(Payment.id))).one() or 0
+            added = {
+                table.name: snapshot.extract(session, table, last_payment if table.model is Payment else None)
+                for table in TABLES
+            }
+        snapshot.save()
+        _snapshot = snapshot
+    return {"rebuilt": rebuilt, "added": added, "version": snapshot.version,
+            "seconds": round(time.perf_counter() - started, 2)}
+
+async def refresh_periodically(interval: int = REPORT_REFRESH_SECONDS):
+    """Background task: queue a refresh every `interval` seconds, unless one is pending"""
+    while True:
+        try:
+            async with AsyncSession(async_engine) as session:
+                pending = (await session.exec(
+                    select(func.count()).select_from(Job)
+                    .where(Job.type == REPORT_REFRESH, Job.status.in_((jobs.QUEUED, jobs.RUNNING)))
+                )).one()
+                if not pending:
+                    await jobs.enqueue(session, REPORT_REFRESH, {})
+        except Exception as e:
+            print(f"⚠️ Report refresh scheduling failed: {e}")
+        await asyncio.sleep(interval)
+
+# -- reading -------------------------------------------------------------
+
+def _kpi_name(org_id: Optional[int]) -> str:
+    return "all.json" if org_id is None else f"org-{org_id}.json"
+
+def empty_report(as_of: Optional[str]) -> Dict:
+    return {"as_of": as_of, "revenue": [], "ageing": [], "nurses": [], "wounds": []}
+
+# file name -> (mtime, parsed document)
+_documents: Dict[str, Tuple[int, Dict]] = {}
+
+def _read_document(name: str) -> Optional[Dict]:
+    path = os.path.join(KPI_DIR, name)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+        cached = _documents.get(name)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            document = orjson.loads(f.read())
+    except FileNotFoundError:
+        return None
+    _documents[name] = (mtime, document)
+    return document
+
+def read_kpis(org_id: Optional[int]) -> Optional[Dict]:
+    """A tenant's KPI document (org_id None: all tenants); None before the first refresh"""
+    document = _read_document(_kpi_name(org_id))
+    if document is None and org_id is not None:
+        everyone = _read_document(_kpi_name(None))
+        if everyone is not None:
+            return empty_report(everyone["as_of"])  # a tenant with no billing or visits yet
+    return document
@@ -0,0 +1,272 @@
+import re
+from typing import Iterable, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.database import async_engine
+from app.models.patients import Patient
+from app.utils.tenancy import current_org
+
+# Patient search index, kept beside the patients table.
+#   SQLite   -> FTS5 virtual table with the trigram tokenizer (rowid = patient id)
+#   Postgres -> plain table with pg_trgm GIN indexes
+# Both store a lower-cased "first last" name and the phone in 2547XXXXXXXX form,
+# plus the patient's org_id: a tenant's search ranks only its own patients
+# (the filter is in the ranking query, before LIMIT).
+#
+# Typos: a one-letter slip in a short name can leave no trigram in common
+# ("amna" vs "amina"). pg_trgm pads each word with spaces, so the word's
+# first and last letters still match; SQLite stores the name as " first last "
+# for the same boundary trigrams (" am", "na ") and queries them for short
+# words. The SQLite fallback then reranks its candidates by edit distance
+# to the query.
+
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS patient_search "
+    "USING fts5(name, phone, org_id UNINDEXED, tokenize='trigram')",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE TABLE IF NOT EXISTS patient_search ("
+    " patient_id INTEGER PRIMARY KEY REFERENCES patients(id) ON DELETE CASCADE,"
+    " name TEXT NOT NULL DEFAULT '', phone TEXT NOT NULL DEFAULT '', org_id INTEGER)",
+    "CREATE INDEX IF NOT EXISTS ix_patient_search_name_trgm ON patient_search USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_patient_search_phone_trgm ON patient_search USING gin (phone gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_patient_search_org_id ON patient_search (org_id)",
+]
+
+COLUMNS_SQL = {
+    "sqlite": "SELECT name FROM pragma_table_info('patient_search')",
+    "postgresql": "SELECT column_name FROM information_schema.columns WHERE table_name = 'patient_search'",
+}
+
+REBUILD_BATCH_SIZE = 5000
+# SQLite typo fallback: trigram candidates fetched per wanted result, then reranked
+FUZZY_POOL = 5
+# words this short can lose every inner trigram to one typo: match their boundary grams too
+SHORT_WORD = 5
+
+# Set by ensure_index; False means the backend has no usable index and
+# search falls back to ILIKE scans
+search_enabled = False
+
+def normalize_phone(raw: Optional[str]) -> str:
+    """Canonical Kenyan form: +254 712 345 678 / 0712345678 / 712345678 -> 254712345678"""
+    digits = re.sub(r"\D", "", raw or "")
+    if digits.startswith("0"):
+        return "254" + digits[1:]
+    if len(digits) == 9 and digits[0] in "17":
+        return "254" + digits
+    return digits
+
+def _name(patient) -> str:
+    return f"{patient.first_name or ''} {patient.last_name or ''}".strip().lower()
+
+def _tokens(q: str) -> List[str]:
+    return re.findall(r"\w+", q.lower())
+
+def _trigrams(tokens: Iterable[str]) -> List[str]:
+    grams = []
+    for token in tokens:
+        for i in range(len(token) - 2):
+            if token[i:i + 3] not in grams:
+                grams.append(token[i:i + 3])
+    return grams
+
+def _padded(token: str) -> str:
+    """Short words with their boundary spaces, for the fuzzy trigram query"""
+    # a longer word keeps inner trigrams through one typo, and " ka"-style
+    # grams would match a large share of all names
+    return f" {token} " if len(token) <= SHORT_WORD else token
+
+def _edit_distance(a: str, b: str) -> int:
+    """Levenshtein distance: insertions, deletions and substitutions cost 1"""
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb)))
+        previous = current
+    return previous[-1]
+
+def _typo_distance(tokens: Sequence[str], name: str) -> int:
+    """Edits from each query token to its closest word (or word prefix) of `name`"""
+    words = name.split()
+    if not words:
+        return sum(len(t) for t in tokens)
+    return sum(min(min(_edit_distance(t, w), _edit_distance(t, w[:len(t)])) for w in words) for t in tokens)
+
+def _is_phone_query(q: str) -> bool:
+    return bool(re.fullmatch(r"[\d\s+()-]+", q)) and any(ch.isdigit() for ch in q)
+
+async def ensure_index():
+    """Create the search index if missing and backfill it on first boot"""
+    global search_enabled
+    async with async_engine.begin() as conn:
+        dialect = conn.dialect.name
+        try:
+            columns = set((await conn.execute(text(COLUMNS_SQL.get(dialect, COLUMNS_SQL["sqlite"])))).scalars())
+            if columns and "org_id" not in columns:
+                # built before tenant scoping: recreate with org_id and re-index below
+                await conn.execute(text("DROP TABLE patient_search"))
+            for ddl in (POSTGRES_DDL if dialect == "postgresql" else SQLITE_DDL):
+                await conn.execute(text(ddl))
+        except Exception as e:
+            print(f"⚠️ Patient search index unavailable, using ILIKE: {e}")
+            search_enabled = False
+            return
+        search_enabled = True
+        if dialect != "postgresql":
+            sample = (await conn.execute(text("SELECT name FROM patient_search LIMIT 1"))).scalar()
+            if sample is not None and not sample.startswith(" "):
+                # indexed before names were space-padded
+                await rebuild_index(conn)
+                return
+        indexed = (await conn.execute(text("SELECT count(*) FROM patient_search"))).scalar()
+        if not indexed:
+            await rebuild_index(conn)
+
+async def rebuild_index(conn: AsyncConnection):
+    """Re-index every patient (used for backfill and repair)"""
+    await conn.execute(text("DELETE FROM patient_search"))
+    last_id = 0
+    while True:
+        rows = (await conn.execute(
+            select(Patient.id, Patient.first_name, Patient.last_name, Patient.phone, Patient.org_id)
+            .where(Patient.id > last_id).order_by(Patient.id).limit(REBUILD_BATCH_SIZE)
+        )).all()
+        if not rows:
+            break
+        await _insert(conn, rows)
+        last_id = rows[-1].id
+
+async def _insert(conn, patients: Sequence):
+    postgres = conn.dialect.name == "postgresql"
+    column = "patient_id" if postgres else "rowid"
+    # SQLite: padded so each word's first and last letters form trigrams too
+    pad = "" if postgres else " "
+    await conn.execute(
+        text(f"INSERT INTO patient_search ({column}, name, phone, org_id) VALUES (:id, :name, :phone, :org_id)"),
+        [{"id": p.id, "name": f"{pad}{_name(p)}{pad}", "phone": normalize_phone(p.phone), "org_id": p.org_id}
+         for p in patients],
+    )
+
+async def _delete(conn, patient_ids: Sequence[int]):
+    column = "patient_id" if conn.dialect.name == "postgresql" else "rowid"
+    await conn.execute(
+        text(f"DELETE FROM patient_search WHERE {column} = :id"),
+        [{"id": patient_id} for patient_id in patient_ids],
+    )
+
+async def index_patients(session: AsyncSession, patients: Sequence[Patient]):
+    """(Re)index patients inside the caller's transaction — rows need ids, so flush first"""
+    if not search_enabled or not patients:
+        return
+    conn = await session.connection()
+    await _delete(conn, [p.id for p in patients])
+    await _insert(conn, patients)
+
+async def remove_patient(session: AsyncSession, patient_id: int):
+    """Drop a patient from the index inside the caller's transaction"""
+    if search_enabled:
+        await _delete(await session.connection(), [patient_id])
+
+async def search_patient_ids(session: AsyncSession, q: str, limit: int = 100, offset: int = 0) -> Optional[List[int]]:
+    """Ranked patient ids matching `q`, or None when no index is available.
+
+    Exact substring/prefix matches come first; if they do not fill the
+    page, trigram-overlap matches follow so typos still find the patient.
+    Only the current tenant's patients are ranked.
+    """
+    if not search_enabled:
+        return None
+    conn = await session.connection()
+    wanted = offset + limit
+    if conn.dialect.name == "postgresql":
+        ids = await _search_postgres(conn, q, wanted, current_org())
+    else:
+        ids = await _search_sqlite(conn, q, wanted, current_org())
+    return ids[offset:wanted]
+
+def _scoped(sql: str, org_id: Optional[int]) -> str:
+    """Add the tenant filter to a ranking query's WHERE (before ORDER BY / LIMIT)"""
+    if org_id is None:
+        return sql
+    head, order = sql.split(" ORDER BY ", 1)
+    return f"{head} AND org_id = :org ORDER BY {order}"
+
+async def _search_sqlite(conn, q: str, wanted: int, org_id: Optional[int] = None) -> List[int]:
+    async def ids_for(sql: str, params: dict) -> List[int]:
+        return list((await conn.execute(text(_scoped(sql, org_id)), {**params, "n": wanted, "org": org_id})).scalars())
+
+    if _is_phone_query(q):
+        phone = normalize_phone(q)
+        if len(phone) < 3:
+            return []
+        return await ids_for(
+            "SELECT rowid FROM patient_search WHERE phone MATCH :m ORDER BY rank LIMIT :n",
+            {"m": f'"{phone}"'},
+        )
+
+    tokens = _tokens(q)
+    long_tokens = [t for t in tokens if len(t) >= 3]
+    if not long_tokens:
+        # trigrams need 3+ characters; short input falls back to a prefix scan
+        if not tokens:
+            return []
+        return await ids_for(
+            "SELECT rowid FROM patient_search WHERE name LIKE :m ORDER BY rowid LIMIT :n",
+            {"m": f" {' '.join(tokens)}%"},
+        )
+
+    exact = await ids_for(
+        "SELECT rowid FROM patient_search WHERE name MATCH :m ORDER BY rank LIMIT :n",
+        {"m": " AND ".join(f'"{t}"' for t in long_tokens)},
+    )
+    if len(exact) >= wanted:
+        return exact
+    candidates = (await conn.execute(
+        text(_scoped("SELECT rowid, name FROM patient_search WHERE name MATCH :m ORDER BY rank LIMIT :n", org_id)),
+        {"m": " OR ".join(f'"{g}"' for g in _trigrams(_padded(t) for t in long_tokens)),
+         "n": wanted * FUZZY_POOL, "org": org_id},
+    )).all()
+    # closest spelling first; sorted() is stable, so FTS rank breaks ties
+    fuzzy = sorted(candidates, key=lambda row: _typo_distance(long_tokens, row.name))
+    seen = set(exact)
+    return exact + [row.rowid for row in fuzzy if row.rowid not in seen][:wanted - len(exact)]
+
+async def _search_postgres(conn, q: str, wanted: int, org_id: Optional[int] = None) -> List[int]:
+    async def ids_for(sql: str, params: dict) -> List[int]:
+        return list((await conn.execute(text(_scoped(sql, org_id)), {**params, "n": wanted, "org": org_id})).scalars())
+
+    if _is_phone_query(q):
+        phone = normalize_phone(q)
+        return await ids_for(
+            "SELECT patient_id FROM patient_search WHERE phone LIKE :m "
+            "ORDER BY similarity(phone, :p) DESC LIMIT :n",
+            {"m": f"%{phone}%", "p": phone},
+        ) if phone else []
+
+    tokens = _tokens(q)
+    if not tokens:
+        return []
+    phrase = " ".join(tokens)
+    where = " AND ".join(f"name LIKE :t{i}" for i in range(len(tokens)))
+    exact = await ids_for(
+        f"SELECT patient_id FROM patient_search WHERE {where} "
+        "ORDER BY similarity(name, :q) DESC LIMIT :n",
+        {"q": phrase, **{f"t{i}": f"%{t}%" for i, t in enumerate(tokens)}},
+    )
+    if len(exact) >= wanted:
+        return exact
+    fuzzy = await ids_for(
+        "SELECT patient_id FROM patient_search WHERE :q <% name "
+        "ORDER BY word_similarity(:q, name) DESC LIMIT :n",
+        {"q": phrase},
+    )
+    seen = set(exact)
+    return exact + [i for i in fuzzy if i not in seen]
@@ -1,35 +1,120 @@
-import os
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
-from dotenv import load_dotenv
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
-
-load_dotenv()
+from functools import lru_cache
+from typing import Optional, Tuple
+from fastapi import Header, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from app.config import settings
 
 # Security configuration
-SECRET_KEY = os.getenv("SECRET_KEY", "change-me-in-production")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "60"))
+SECRET_KEY = settings.SECRET_KEY
+ALGORITHM = settings.ALGORITHM
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
+
+# Password hashing — hashes with a different cost are rehashed on login
+BCRYPT_ROUNDS = settings.BCRYPT_ROUNDS
+
+# Hashing pool: 0 workers falls back to the request threadpool
+HASH_POOL_WORKERS = settings.HASH_POOL_WORKERS
+HASH_POOL_MAX_QUEUE = settings.HASH_POOL_MAX_QUEUE
+HASH_POOL_RETRY_AFTER = settings.HASH_POOL_RETRY_AFTER
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Verified-token cache (0 disables it)
+TOKEN_CACHE_SIZE = settings.TOKEN_CACHE_SIZE
+
+# Role claim of platform staff: no org_id, every clinic's data (app.utils.tenancy)
+PLATFORM_ROLE = "platform"
 
 class TokenData:
     def __init__(self, username: Optional[str] = None):
         self.username = username
 
+# passlib and jose are imported on first use, not at app import: together
+# they are ~40 ms of every worker's cold start
+
+@lru_cache(maxsize=None)
+def password_context():
+    """bcrypt CryptContext, built on first use"""
+    from passlib.context import CryptContext
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
 def hash_password(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return password_context().hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_context().verify(plain_password, hashed_password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also return a new hash if the stored one is outdated"""
+    return password_context().verify_and_update(plain_password, hashed_password)
+
+class HashingPool:
+    """Bounded process pool that keeps bcrypt off the request path.
+
+    At most `workers + max_queue` hashes are in flight; beyond that callers
+    get a 503 with Retry-After instead of piling up behind the pool.
+    """
+
+    def __init__(self, workers: int, max_queue: int, retry_after: int):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: never fork a process that owns an event loop and DB pools
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    async def run(self, fn, *args):
+        if self.workers <= 0:
+            return await run_in_threadpool(fn, *args)
+        if self.in_flight >= self.workers + self.max_queue:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, fn, *args)
+        finally:
+            self.in_flight -= 1
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+hashing_pool = HashingPool(HASH_POOL_WORKERS, HASH_POOL_MAX_QUEUE, HASH_POOL_RETRY_AFTER)
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await hashing_pool.run(hash_password, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify (and maybe rehash) a password on the hashing pool"""
+    return await hashing_pool.run(verify_and_update_password, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT token"""
+    from jose import jwt
+
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
@@ -42,6 +127,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def verify_token(token: str) -> dict:
     """Verify JWT token and return payload"""
+    from jose import JWTError, jwt
+
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username: str = payload.get("sub")
@@ -55,4 +142,80 @@ def verify_token(token: str) -> dict:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication credentials",
-        )
\ No newline at end of file
+        )
+
+class TokenCache:
+    """Bounded LRU of verified JWT payloads.
+
+    Keyed by the SHA-256 of the token so raw tokens are never held in
+    memory; each entry is dropped once the token's `exp` has passed.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[bytes, Tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token: str, payload: dict):
+        if self.maxsize <= 0 or "exp" not in payload:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (float(payload["exp"]), payload)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "maxsize": self.maxsize,
+                "hits": self.hits, "misses": self.misses}
+
+token_cache = TokenCache(TOKEN_CACHE_SIZE)
+
+def verify_token_cached(token: str) -> dict:
+    """verify_token, reusing the payload of a recently verified token"""
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = verify_token(token)
+        token_cache.put(token, payload)
+    return payload
+
+def is_platform(payload: dict) -> bool:
+    """Whether a verified token acts for every clinic rather than one"""
+    return payload.get("org_id") is None and payload.get("role") == PLATFORM_ROLE
+
+async def get_current_user(authorization: Optional[str] = Header(None)) -> dict:
+    """FastAPI dependency: verified JWT payload from the Authorization header.
+
+    The token must name a clinic (org_id) or carry the platform role.
+    """
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authorization header")
+    payload = verify_token_cached(authorization.replace("Bearer ", ""))
+    if payload.get("org_id") is None and not is_platform(payload):
+        raise HTTPException(status_code=403, detail="Account is not assigned to a clinic")
+    return payload
@@ -0,0 +1,129 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_engine
+from app.models.cases import Case
+from app.models.dashboard import SummaryCounter
+from app.models.invoices import Invoice
+from app.models.patients import Patient
+from app.models.visits import Visit
+from app.utils import cache
+from app.utils.tenancy import scoped_to
+
+# Seconds between full recounts of the summary store (0 disables)
+SUMMARY_RECONCILE_SECONDS = settings.SUMMARY_RECONCILE_SECONDS
+# Days either side of today whose visit counts a recount rebuilds
+SUMMARY_VISIT_WINDOW_DAYS = settings.SUMMARY_VISIT_WINDOW_DAYS
+
+PATIENTS = "patients"
+CASES = "cases"
+CRITICAL_CASES = "critical_cases"
+UNPAID_INVOICES = "unpaid_invoices"
+
+def visits_key(day: date) -> str:
+    return f"visits:{day.isoformat()}"
+
+def tenant_key(key: str, org_id: Optional[int]) -> str:
+    """The counter `key` of one organisation (None: the all-tenant total)"""
+    return key if org_id is None else f"org:{org_id}:{key}"
+
+def _upsert(dialect: str):
+    if dialect == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+async def bump(session: AsyncSession, deltas: Dict[str, int], org_id: Optional[int] = None):
+    """Apply counter deltas inside the caller's transaction.
+
+    Call before the router's commit so counters and rows change together.
+    The totals move, and so do `org_id`'s own counters when the rows
+    belong to an organisation.
+    """
+    insert = _upsert(session.bind.dialect.name)
+    now = datetime.utcnow()
+    keys = [(key, delta) for key, delta in deltas.items() if delta]
+    if org_id is not None:
+        keys += [(tenant_key(key, org_id), delta) for key, delta in keys]
+    for key, delta in keys:
+        stmt = insert(SummaryCounter).values(key=key, value=delta, updated_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["key"],
+            set_={"value": SummaryCounter.value + delta, "updated_at": now},
+        )
+        await session.execute(stmt)
+
+async def read_summary(session: AsyncSession, org_id: Optional[int] = None) -> Dict[str, int]:
+    """O(1) read of the counters the dashboard needs, for one organisation or all"""
+    keys = [PATIENTS, CASES, CRITICAL_CASES, UNPAID_INVOICES, visits_key(datetime.utcnow().date())]
+    rows = (await session.exec(
+        select(SummaryCounter.key, SummaryCounter.value)
+        .where(SummaryCounter.key.in_([tenant_key(key, org_id) for key in keys]))
+    )).all()
+    values = dict(rows)
+    return {key: values.get(tenant_key(key, org_id), 0) for key in keys}
+
+async def recount(session: AsyncSession):
+    """Rebuild every counter, totals and per organisation, from the source tables (reconciliation)"""
+    counts: Dict[str, int] = {}
+
+    async def count(key: str, model, *where):
+        rows = (await session.exec(select(model.org_id, func.count()).where(*where).group_by(model.org_id))).all()
+        counts[key] = sum(n for _, n in rows)
+        for org_id, n in rows:
+            if org_id is not None:
+                counts[tenant_key(key, org_id)] = n
+
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    window = timedelta(days=SUMMARY_VISIT_WINDOW_DAYS)
+    day = func.date(Visit.visit_date)
+    # the totals: a recount asked for by a tenant's request still counts every row
+    with scoped_to(None):
+        await count(PATIENTS, Patient)
+        await count(CASES, Case)
+        await count(CRITICAL_CASES, Case, Case.status == "critical")
+        await count(UNPAID_INVOICES, Invoice, Invoice.status != "paid")
+        per_day = (await session.exec(
+            select(Visit.org_id, day, func.count()).where(
+                Visit.visit_date >= today - window, Visit.visit_date < today + window + timedelta(days=1)
+            ).group_by(Visit.org_id, day)
+        )).all()
+    for org_id, visit_day, n in per_day:
+        key = visits_key(date.fromisoformat(str(visit_day)))
+        counts[key] = counts.get(key, 0) + n
+        if org_id is not None:
+            counts[tenant_key(key, org_id)] = n
+
+    now = datetime.utcnow()
+    await session.execute(delete(SummaryCounter).where(
+        SummaryCounter.key.in_([PATIENTS, CASES, CRITICAL_CASES, UNPAID_INVOICES])
+        | SummaryCounter.key.like("visits:%")
+        | SummaryCounter.key.like("org:%")
+    ))
+    session.add_all(SummaryCounter(key=key, value=value, updated_at=now) for key, value in counts.items())
+    await session.commit()
+    with scoped_to(None):
+        await cache.invalidate(*cache.SCOPES)
+    return counts
+
+async def ensure_counters():
+    """Seed the store on first boot against an existing database"""
+    async with AsyncSession(async_engine) as session:
+        if not (await session.exec(select(SummaryCounter.key).limit(1))).first():
+            await recount(session)
+
+async def reconcile_periodically(interval: int = SUMMARY_RECONCILE_SECONDS):
+    """Background task: full recount every `interval` seconds"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with AsyncSession(async_engine) as session:
+                await recount(session)
+        except Exception as e:
+            print(f"⚠️ Summary reconciliation failed: {e}")
@@ -0,0 +1,338 @@
+import base64
+import binascii
+import json
+import zlib
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import event, false, insert, literal
+from sqlalchemy.orm import Session
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.config import settings
+from app.database import async_engine
+from app.models.cases import Case, WoundRecord
+from app.models.patients import Patient
+from app.models.sync import ChangeLog, SyncReceipt
+from app.models.visits import NurseActivityLog, Visit, Vitals
+from app.utils import cache
+from app.utils import summary as counters
+from app.utils import vitals as vitals_util
+from app.utils.tenancy import current_org
+
+# Offline sync for field devices.
+#   pull: rows of the tracked tables changed since a server-issued token,
+#         read from an append-only change_log written on every ORM flush;
+#         each entry carries its row's org_id and a tenant reads only its own
+#   push: one (optionally gzip-compressed) batch of visits, vitals,
+#         activity logs and wound records, each op carrying a client
+#         idempotency key so a retried upload never creates duplicates
+#         (receipts, too, belong to the tenant that pushed them)
+
+# Change-log entries per pull page
+SYNC_PULL_LIMIT = settings.SYNC_PULL_LIMIT
+# Operations accepted per push
+SYNC_MAX_OPS = settings.SYNC_MAX_OPS
+# Decompressed push body limit
+SYNC_MAX_PUSH_BYTES = settings.SYNC_MAX_PUSH_BYTES
+# Postgres hands out change ids before commit, so a later id can become
+# visible first; pulls there skip entries younger than this window
+SYNC_SETTLE_SECONDS = settings.SYNC_SETTLE_SECONDS
+
+TRACKED = {"patients": Patient, "cases": Case, "visits": Visit, "vitals": Vitals}
+_TABLE_OF = {model: name for name, model in TRACKED.items()}
+
+ENTITIES = {"visit": Visit, "vitals": Vitals, "activity": NurseActivityLog, "wound": WoundRecord}
+
+# ------------------------------------------------------
+#                   CHANGE TRACKING
+# ------------------------------------------------------
+@event.listens_for(Session, "after_flush")
+def _log_changes(session, flush_context):
+    """Append a change_log row for every tracked row a flush wrote"""
+    now = datetime.utcnow()
+    tenant = current_org()
+    rows = []
+    # unscoped flushes: vitals (no org_id column) take their patient's
+    orphans = []
+    for objects, deleted in ((session.new, False), (session.dirty, False), (session.deleted, True)):
+        for obj in objects:
+            table = _TABLE_OF.get(type(obj))
+            if table is None or obj.id is None:
+                continue
+            if objects is session.dirty and not session.is_modified(obj, include_collections=False):
+                continue
+            org_id = getattr(obj, "org_id", tenant)
+            rows.append({"table_name": table, "row_id": obj.id, "org_id": org_id, "deleted": deleted, "changed_at": now})
+            if org_id is None and isinstance(obj, Vitals) and obj.patient_id:
+                orphans.append((rows[-1], obj.patient_id))
+    if orphans:
+        orgs = dict(session.connection().execute(
+            select(Patient.id, Patient.org_id).where(Patient.id.in_({patient_id for _, patient_id in orphans}))
+        ).all())
+        for row, patient_id in orphans:
+            row["org_id"] = orgs.get(patient_id)
+    if rows:
+        session.connection().execute(insert(ChangeLog), rows)
+
+async def record_changes(session: AsyncSession, table: str, changed: Iterable[Tuple[int, Optional[int]]],
+                         deleted: bool = False):
+    """Log (row id, org_id) pairs written outside the ORM (Core bulk inserts), in the caller's transaction"""
+    now = datetime.utcnow()
+    rows = [{"table_name": table, "row_id": row_id, "org_id": org_id, "deleted": deleted, "changed_at": now}
+            for row_id, org_id in changed]
+    if rows:
+        await session.execute(insert(ChangeLog), rows)
+
+async def ensure_change_log():
+    """Seed the change log with every existing row on first boot, so a
+    device's first pull (no token) receives the full data set"""
+    async with async_engine.begin() as conn:
+        if (await conn.execute(select(ChangeLog.id).limit(1))).first():
+            return
+        now = datetime.utcnow()
+        for table, model in TRACKED.items():
+            org_id = model.org_id if hasattr(model, "org_id") else (
+                select(Patient.org_id).where(Patient.id == model.patient_id).scalar_subquery()
+            )
+            await conn.execute(insert(ChangeLog).from_select(
+                ["table_name", "row_id", "org_id", "deleted", "changed_at"],
+                select(literal(table), model.id, org_id, false(), literal(now)).order_by(model.id),
+            ))
+
+# ------------------------------------------------------
+#                        PULL
+# ------------------------------------------------------
+def encode_token(seq: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([seq]).encode()).decode()
+
+def decode_token(token: Optional[str]) -> int:
+    if not token:
+        return 0
+    try:
+        (seq,) = json.loads(base64.urlsafe_b64decode(token.encode()))
+        return int(seq)
+    except (binascii.Error, ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+
+async def pull_changes(session: AsyncSession, since: int, limit: int = SYNC_PULL_LIMIT) -> Dict:
+    """Current state of every tracked row of the tenant changed after change id `since`"""
+    stmt = (
+        select(ChangeLog.id, ChangeLog.table_name, ChangeLog.row_id, ChangeLog.deleted)
+        .where(ChangeLog.id > since).order_by(ChangeLog.id).limit(limit)
+    )
+    # change_log is not a tenant model: scope it here, or other clinics'
+    # row ids would come back as tombstones once select(model) drops them
+    org_id = current_org()
+    if org_id is not None:
+        stmt = stmt.where(ChangeLog.org_id == org_id)
+    if session.bind.dialect.name == "postgresql" and SYNC_SETTLE_SECONDS > 0:
+        stmt = stmt.where(ChangeLog.changed_at <= datetime.utcnow() - timedelta(seconds=SYNC_SETTLE_SECONDS))
+    entries = (await session.exec(stmt)).all()
+
+    # a row touched several times in this page is sent once, as it is now
+    latest: Dict[str, Dict[int, bool]] = {}
+    for entry in entries:
+        latest.setdefault(entry.table_name, {})[entry.row_id] = entry.deleted
+
+    changes: Dict[str, List[Dict]] = {}
+    deleted: Dict[str, List[int]] = {}
+    for table, rows in latest.items():
+        model = TRACKED.get(table)
+        if model is None:
+            continue
+        live = [row_id for row_id, gone in rows.items() if not gone]
+        found = (await session.exec(select(model).where(model.id.in_(live)))).all() if live else []
+        if found:
+            changes[table] = [row.model_dump(mode="json") for row in found]
+        found_ids = {row.id for row in found}
+        gone = [row_id for row_id in rows if row_id not in found_ids]
+        if gone:
+            deleted[table] = gone
+
+    return {
+        "token": encode_token(entries[-1].id if entries else since),
+        "has_more": len(entries) == limit,
+        "changes": changes,
+        "deleted": deleted,
+    }
+
+# ------------------------------------------------------
+#                        PUSH
+# ------------------------------------------------------
+def read_push_body(raw: bytes, encoding: Optional[str]) -> bytes:
+    """Undo Content-Encoding (gzip/deflate), refusing oversized payloads"""
+    encoding = (encoding or "identity").strip().lower()
+    if encoding == "identity":
+        body = raw
+    elif encoding in ("gzip", "deflate"):
+        # wbits=47: accept gzip or zlib framing
+        inflater = zlib.decompressobj(wbits=47)
+        try:
+            body = inflater.decompress(raw, SYNC_MAX_PUSH_BYTES + 1)
+        except zlib.error:
+            raise HTTPException(status_code=400, detail="Corrupt compressed body")
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported Content-Encoding '{encoding}'")
+    if len(body) > SYNC_MAX_PUSH_BYTES:
+        raise HTTPException(status_code=413, detail="Push batch too large")
+    return body
+
+class PushProcessor:
+    """Apply one device batch in a single transaction.
+
+    Ops already applied (known idempotency key) are reported as duplicates
+    with their original id; invalid ops are reported and skipped without
+    failing the rest of the batch.
+    """
+
+    def __init__(self, session: AsyncSession, nurse_id: int, device_id: Optional[str] = None):
+        self.session = session
+        self.nurse_id = nurse_id
+        self.device_id = device_id
+        self.org_id = current_org()
+        self.results: List[Dict] = []
+
+    async def run(self, ops: List) -> Dict:
+        keys = {op.key for op in ops} | {op.visit_key for op in ops if op.visit_key}
+        found = (await self.session.exec(select(SyncReceipt).where(SyncReceipt.key.in_(keys)))).all()
+        # keys are unique across tenants: another clinic's receipt is neither
+        # a duplicate nor a visit_key to resolve, and its key cannot be reused
+        receipts = {r.key: r for r in found if self.org_id is None or r.org_id == self.org_id}
+        taken = {r.key for r in found} - receipts.keys()
+
+        self.results = [{"key": op.key, "status": "pending", "id": None, "error": None} for op in ops]
+        parsed = {}
+        batch_keys: Set[str] = set()
+        for i, op in enumerate(ops):
+            if op.key in receipts:
+                self._done(i, "duplicate", receipts[op.key].row_id)
+            elif op.key in taken:
+                self._fail(i, "key already used")
+            elif op.key in batch_keys:
+                self._fail(i, "key repeated in batch")
+            else:
+                batch_keys.add(op.key)
+                data = {k: v for k, v in op.data.items() if k != "id"}
+                if op.visit_key:
+                    data["visit_id"] = 0  # resolved once the visit has an id
+                if op.type == "activity":
+                    data["nurse_id"] = self.nurse_id
+                try:
+                    parsed[i] = ENTITIES[op.type].model_validate(data)
+                except ValidationError as e:
+                    self._fail(i, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+
+        existing = await self._existing(parsed.values())
+
+        # visits first: children pushed alongside them need their ids
+        visit_ops = {}
+        for i, obj in parsed.items():
+            if isinstance(obj, Visit):
+                if obj.patient_id not in existing["patients"]:
+                    self._fail(i, f"patient {obj.patient_id} not found")
+                elif obj.case_id is not None and obj.case_id not in existing["cases"]:
+                    self._fail(i, f"case {obj.case_id} not found")
+                else:
+                    obj.recorded_by = obj.recorded_by or self.nurse_id
+                    self.session.add(obj)
+                    visit_ops[ops[i].key] = i
+        await self.session.flush()
+
+        children = []
+        for i, obj in parsed.items():
+            if isinstance(obj, Visit):
+                continue
+            op = ops[i]
+            if isinstance(obj, WoundRecord):
+                if obj.case_id not in existing["cases"]:
+                    self._fail(i, f"case {obj.case_id} not found")
+                    continue
+            else:
+                visit_id = self._resolve_visit(i, op, obj, receipts, visit_ops, parsed, existing)
+                if visit_id is None:
+                    continue
+                obj.visit_id = visit_id
+                if isinstance(obj, Vitals):
+                    vitals_util.normalize(obj)
+            children.append(i)
+        # a reading belongs to its visit's patient, whatever patient_id the device sent
+        mismatched = {id(v) for v in await vitals_util.fill_patient_ids(
+            self.session, [parsed[i] for i in children if isinstance(parsed[i], Vitals)]
+        )}
+        for i in [i for i in children if id(parsed[i]) in mismatched]:
+            self._fail(i, f"patient_id does not match visit {parsed[i].visit_id}")
+            children.remove(i)
+        self.session.add_all(parsed[i] for i in children)
+        await self.session.flush()
+
+        created = list(visit_ops.values()) + children
+        for i in created:
+            self._done(i, "created", parsed[i].id)
+        if created:
+            await self.session.execute(insert(SyncReceipt), [{
+                "key": ops[i].key, "entity": ops[i].type, "row_id": parsed[i].id,
+                "org_id": getattr(parsed[i], "org_id", self.org_id),
+                "device_id": self.device_id, "created_at": datetime.utcnow(),
+            } for i in created])
+        # visits took their patient's (or the tenant's) org_id on flush
+        visit_days: Dict[Optional[int], Dict[str, int]] = {}
+        for i in visit_ops.values():
+            key = counters.visits_key(parsed[i].visit_date.date())
+            days = visit_days.setdefault(parsed[i].org_id, {})
+            days[key] = days.get(key, 0) + 1
+        for org_id, days in visit_days.items():
+            await counters.bump(self.session, days, org_id)
+        await self.session.commit()
+        await cache.invalidate(cache.VISITS)
+
+        return {
+            "created": sum(r["status"] == "created" for r in self.results),
+            "duplicates": sum(r["status"] == "duplicate" for r in self.results),
+            "failed": sum(r["status"] == "error" for r in self.results),
+            "results": self.results,
+        }
+
+    def _resolve_visit(self, index, op, obj, receipts, visit_ops, parsed, existing) -> Optional[int]:
+        """Visit id for a vitals/activity op: pushed id, or a visit_key from this or an earlier batch"""
+        if op.visit_key:
+            if op.visit_key in visit_ops:
+                return parsed[visit_ops[op.visit_key]].id
+            receipt = receipts.get(op.visit_key)
+            if receipt and receipt.entity == "visit":
+                return receipt.row_id
+            self._fail(index, f"visit_key {op.visit_key} not found")
+            return None
+        if obj.visit_id not in existing["visits"]:
+            self._fail(index, f"visit {obj.visit_id} not found")
+            return None
+        return obj.visit_id
+
+    async def _existing(self, objects) -> Dict[str, Set[int]]:
+        """Referenced patient/case/visit ids that exist — one query per table"""
+        wanted = {"patients": set(), "cases": set(), "visits": set()}
+        for obj in objects:
+            if isinstance(obj, Visit):
+                wanted["patients"].add(obj.patient_id)
+                if obj.case_id is not None:
+                    wanted["cases"].add(obj.case_id)
+            elif isinstance(obj, WoundRecord):
+                wanted["cases"].add(obj.case_id)
+            elif obj.visit_id:
+                wanted["visits"].add(obj.visit_id)
+        found = {}
+        for table, model in (("patients", Patient), ("cases", Case), ("visits", Visit)):
+            ids = [i for i in wanted[table] if i is not None]
+            found[table] = set((await self.session.exec(
+                select(model.id).where(model.id.in_(ids))
+            )).all()) if ids else set()
+        return found
+
+    def _done(self, index: int, status: str, row_id: int):
+        self.results[index].update(status=status, id=row_id)
+
+    def _fail(self, index: int, error: str):
+        self.results[index].update(status="error", error=error)
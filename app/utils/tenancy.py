@@ -0,0 +1,120 @@
+import contextlib
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, with_loader_criteria
+
+from app.models.cases import Case, WoundRecord
+from app.models.invoices import Invoice, Payment
+from app.models.jobs import Job
+from app.models.patients import Patient
+from app.models.visits import NurseActivityLog, Visit, Vitals
+from app.utils.security import is_platform, verify_token_cached
+
+# Tenant scoping.
+#
+# Each organisation (clinic) sees only its own rows. The tenant is the
+# org_id claim of the caller's token (see routers.auth.login):
+# TenantMiddleware holds it in a context variable for the request, and a
+# do_orm_execute hook adds `org_id = :tenant` to every ORM SELECT, UPDATE
+# and DELETE of a tenant model — session.get, relationship loads and
+# NDJSON exports included. Child tables without an org_id (vitals,
+# wounds, activity, payments) are scoped through their parent. New rows
+# take the tenant's org_id on flush; code inserting through Core sets it
+# from current_org() itself.
+#
+# Only tokens with the platform role (users.role, set by operators) run
+# unscoped and see every clinic. A request with no token, an invalid one
+# or one with neither claim runs as NO_TENANT and sees no tenant rows;
+# get_current_user refuses it on every data router anyway. Background
+# work runs scoped_to() the tenant that queued it.
+
+_current_org: ContextVar[Optional[int]] = ContextVar("current_org", default=None)
+
+# Tenant of requests without a usable identity: no organisation has id 0
+NO_TENANT = 0
+
+# Models with their own org_id column
+TENANT_MODELS = (Patient, Case, Visit, Invoice, Job)
+# New rows of these take their patient's org_id when no tenant is set
+PATIENT_CHILDREN = (Case, Visit, Invoice)
+
+def current_org() -> Optional[int]:
+    """The tenant of the running request or job (None: not scoped)"""
+    return _current_org.get()
+
+@contextlib.contextmanager
+def scoped_to(org_id: Optional[int]):
+    """Run a block as tenant `org_id`; None runs it unscoped (e.g. a global recount)"""
+    token = _current_org.set(org_id)
+    try:
+        yield
+    finally:
+        _current_org.reset(token)
+
+def _criteria(org_id: int):
+    return (
+        *(with_loader_criteria(model, lambda cls: cls.org_id == org_id, include_aliases=True)
+          for model in TENANT_MODELS),
+        with_loader_criteria(Vitals, Vitals.patient_id.in_(select(Patient.id).where(Patient.org_id == org_id))),
+        with_loader_criteria(NurseActivityLog,
+                             NurseActivityLog.visit_id.in_(select(Visit.id).where(Visit.org_id == org_id))),
+        with_loader_criteria(WoundRecord, WoundRecord.case_id.in_(select(Case.id).where(Case.org_id == org_id))),
+        with_loader_criteria(Payment, Payment.invoice_id.in_(select(Invoice.id).where(Invoice.org_id == org_id))),
+    )
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_statement(state):
+    org_id = _current_org.get()
+    if org_id is None or state.is_column_load or state.is_relationship_load:
+        return
+    if state.is_select or state.is_update or state.is_delete:
+        state.statement = state.statement.options(*_criteria(org_id))
+
+@event.listens_for(Session, "before_flush")
+def _assign_org(session, flush_context, instances):
+    org_id = _current_org.get()
+    new = [obj for obj in session.new if isinstance(obj, TENANT_MODELS)]
+    if org_id is not None:
+        for obj in new:
+            obj.org_id = org_id
+        return
+    children = [obj for obj in new if isinstance(obj, PATIENT_CHILDREN) and obj.org_id is None and obj.patient_id]
+    if children:
+        orgs = dict(session.connection().execute(
+            select(Patient.id, Patient.org_id).where(Patient.id.in_({obj.patient_id for obj in children}))
+        ).all())
+        for obj in children:
+            obj.org_id = orgs.get(obj.patient_id)
+
+def _token_org(scope) -> Optional[int]:
+    """The request's tenant: its token's org_id, None for the platform role, else NO_TENANT"""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            try:
+                payload = verify_token_cached(value.decode("latin-1").replace("Bearer ", ""))
+            except HTTPException:
+                return NO_TENANT
+            if payload.get("org_id") is not None:
+                return payload["org_id"]
+            return None if is_platform(payload) else NO_TENANT
+    return NO_TENANT
+
+class TenantMiddleware:
+    """Pure ASGI middleware: runs the request scoped to its token's tenant"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        org_id = _token_org(scope)
+        if org_id is None:
+            await self.app(scope, receive, send)
+            return
+        with scoped_to(org_id):
+            await self.app(scope, receive, send)
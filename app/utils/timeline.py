@@ -0,0 +1,105 @@
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from fastapi import HTTPException
+from sqlalchemy.orm import selectinload
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.cases import Case, WoundRecord
+from app.models.invoices import Invoice
+from app.models.patients import Patient
+from app.models.visits import Visit
+
+# Patient chart in one request: the patient plus every related section,
+# each loaded with one SELECT ... WHERE fk IN (...) (selectinload), so the
+# query count is fixed (at most 8) however many cases/visits there are.
+
+SECTIONS = ("cases", "wounds", "visits", "vitals", "activity", "invoices", "payments")
+# a child section is nested under its parent, so asking for it loads both
+PARENT = {"wounds": "cases", "vitals": "visits", "activity": "visits", "payments": "invoices"}
+
+def parse_sections(fields: Optional[str]) -> Set[str]:
+    """Sections named in `fields` (comma-separated; all when empty)"""
+    if not fields:
+        return set(SECTIONS)
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = wanted - set(SECTIONS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown timeline fields: {', '.join(sorted(unknown))} (choose from {', '.join(SECTIONS)})",
+        )
+    return wanted | {PARENT[f] for f in wanted if f in PARENT}
+
+async def load_timeline(
+    session: AsyncSession,
+    patient_id: int,
+    sections: Set[str],
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> Optional[Patient]:
+    """Patient with the requested sections eager-loaded; dated rows
+    (visits, wounds, invoices) limited to [since, until)"""
+    def dated(relationship, column):
+        criteria = []
+        if since:
+            criteria.append(column >= since)
+        if until:
+            criteria.append(column < until)
+        return relationship.and_(*criteria) if criteria else relationship
+
+    options = []
+    if "cases" in sections:
+        cases = selectinload(Patient.cases)
+        if "wounds" in sections:
+            cases = cases.selectinload(dated(Case.wounds, WoundRecord.created_at))
+        options.append(cases)
+    if "visits" in sections:
+        visits = selectinload(dated(Patient.visits, Visit.visit_date))
+        children = []
+        if "vitals" in sections:
+            children.append(selectinload(Visit.vitals))
+        if "activity" in sections:
+            children.append(selectinload(Visit.activities))
+        options.append(visits.options(*children) if children else visits)
+    if "invoices" in sections:
+        invoices = selectinload(dated(Patient.invoices, Invoice.invoice_date))
+        if "payments" in sections:
+            invoices = invoices.selectinload(Invoice.payments)
+        options.append(invoices)
+
+    return (await session.exec(select(Patient).where(Patient.id == patient_id).options(*options))).first()
+
+def _newest_first(rows, attr: str):
+    return sorted(rows, key=lambda row: getattr(row, attr), reverse=True)
+
+def _dump(row) -> Dict:
+    return row.model_dump(mode="json")
+
+def timeline_dict(patient: Patient, sections: Set[str]) -> Dict:
+    """JSON-ready chart: sections newest first, children nested in their parent"""
+    chart = {"patient": _dump(patient)}
+    if "cases" in sections:
+        chart["cases"] = [
+            {**_dump(case), **({"wounds": [_dump(w) for w in _newest_first(case.wounds, "created_at")]}
+                               if "wounds" in sections else {})}
+            for case in _newest_first(patient.cases, "created_at")
+        ]
+    if "visits" in sections:
+        visits = []
+        for visit in _newest_first(patient.visits, "visit_date"):
+            entry = _dump(visit)
+            if "vitals" in sections:
+                entry["vitals"] = [_dump(v) for v in _newest_first(visit.vitals, "measured_at")]
+            if "activity" in sections:
+                entry["activity"] = [_dump(a) for a in _newest_first(visit.activities, "timestamp")]
+            visits.append(entry)
+        chart["visits"] = visits
+    if "invoices" in sections:
+        chart["invoices"] = [
+            {**_dump(invoice), **({"payments": [_dump(p) for p in _newest_first(invoice.payments, "paid_at")]}
+                                  if "payments" in sections else {})}
+            for invoice in _newest_first(patient.invoices, "invoice_date")
+        ]
+    return chart
@@ -0,0 +1,142 @@
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Integer, cast, func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.models.visits import Visit, Vitals
+
+# Vitals trend queries.
+#
+# Readings are downsampled in the database: one GROUP BY over
+# (patient_id, measured_at) — served by ix_vitals_patient_id_measured_at —
+# returns min/max/avg per metric per time bucket, so a year of readings
+# leaves the database as at most `max_points` rows.
+
+METRICS = ("temperature", "pulse", "systolic", "diastolic", "respiratory_rate", "spo2")
+# bucket widths tried (smallest first) when the caller leaves bucket=auto
+BUCKET_LADDER = ("5m", "15m", "1h", "3h", "6h", "12h", "1d", "2d", "1w", "30d")
+UNIT_SECONDS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+DEFAULT_WINDOW = timedelta(days=90)
+
+BLOOD_PRESSURE = re.compile(r"^\s*(\d{2,3})\s*/\s*(\d{2,3})\b")
+
+def parse_blood_pressure(text: Optional[str]) -> Tuple[Optional[int], Optional[int]]:
+    """(systolic, diastolic) from "120/80" (trailing notes ignored); (None, None) if implausible"""
+    match = BLOOD_PRESSURE.match(text or "")
+    if not match:
+        return None, None
+    systolic, diastolic = int(match.group(1)), int(match.group(2))
+    if not (50 <= systolic <= 300 and 20 <= diastolic <= 200 and systolic > diastolic):
+        return None, None
+    return systolic, diastolic
+
+def normalize(vitals: Vitals):
+    """Fill the numeric BP columns from the free-text reading (or the text from the numbers)"""
+    if vitals.systolic is None and vitals.diastolic is None:
+        vitals.systolic, vitals.diastolic = parse_blood_pressure(vitals.blood_pressure)
+    elif not vitals.blood_pressure and vitals.systolic and vitals.diastolic:
+        vitals.blood_pressure = f"{vitals.systolic}/{vitals.diastolic}"
+
+async def fill_patient_ids(session: AsyncSession, readings: Iterable[Vitals]) -> List[Vitals]:
+    """Denormalise each reading's patient_id from its visit — one query.
+
+    The visit always wins: a patient_id sent by the client is overwritten.
+    Returns the readings whose sent patient_id named another patient, for
+    the caller to reject.
+    """
+    readings = list(readings)
+    visit_ids = {v.visit_id for v in readings}
+    if not visit_ids:
+        return []
+    patients = dict((await session.exec(
+        select(Visit.id, Visit.patient_id).where(Visit.id.in_(visit_ids))
+    )).all())
+    mismatched = []
+    for v in readings:
+        patient_id = patients.get(v.visit_id)
+        if v.patient_id is not None and v.patient_id != patient_id:
+            mismatched.append(v)
+        v.patient_id = patient_id
+    return mismatched
+
+def naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    """Timestamps are stored as naive UTC; convert aware query bounds to match"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+def bucket_seconds(bucket: str) -> int:
+    return int(bucket[:-1]) * UNIT_SECONDS[bucket[-1]]
+
+def choose_bucket(since: datetime, until: datetime, max_points: int) -> str:
+    """Smallest ladder width that keeps the series within max_points buckets"""
+    span = (until - since).total_seconds()
+    for bucket in BUCKET_LADDER:
+        if span / bucket_seconds(bucket) <= max_points:
+            return bucket
+    return BUCKET_LADDER[-1]
+
+def parse_metrics(metrics: Optional[str]) -> List[str]:
+    if not metrics:
+        return list(METRICS)
+    wanted = [m.strip() for m in metrics.split(",") if m.strip()]
+    unknown = set(wanted) - set(METRICS)
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown vitals metrics: {', '.join(sorted(unknown))} (choose from {', '.join(METRICS)})",
+        )
+    return wanted
+
+def _bucket_index(dialect: str, width: int):
+    """Epoch-aligned bucket number of measured_at, in SQL"""
+    if dialect == "postgresql":
+        return cast(func.floor(func.extract("epoch", Vitals.measured_at) / width), Integer)
+    return cast(func.strftime("%s", Vitals.measured_at), Integer) // width
+
+async def downsample(
+    session: AsyncSession,
+    patient_id: int,
+    since: datetime,
+    until: datetime,
+    bucket: str,
+    metrics: Sequence[str],
+) -> Dict:
+    """Column-oriented series: bucket starts, reading counts and min/max/avg per metric"""
+    width = bucket_seconds(bucket)
+    index = _bucket_index(session.bind.dialect.name, width).label("bucket")
+    columns = [index, func.count()]
+    for name in metrics:
+        column = getattr(Vitals, name)
+        columns += [func.min(column), func.max(column), func.avg(column)]
+    rows = (await session.exec(
+        select(*columns)
+        .where(Vitals.patient_id == patient_id, Vitals.measured_at >= since, Vitals.measured_at < until)
+        .group_by(index)
+        .order_by(index)
+    )).all()
+
+    series = {name: {"min": [], "max": [], "avg": []} for name in metrics}
+    times, counts = [], []
+    for row in rows:
+        times.append(datetime.fromtimestamp(int(row[0]) * width, tz=timezone.utc).replace(tzinfo=None).isoformat())
+        counts.append(row[1])
+        for i, name in enumerate(metrics):
+            low, high, mean = row[2 + 3 * i: 5 + 3 * i]
+            series[name]["min"].append(low)
+            series[name]["max"].append(high)
+            series[name]["avg"].append(round(mean, 2) if mean is not None else None)
+    return {
+        "patient_id": patient_id,
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "bucket": bucket,
+        "bucket_seconds": width,
+        "t": times,
+        "n": counts,
+        "series": series,
+    }
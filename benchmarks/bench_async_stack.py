@@ -0,0 +1,91 @@
+"""Sync vs async stack: requests/sec and p99 latency under concurrency.
+
+The sync stack is the pre-async patients handlers (plain `def` + blocking
+Session, so every request occupies a threadpool worker); the async stack
+is app.main:app. Both are served by uvicorn against the same SQLite file.
+
+    python -m benchmarks.bench_async_stack [--patients 10000]
+"""
+import argparse
+import os
+from typing import List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException
+from sqlmodel import Session, select
+
+from app.database import get_session
+from app.models.patients import Patient
+from app.utils.security import verify_token
+
+# ------------------------------------------------------
+#        SYNC REFERENCE STACK (served in a subprocess)
+# ------------------------------------------------------
+sync_app = FastAPI()
+
+
+def _check(authorization: Optional[str]):
+    if not authorization:
+        raise HTTPException(status_code=401, detail="Missing authorization header")
+    verify_token(authorization.replace("Bearer ", ""))
+
+
+@sync_app.get("/health")
+def health():
+    return {"status": "healthy"}
+
+
+@sync_app.get("/api/patients/", response_model=List[Patient])
+def list_patients(skip: int = 0, limit: int = 100,
+                  session: Session = Depends(get_session),
+                  authorization: str = Header(None)):
+    _check(authorization)
+    return session.exec(select(Patient).offset(skip).limit(limit)).all()
+
+
+@sync_app.get("/api/patients/{patient_id}", response_model=Patient)
+def get_patient(patient_id: int, session: Session = Depends(get_session),
+                authorization: str = Header(None)):
+    _check(authorization)
+    patient = session.get(Patient, patient_id)
+    if not patient:
+        raise HTTPException(status_code=404, detail="Patient not found")
+    return patient
+
+
+def main():
+    from benchmarks.common import (
+        auth_headers, print_table, run_load, seed_patients, serve, temp_database_url,
+    )
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[50, 200, 1000])
+    parser.add_argument("--duration", type=float, default=30.0,
+                        help="seconds per concurrency level")
+    args = parser.parse_args()
+
+    url = temp_database_url()
+    seed_patients(url, args.patients)
+    headers = auth_headers()
+    paths = []
+    for i in range(200):
+        paths.append(f"/api/patients/?skip={(i * 37) % args.patients}&limit=20")
+        paths.append(f"/api/patients/{(i * 53) % args.patients + 1}")
+
+    rows = []
+    for stack, app_path in (("sync", "benchmarks.bench_async_stack:sync_app"),
+                            ("async", "app.main:app")):
+        with serve(app_path, env={"DATABASE_URL": url}) as server:
+            for concurrency in args.concurrency:
+                total = max(2000, concurrency * 4)
+                result = run_load(server.url, paths, concurrency, total, headers=headers,
+                                  duration=args.duration)
+                rows.append({"stack": stack, **result})
+                print(f"  {stack:5} c={concurrency:<5} {result['rps']} req/s  p99 {result['p99_ms']} ms")
+
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Bytes on the wire and server CPU per request, by Content-Encoding.
+
+Serves the app in-process (ASGI, no sockets) and fetches a patients page,
+an unpaid-invoices page, the NDJSON patient export and one patient with
+each coding the server offers (identity, gzip, br / zstd when installed),
+reading the raw body as sent. CPU is process time per request, so it
+includes the client's share, which is the same for every coding; compare
+the columns against identity. The conditional rows revalidate the patient
+with If-None-Match / If-Modified-Since and expect an empty 304. The
+response cache is off, so every request builds its response.
+
+    python -m benchmarks.bench_compression [--rows 5000] [--limit 1000] [--repeat 30]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import auth_headers, bulk_insert, create_schema, print_table, seed_patients, temp_database_url
+
+
+def seed(url: str, rows: int):
+    from app.models.invoices import Invoice
+
+    seed_patients(url, rows)
+    engine = create_schema(url)
+    bulk_insert(engine, Invoice, ({"patient_id": 1 + i, "amount": 4500.0, "status": "pending", "created_by": 1}
+                                  for i in range(rows)))
+
+
+async def fetch(client, path, params, headers):
+    """One GET; returns (status, raw bytes received, response headers)"""
+    async with client.stream("GET", path, params=params, headers=headers) as r:
+        size = 0
+        async for chunk in r.aiter_raw():
+            size += len(chunk)
+        return r.status_code, size, r.headers
+
+
+async def time_requests(client, path, params, headers, repeat):
+    cpu, wall = [], []
+    for _ in range(repeat):
+        c0, w0 = time.process_time(), time.perf_counter()
+        status, size, response_headers = await fetch(client, path, params, headers)
+        cpu.append(time.process_time() - c0)
+        wall.append(time.perf_counter() - w0)
+    return status, size, response_headers, statistics.median(cpu), statistics.median(wall)
+
+
+async def measure(limit: int, repeat: int):
+    import app.main
+    from app.database import dispose_engines
+    from app.utils import compression
+
+    endpoints = (
+        ("patients", "/api/patients/", {"limit": limit}),
+        ("unpaid", "/api/invoices/billing/invoices/unpaid", {"limit": limit}),
+        ("patients ndjson", "/api/patients/", {"format": "ndjson"}),
+        ("get_patient", "/api/patients/1", {}),
+    )
+    auth = auth_headers()
+    rows = []
+    ok = True
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path, params in endpoints:
+            baseline = None
+            for coding in ("identity", *compression.encoders):
+                headers = {**auth, "Accept-Encoding": coding}
+                status, size, response_headers, cpu, wall = await time_requests(client, path, params, headers, repeat)
+                sent = response_headers.get("content-encoding", "identity")
+                ok &= status == 200 and (sent == coding or size < compression.COMPRESSION_MIN_SIZE)
+                baseline = baseline or (size, cpu)
+                rows.append({
+                    "endpoint": name, "encoding": sent, "bytes": size,
+                    "saved": f"{1 - size / baseline[0]:.0%}",
+                    "cpu_us": round(cpu * 1e6), "extra_cpu_us": round((cpu - baseline[1]) * 1e6),
+                    "wall_ms": round(wall * 1000, 2),
+                })
+
+        # revalidation of a single patient: full body vs 304
+        coding = next(iter(compression.encoders), "identity")
+        headers = {**auth, "Accept-Encoding": coding}
+        _, _, first, _, _ = await time_requests(client, "/api/patients/1", {}, headers, 1)
+        for label, validator in (("If-None-Match", first.get("etag")), ("If-Modified-Since", first.get("last-modified"))):
+            status, size, _, cpu, wall = await time_requests(
+                client, "/api/patients/1", {}, {**headers, label: validator}, repeat,
+            )
+            ok &= status == 304 and size == 0
+            rows.append({
+                "endpoint": f"get_patient {label}", "encoding": f"{status}", "bytes": size, "saved": "",
+                "cpu_us": round(cpu * 1e6), "extra_cpu_us": "", "wall_ms": round(wall * 1000, 2),
+            })
+    # pooled aiosqlite connections run on threads that would keep the process alive
+    await dispose_engines()
+    return rows, ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    url = temp_database_url("compression.db")
+    os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+    seed(url, args.rows)
+    rows, ok = asyncio.run(measure(args.limit, args.repeat))
+    print_table(rows)
+    if not ok:
+        print("FAIL: a coding was not applied or a revalidation did not return an empty 304")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""/dashboard/summary cost: live COUNT(*) queries vs. the summary store.
+
+Seeds N patients, cases, invoices and visits for each size, then times
+the old query set against the counter read.
+
+    python -m benchmarks.bench_dashboard_summary [--sizes 10000 100000 1000000]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from benchmarks.common import bulk_insert, create_schema, print_table, seed_patients, temp_database_url
+from app.database import to_async_url
+from app.models.cases import Case
+from app.models.invoices import Invoice
+from app.models.patients import Patient
+from app.models.visits import Visit
+from app.utils import summary
+
+
+async def live_summary(session: AsyncSession):
+    """The pre-summary-store handler: a COUNT(*) per figure"""
+    async def count(stmt):
+        return (await session.exec(stmt)).one()
+
+    start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return {
+        "patients": await count(select(func.count()).select_from(Patient)),
+        "cases": await count(select(func.count()).select_from(Case)),
+        "unpaid": await count(select(func.count()).select_from(Invoice).where(Invoice.status != "paid")),
+        "critical": await count(select(func.count()).select_from(Case).where(Case.status == "critical")),
+        "visits_today": await count(select(func.count()).select_from(Visit).where(
+            Visit.visit_date >= start, Visit.visit_date < start + timedelta(days=1))),
+    }
+
+
+def seed(url: str, rows: int):
+    seed_patients(url, rows)
+    engine = create_schema(url)
+    rng = random.Random(7)
+    now = datetime.utcnow()
+    bulk_insert(engine, Case, ({
+        "patient_id": rng.randint(1, rows), "title": "Wound care",
+        "status": rng.choice(["open", "open", "closed", "critical"]),
+    } for _ in range(rows)))
+    bulk_insert(engine, Invoice, ({
+        "patient_id": rng.randint(1, rows), "amount": 1500.0,
+        "status": rng.choice(["pending", "paid", "paid"]),
+    } for _ in range(rows)))
+    bulk_insert(engine, Visit, ({
+        "patient_id": rng.randint(1, rows), "case_id": rng.randint(1, rows),
+        "visit_date": now + timedelta(hours=rng.randint(-24 * 60, 24 * 60)),
+    } for _ in range(rows)))
+
+
+async def measure(url: str, repeat: int):
+    engine = create_async_engine(to_async_url(url))
+    async with AsyncSession(engine) as session:
+        await summary.recount(session)
+
+        async def timed(fn):
+            start = time.perf_counter()
+            for _ in range(repeat):
+                await fn(session)
+                await session.commit()
+            return round((time.perf_counter() - start) / repeat * 1000, 3)
+
+        live = await timed(live_summary)
+        store = await timed(summary.read_summary)
+    await engine.dispose()
+    return live, store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        url = temp_database_url(f"summary-{size}.db")
+        seed(url, size)
+        live, store = asyncio.run(measure(url, args.repeat))
+        rows.append({"rows_per_table": size, "live_count_ms": live, "summary_store_ms": store,
+                     "speedup": round(live / store, 1) if store else "-"})
+        print(f"  {size}: live {live} ms, store {store} ms")
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Concurrent reads and writes against one SQLite file: legacy vs tuned pool.
+
+"legacy" reproduces the old engine settings (rollback journal,
+synchronous=FULL, pre-ping on every checkout); "tuned" runs the defaults
+(WAL, synchronous=NORMAL, mmap, larger page cache, read-only pool for GETs).
+Readers poll the patient list and dashboard while writers schedule visits
+and open cases.
+
+    python -m benchmarks.bench_db_pool [--seconds 15] [--readers 16] [--writers 8]
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, bulk_insert, create_schema, percentile, print_table, seed_patients, serve,
+    temp_database_url,
+)
+
+CONFIGS = {
+    "legacy": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "0",
+        "SQLITE_CACHE_SIZE": "-2000",
+        "DB_POOL_PRE_PING": "true",
+    },
+    "tuned": {},
+}
+
+READ_PATHS = ["/api/patients/?limit=50", "/api/dashboard/dashboard/summary"]
+SEED_CASES = 500
+
+
+def seed(url: str, patients: int):
+    from app.models.cases import Case
+
+    seed_patients(url, patients)
+    bulk_insert(create_schema(url), Case, (
+        {"patient_id": 1 + i % patients, "title": "Wound care"} for i in range(SEED_CASES)
+    ))
+
+
+def write_request(i: int):
+    if i % 2:
+        case_id = 1 + i % SEED_CASES
+        return "/api/visits/visits/", {"patient_id": case_id, "case_id": case_id,
+                                       "visit_date": "2026-01-15T09:00:00"}
+    return "/api/cases/cases/", {"patient_id": 1 + i % 500, "title": f"Dressing change {i}"}
+
+
+async def mixed_load(base_url: str, readers: int, writers: int, seconds: float, headers):
+    results = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    limits = httpx.Limits(max_connections=readers + writers)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + seconds
+
+        async def reader(n: int):
+            i = n
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    r = await client.get(READ_PATHS[i % len(READ_PATHS)], headers=headers)
+                    errors["read"] += r.status_code >= 400
+                except httpx.TransportError:
+                    errors["read"] += 1
+                results["read"].append(time.perf_counter() - start)
+                i += 1
+
+        async def writer(n: int):
+            i = n
+            while time.perf_counter() < deadline:
+                path, body = write_request(i)
+                start = time.perf_counter()
+                try:
+                    r = await client.post(path, json=body, headers=headers)
+                    errors["write"] += r.status_code >= 400
+                except httpx.TransportError:
+                    errors["write"] += 1
+                results["write"].append(time.perf_counter() - start)
+                i += writers
+
+        started = time.perf_counter()
+        await asyncio.gather(*(reader(n) for n in range(readers)), *(writer(n) for n in range(writers)))
+        elapsed = time.perf_counter() - started
+        status = (await client.get("/api/status")).json()
+
+    rows = []
+    for kind, latencies in results.items():
+        rows.append({
+            "kind": kind,
+            "requests": len(latencies),
+            "errors": errors[kind],
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        })
+    return rows, status.get("db_pool", {})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--seconds", type=float, default=15)
+    parser.add_argument("--readers", type=int, default=16)
+    parser.add_argument("--writers", type=int, default=8)
+    args = parser.parse_args()
+
+    headers = auth_headers()
+    rows = []
+    for name, env in CONFIGS.items():
+        url = temp_database_url(f"pool-{name}.db")
+        seed(url, args.patients)
+        with serve("app.main:app", env={"DATABASE_URL": url, **env}) as server:
+            results, pools = asyncio.run(
+                mixed_load(server.url, args.readers, args.writers, args.seconds, headers)
+            )
+        for row in results:
+            rows.append({"config": name, **row})
+        for pool_name, stats in pools.items():
+            print(f"  {name} {pool_name} pool: {stats}")
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
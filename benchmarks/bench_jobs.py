@@ -0,0 +1,125 @@
+"""Background job throughput, and API latency while 10k jobs drain.
+
+Queues --jobs invoice_batch jobs (--invoices-per-job invoices each),
+starts the server and lets its worker drain them at each JOB_CONCURRENCY
+in --concurrency, while --clients users poll /api/patients/?limit=20
+every --interval seconds. Reports jobs/s (from the jobs' own start and
+finish times) next to the pollers' p50/p99, against a run with an empty
+queue.
+
+    python -m benchmarks.bench_jobs [--jobs 10000] [--concurrency 1 4 16] [--clients 10]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, bulk_insert, create_schema, percentile, print_table, seed_patients, serve, temp_database_url,
+)
+
+POLL = "/api/patients/?limit=20"
+PATIENTS = 2000
+
+
+def seed(url: str, jobs: int, invoices_per_job: int):
+    from app.models.jobs import Job
+
+    seed_patients(url, PATIENTS)
+    engine = create_schema(url)
+    now = datetime.utcnow()
+    bulk_insert(engine, Job, (
+        {"type": "invoice_batch", "status": "queued", "attempts": 0, "max_attempts": 3,
+         "run_after": now, "created_at": now,
+         "payload": {"invoices": [{"patient_id": 1 + (i * invoices_per_job + k) % PATIENTS, "amount": 1500.0}
+                                  for k in range(invoices_per_job)]}}
+        for i in range(jobs)
+    ))
+    return engine
+
+
+def drained(engine):
+    """(jobs done, seconds from the first start to the last finish)"""
+    from sqlalchemy import func, select
+    from app.models.jobs import Job
+
+    with engine.connect() as conn:
+        done, first, last = conn.execute(
+            select(func.count(), func.min(Job.started_at), func.max(Job.finished_at)).where(Job.status == "succeeded")
+        ).one()
+    if not done:
+        return 0, 0.0
+    parse = lambda v: v if isinstance(v, datetime) else datetime.fromisoformat(v)  # noqa: E731
+    return done, (parse(last) - parse(first)).total_seconds()
+
+
+async def scenario(base_url: str, jobs: int, clients: int, interval: float, idle_seconds: float):
+    latencies = []
+    errors = 0
+    stop = asyncio.Event()
+    headers = auth_headers()
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        async def poller():
+            nonlocal errors
+            while not stop.is_set():
+                start = time.perf_counter()
+                try:
+                    errors += (await client.get(POLL, headers=headers)).status_code != 200
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+        async def watch():
+            if not jobs:
+                await asyncio.sleep(idle_seconds)
+            while jobs:
+                counts = (await client.get("/api/status")).json()["jobs"]
+                if counts["succeeded"] + counts["failed"] >= jobs:
+                    break
+                await asyncio.sleep(0.25)
+            stop.set()
+
+        await asyncio.gather(watch(), *(poller() for _ in range(clients)))
+    return {
+        "api_requests": len(latencies),
+        "api_errors": errors,
+        "api_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "api_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=10000)
+    parser.add_argument("--invoices-per-job", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rows = []
+    for concurrency in [0, *args.concurrency]:
+        jobs = args.jobs if concurrency else 0
+        url = temp_database_url(f"jobs-{concurrency}.db")
+        engine = seed(url, jobs, args.invoices_per_job)
+        env = {"DATABASE_URL": url, "RESPONSE_CACHE_BACKEND": "off", "SUMMARY_RECONCILE_SECONDS": "0",
+               "JOB_CONCURRENCY": str(max(1, concurrency)), "JOB_TYPE_CONCURRENCY": f"invoice_batch={concurrency}"}
+        with serve("app.main:app", env=env) as server:
+            result = asyncio.run(scenario(server.url, jobs, args.clients, args.interval, idle_seconds=10))
+        done, seconds = drained(engine)
+        rows.append({
+            "job_concurrency": concurrency or "no jobs",
+            "jobs_done": done,
+            "drain_s": round(seconds, 1),
+            "jobs_per_s": round(done / seconds, 1) if seconds else 0,
+            **result,
+        })
+        print(f"  {rows[-1]}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""List endpoints: ORM objects + response_model validation vs row tuples + orjson.
+
+Serves the app in-process (ASGI, no sockets) and times full-page GETs of
+/api/patients/, /api/cases/cases/ and /api/invoices/billing/invoices/unpaid
+with each router's fast JSON path off and on, reporting µs per row. Both
+paths must return identical JSON. The response cache is off.
+
+    python -m benchmarks.bench_list_serialization [--rows 5000] [--limits 100 1000] [--repeat 30]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import auth_headers, bulk_insert, create_schema, print_table, seed_patients, temp_database_url
+
+ENDPOINTS = (
+    ("patients", "/api/patients/"),
+    ("cases", "/api/cases/cases/"),
+    ("invoices", "/api/invoices/billing/invoices/unpaid"),
+)
+
+
+def seed(url: str, rows: int):
+    from app.models.cases import Case
+    from app.models.invoices import Invoice
+
+    seed_patients(url, rows)
+    engine = create_schema(url)
+    bulk_insert(engine, Case, ({"patient_id": 1 + i, "title": "Diabetic foot ulcer", "description": "Left heel, grade 2",
+                                "status": "active", "created_by": 1} for i in range(rows)))
+    bulk_insert(engine, Invoice, ({"patient_id": 1 + i, "amount": 4500.0, "status": "pending", "created_by": 1}
+                                  for i in range(rows)))
+
+
+async def measure(limits, repeat: int):
+    import app.main
+    from app.routers import cases, invoices, patients
+
+    routers = {"patients": patients, "cases": cases, "invoices": invoices}
+    headers = auth_headers()
+    rows = []
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path in ENDPOINTS:
+            for limit in limits:
+                result = {"endpoint": name, "rows": limit}
+                bodies = {}
+                for label, fast in (("orm_us_per_row", False), ("fast_us_per_row", True)):
+                    routers[name].FAST_JSON = fast
+                    times = []
+                    for _ in range(repeat):
+                        start = time.perf_counter()
+                        r = await client.get(path, params={"limit": limit}, headers=headers)
+                        times.append(time.perf_counter() - start)
+                        r.raise_for_status()
+                    bodies[fast] = r.json()
+                    result[label] = round(statistics.median(times) * 1e6 / limit, 1)
+                result["speedup"] = f"{result['orm_us_per_row'] / result['fast_us_per_row']:.1f}x"
+                result["identical"] = bodies[False] == bodies[True]
+                rows.append(result)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--limits", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    url = temp_database_url("lists.db")
+    os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+    seed(url, args.rows)
+    rows = asyncio.run(measure(args.limits, args.repeat))
+    print_table(rows)
+    if not all(r["identical"] for r in rows):
+        print("FAIL: fast path output differs")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""p99 of /api/patients while 200 logins hit the server at once.
+
+Runs the app twice: with HASH_POOL_WORKERS=0 (bcrypt in the request
+threadpool, the old behaviour) and with the dedicated hashing pool.
+
+    python -m benchmarks.bench_login_burst [--logins 200] [--workers 2]
+"""
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, percentile, print_table, seed_patients, seed_user, serve, temp_database_url,
+)
+
+
+async def burst(base_url: str, logins: int, pollers: int, headers):
+    latencies = []
+    statuses = Counter()
+    done = asyncio.Event()
+    limits = httpx.Limits(max_connections=logins + pollers)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def poll():
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    await client.get("/api/patients/?limit=20", headers=headers)
+                except httpx.TransportError:
+                    statuses["poll_error"] += 1
+                latencies.append(time.perf_counter() - start)
+
+        async def login():
+            try:
+                r = await client.post("/api/auth/login", json={"username": "nurse", "password": "shift-change"})
+                statuses[r.status_code] += 1
+            except httpx.TransportError:
+                statuses["login_error"] += 1
+
+        poll_tasks = [asyncio.create_task(poll()) for _ in range(pollers)]
+        await asyncio.sleep(1)
+        started = time.perf_counter()
+        await asyncio.gather(*(login() for _ in range(logins)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await asyncio.gather(*poll_tasks)
+
+    return {
+        "burst_s": round(elapsed, 2),
+        "logins_ok": statuses[200],
+        "logins_503": statuses[503],
+        "transport_errors": statuses["poll_error"] + statuses["login_error"],
+        "patients_p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "patients_p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--pollers", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="hashing pool size for the 'pool' run")
+    args = parser.parse_args()
+
+    url = temp_database_url()
+    seed_patients(url, 2000)
+    seed_user(url, "nurse", "shift-change")
+    headers = auth_headers()
+
+    rows = []
+    for mode, workers in (("threadpool", 0), ("pool", args.workers)):
+        env = {"DATABASE_URL": url, "HASH_POOL_WORKERS": str(workers)}
+        with serve("app.main:app", env=env) as server:
+            result = asyncio.run(burst(server.url, args.logins, args.pollers, headers))
+        rows.append({"mode": mode, "hash_workers": workers, **result})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""Per-request cost of MetricsMiddleware and the SQL statement hooks.
+
+Drives a bare ASGI app directly (no server, no network) with and without
+the middleware, and calls the cursor-execute hooks in a loop. Exits
+non-zero if the middleware adds more than --budget-us per request.
+
+    python -m benchmarks.bench_metrics_overhead [--requests 200000] [--budget-us 50]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from types import SimpleNamespace
+
+from benchmarks.common import print_table
+from app.utils import metrics
+
+ROUTE = SimpleNamespace(path="/api/patients/{patient_id}")
+START = {"type": "http.response.start", "status": 200, "headers": []}
+BODY = {"type": "http.response.body", "body": b"{}"}
+
+
+async def endpoint(scope, receive, send):
+    scope["route"] = ROUTE
+    await send(START)
+    await send(BODY)
+
+
+async def receive():
+    return {"type": "http.request", "body": b""}
+
+
+async def send(message):
+    pass
+
+
+async def per_request_us(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/api/patients/1"}
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests * 1e6
+
+
+def per_statement_us(statements: int) -> float:
+    conn = SimpleNamespace(info={})
+    sql = "SELECT patients.id FROM patients WHERE patients.id = ?"
+    start = time.perf_counter()
+    for _ in range(statements):
+        metrics._before_cursor_execute(conn, None, sql, (), None, False)
+        metrics._after_cursor_execute(conn, None, sql, (), None, False)
+    return (time.perf_counter() - start) / statements * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200_000)
+    parser.add_argument("--budget-us", type=float, default=50.0)
+    args = parser.parse_args()
+
+    # best of three runs each, to keep scheduler noise out of the difference
+    bare = min(asyncio.run(per_request_us(endpoint, args.requests)) for _ in range(3))
+    wrapped = min(asyncio.run(per_request_us(metrics.MetricsMiddleware(endpoint), args.requests)) for _ in range(3))
+    hooks = min(per_statement_us(args.requests) for _ in range(3))
+    overhead = wrapped - bare
+
+    print_table([
+        {"measure": "bare ASGI app", "us": round(bare, 2)},
+        {"measure": "with MetricsMiddleware", "us": round(wrapped, 2)},
+        {"measure": "middleware overhead / request", "us": round(overhead, 2)},
+        {"measure": "query hooks / statement", "us": round(hooks, 2)},
+    ])
+    if overhead > args.budget_us:
+        print(f"FAIL: middleware overhead {overhead:.1f}us exceeds {args.budget_us}us budget")
+        sys.exit(1)
+    print(f"OK: overhead within {args.budget_us}us budget")
+
+
+if __name__ == "__main__":
+    main()
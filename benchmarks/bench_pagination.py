@@ -0,0 +1,90 @@
+"""Deep-page latency (OFFSET vs keyset cursor) and peak RSS of a full export.
+
+    python -m benchmarks.bench_pagination [--patients 200000] [--page 1000]
+"""
+import argparse
+import time
+from datetime import datetime
+
+import httpx
+from sqlalchemy import create_engine, text
+
+from benchmarks.common import (
+    auth_headers, peak_rss_mb, percentile, print_table, seed_patients, serve, temp_database_url,
+)
+from app.utils.pagination import encode_cursor
+
+
+def cursor_at(url: str, position: int) -> str:
+    """Cursor for the row just before `position` in (created_at, id) order"""
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        created_at, row_id = conn.execute(text(
+            "SELECT created_at, id FROM patients ORDER BY created_at, id LIMIT 1 OFFSET :n"
+        ), {"n": position - 1}).one()
+    return encode_cursor(datetime.fromisoformat(str(created_at)), row_id)
+
+
+def timed_gets(client, path, params, headers, repeat):
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        r = client.get(path, params=params, headers=headers)
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+    return {
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200_000)
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    url = temp_database_url()
+    seed_patients(url, args.patients)
+    headers = auth_headers()
+    position = (args.page - 1) * args.limit
+    env = {"DATABASE_URL": url}
+
+    rows = []
+    with serve("app.main:app", env=env) as server, httpx.Client(base_url=server.url, timeout=600) as client:
+        rows.append({"query": f"page {args.page} via skip",
+                     **timed_gets(client, "/api/patients/", {"skip": position, "limit": args.limit},
+                                  headers, args.repeat)})
+        rows.append({"query": f"page {args.page} via cursor",
+                     **timed_gets(client, "/api/patients/",
+                                  {"cursor": cursor_at(url, position), "limit": args.limit},
+                                  headers, args.repeat)})
+    print_table(rows)
+    print()
+
+    # One fresh server per export so VmHWM reflects that export alone
+    exports = []
+    for mode, params in (("json (one array)", {"limit": args.patients}),
+                         ("ndjson stream", {"format": "ndjson"})):
+        with serve("app.main:app", env=env) as server:
+            baseline = peak_rss_mb(server.pid)
+            start = time.perf_counter()
+            received = 0
+            with httpx.stream("GET", server.url + "/api/patients/", params=params,
+                              headers=headers, timeout=600) as r:
+                for chunk in r.iter_bytes():
+                    received += len(chunk)
+            exports.append({
+                "export": mode,
+                "seconds": round(time.perf_counter() - start, 2),
+                "mb_sent": round(received / 2**20, 1),
+                "rss_before_mb": baseline,
+                "peak_rss_mb": peak_rss_mb(server.pid),
+            })
+    print_table(exports)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Patient onboarding throughput: bulk import vs. one POST per patient.
+
+    python -m benchmarks.bench_patient_import [--rows 100000] [--single 2000]
+"""
+import argparse
+import csv
+import io
+import random
+import time
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, create_schema, fake_patient, print_table, serve, temp_database_url,
+)
+
+
+def unique_patients(count: int, offset: int = 0):
+    rng = random.Random(offset)
+    for i in range(offset, offset + count):
+        patient = fake_patient(i, rng)
+        patient["phone"] = f"07{i:08d}"
+        yield patient
+
+
+def as_csv(patients) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["first_name", "last_name", "email", "phone", "gender", "location"])
+    writer.writeheader()
+    writer.writerows(patients)
+    return buffer.getvalue().encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--single", type=int, default=2000, help="patients sent one by one")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[500, 2000])
+    args = parser.parse_args()
+
+    url = temp_database_url()
+    create_schema(url)
+    headers = auth_headers()
+    results = []
+
+    with serve("app.main:app", env={"DATABASE_URL": url}) as server, \
+            httpx.Client(base_url=server.url, headers=headers, timeout=3600) as client:
+        start = time.perf_counter()
+        for patient in unique_patients(args.single):
+            client.post("/api/patients/", json=patient).raise_for_status()
+        elapsed = time.perf_counter() - start
+        results.append({"path": "POST /api/patients/ x1", "rows": args.single,
+                        "seconds": round(elapsed, 2), "rows_per_s": round(args.single / elapsed)})
+
+        offset = args.single
+        for batch_size in args.batch_sizes:
+            body = as_csv(unique_patients(args.rows, offset))
+            offset += args.rows
+            start = time.perf_counter()
+            r = client.post("/api/patients/import", params={"batch_size": batch_size},
+                            files={"file": ("patients.csv", body, "text/csv")})
+            r.raise_for_status()
+            elapsed = time.perf_counter() - start
+            report = r.json()
+            assert report["inserted"] == args.rows, report
+            results.append({"path": f"POST /import batch={batch_size}", "rows": args.rows,
+                            "seconds": round(elapsed, 2), "rows_per_s": round(args.rows / elapsed)})
+
+    print_table(results)
+
+
+if __name__ == "__main__":
+    main()
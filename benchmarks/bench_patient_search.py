@@ -0,0 +1,80 @@
+"""Patient search: leading-wildcard ILIKE scan vs. the trigram index.
+
+Seeds synthetic Kenyan names/phones, backfills the search index, then
+times typical front-desk queries (exact, prefix, typo, phone formats).
+
+    python -m benchmarks.bench_patient_search [--patients 1000000]
+"""
+import argparse
+import asyncio
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.common import print_table, seed_patients, temp_database_url
+
+QUERIES = [
+    ("exact name", "Wanjiru Kariuki"),
+    ("prefix", "Nyok"),
+    ("surname only", "Kiplagat"),
+    ("typo", "Wanjiro Kariuky"),
+    ("phone 07xx", "0712 345"),
+    ("phone +254", "+254712345"),
+]
+
+
+async def run(url: str, limit: int, repeat: int):
+    from app import database
+    from app.models.patients import Patient
+    from app.utils import search
+
+    engine = create_async_engine(database.to_async_url(url))
+    database.async_engine = search.async_engine = engine
+
+    start = time.perf_counter()
+    await search.ensure_index()
+    build_s = round(time.perf_counter() - start, 1)
+
+    async def ilike(session, q):
+        term = f"%{q}%"
+        stmt = select(Patient.id).where(
+            Patient.first_name.ilike(term) | Patient.last_name.ilike(term) | Patient.phone.ilike(term)
+        ).limit(limit)
+        return (await session.exec(stmt)).all()
+
+    async def indexed(session, q):
+        return await search.search_patient_ids(session, q, limit=limit)
+
+    rows = []
+    async with AsyncSession(engine) as session:
+        for label, q in QUERIES:
+            row = {"query": label, "q": q}
+            for name, fn in (("ilike", ilike), ("search", indexed)):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    hits = await fn(session, q)
+                row[f"{name}_ms"] = round((time.perf_counter() - start) / repeat * 1000, 2)
+                row[f"{name}_hits"] = len(hits)
+            rows.append(row)
+    await engine.dispose()
+    return build_s, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    url = temp_database_url()
+    seed_patients(url, args.patients)
+    build_s, rows = asyncio.run(run(url, args.limit, args.repeat))
+    print(f"index backfill for {args.patients} patients: {build_s}s\n")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
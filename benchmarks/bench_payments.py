@@ -0,0 +1,98 @@
+"""Payment posting throughput: per-callback POST .../pay vs batch settlement.
+
+Posts --payments reconciled mobile-money payments spread over --invoices
+invoices, first one callback at a time (--concurrency connections), then
+through POST /billing/settlements in batches of each --batch size.
+
+    python -m benchmarks.bench_payments [--payments 10000] [--invoices 2000] [--batches 500 2000 10000]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, bulk_insert, create_schema, print_table, seed_patients, seed_user, serve, temp_database_url,
+)
+
+
+def seed(url: str, invoices: int):
+    from app.models.invoices import Invoice
+
+    seed_patients(url, 500)
+    bulk_insert(create_schema(url), Invoice, ({"patient_id": 1 + i % 500, "amount": 5000.0} for i in range(invoices)))
+    seed_user(url, "bench", "pay-day")
+
+
+def payments(count: int, invoices: int, tag: str):
+    rng = random.Random(17)
+    return [{
+        "invoice_id": rng.randint(1, invoices), "amount": float(rng.choice([100, 250, 500, 1000])),
+        "method": "mpesa", "reference": f"{tag}{n:09d}",
+    } for n in range(count)]
+
+
+async def per_callback(base_url: str, items, concurrency: int, headers):
+    queue = list(reversed(items))
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors
+            while queue:
+                item = queue.pop()
+                r = await client.post(f"/api/invoices/billing/invoice/{item['invoice_id']}/pay",
+                                      json=item, headers=headers)
+                if r.status_code == 503:
+                    queue.append(item)
+                    await asyncio.sleep(float(r.headers.get("retry-after", 1)))
+                elif r.status_code != 200:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return time.perf_counter() - start, errors
+
+
+async def settled(base_url: str, items, batch: int, headers):
+    errors = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=300) as client:
+        start = time.perf_counter()
+        for i in range(0, len(items), batch):
+            r = await client.post("/api/invoices/billing/settlements",
+                                  json={"payments": items[i:i + batch]}, headers=headers)
+            report = r.json() if r.status_code == 200 else {}
+            errors += report.get("failed", 0) if r.status_code == 200 else len(items[i:i + batch])
+        return time.perf_counter() - start, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=10000)
+    parser.add_argument("--invoices", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--batches", type=int, nargs="+", default=[500, 2000, 10000])
+    args = parser.parse_args()
+
+    headers = auth_headers()
+    url = temp_database_url("payments.db")
+    seed(url, args.invoices)
+    rows = []
+    with serve("app.main:app", env={"DATABASE_URL": url}) as server:
+        items = payments(args.payments, args.invoices, "CB")
+        elapsed, errors = asyncio.run(per_callback(server.url, items, args.concurrency, headers))
+        rows.append({"mode": f"per-callback (x{args.concurrency})", "payments": len(items), "errors": errors,
+                     "seconds": round(elapsed, 2), "payments_per_s": round(len(items) / elapsed)})
+        for batch in args.batches:
+            items = payments(args.payments, args.invoices, f"S{batch}-")
+            elapsed, errors = asyncio.run(settled(server.url, items, batch, headers))
+            rows.append({"mode": f"settlement (batch {batch})", "payments": len(items), "errors": errors,
+                         "seconds": round(elapsed, 2), "payments_per_s": round(len(items) / elapsed)})
+            print(f"  {rows[-1]}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
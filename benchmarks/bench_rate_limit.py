@@ -0,0 +1,96 @@
+"""Well-behaved clients' latency while one client floods the API, limiter off vs on.
+
+--clients users each poll /api/patients/?limit=20 every --interval
+seconds, while one abusive user (a runaway polling loop) offers
+--abuse-rps requests per second to the same endpoint over
+--abuse-connections connections, ignoring 429s. Compares the
+well-behaved clients' p50/p99 without the abuser, with it and no rate
+limiting, and with it under the default per-user token bucket held in
+memory or in (fake) Redis.
+
+    python -m benchmarks.bench_rate_limit [--clients 20] [--interval 0.2] [--abuse-rps 200] [--duration 15]
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+import httpx
+
+from benchmarks.common import auth_headers, percentile, print_table, seed_patients, serve, temp_database_url
+
+POLL = "/api/patients/?limit=20"
+
+
+async def scenario(base_url: str, clients: int, interval: float, abusers: int, abuse_rps: float, duration: float):
+    latencies = []
+    good = Counter()
+    abuse = Counter()
+    limits = httpx.Limits(max_connections=clients + abusers + 5)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def well_behaved(n: int):
+            headers = auth_headers(f"nurse{n}")
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    r = await client.get(POLL, headers=headers)
+                    good[r.status_code] += 1
+                except httpx.HTTPError:
+                    good["error"] += 1
+                latencies.append(time.perf_counter() - start)
+                await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+
+        async def abusive(headers):
+            pace = abusers / abuse_rps
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    abuse[(await client.get(POLL, headers=headers)).status_code] += 1
+                except httpx.HTTPError:
+                    abuse["error"] += 1
+                await asyncio.sleep(max(0.0, pace - (time.perf_counter() - start)))
+
+        deadline = time.perf_counter() + duration
+        abuser = auth_headers("scraper")
+        await asyncio.gather(*(well_behaved(n) for n in range(clients)), *(abusive(abuser) for _ in range(abusers)))
+
+    return {
+        "good_rps": round(sum(good.values()) / duration, 1),
+        "good_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "good_p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "good_non_200": sum(v for k, v in good.items() if k != 200),
+        "abuser_sent_rps": round(sum(abuse.values()) / duration, 1),
+        "abuser_served_rps": round(abuse[200] / duration, 1),
+        "abuser_429": abuse[429],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.2)
+    parser.add_argument("--abuse-rps", type=float, default=200)
+    parser.add_argument("--abuse-connections", type=int, default=30)
+    parser.add_argument("--duration", type=float, default=15)
+    args = parser.parse_args()
+
+    url = temp_database_url("ratelimit.db")
+    seed_patients(url, 2000)
+    runs = [
+        ("no abuser", "memory", {}, 0),
+        ("abuser, no limiter", "off", {}, args.abuse_connections),
+        ("abuser, memory buckets", "memory", {}, args.abuse_connections),
+        ("abuser, redis buckets (fake)", "redis", {"REDIS_URL": "fake://"}, args.abuse_connections),
+    ]
+    rows = []
+    for label, backend, extra, abusers in runs:
+        env = {"DATABASE_URL": url, "RATE_LIMIT_BACKEND": backend, **extra}
+        with serve("app.main:app", env=env) as server:
+            result = asyncio.run(scenario(server.url, args.clients, args.interval, abusers, args.abuse_rps, args.duration))
+        rows.append({"scenario": label, **result})
+        print(f"  {rows[-1]}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Management KPIs: live GROUP BY queries vs. the reporting snapshots.
+
+Seeds --payments payments (one invoice per five payments, plus visits and
+wound records) and times the KPI set as live SQL on the OLTP tables
+against the snapshot path: the first full extract, an incremental
+refresh after --new more payments, and serving a KPI document.
+
+    python -m benchmarks.bench_reports [--payments 5000000] [--new 10000]
+"""
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func
+from sqlmodel import select
+
+from benchmarks.common import bulk_insert, create_schema, print_table, seed_patients, temp_database_url
+
+PATIENTS = 10_000
+ORGS = 20
+
+
+def seed(url: str, payments: int):
+    from app.models.cases import Case, WoundRecord
+    from app.models.invoices import Invoice
+    from app.models.organization import Organization
+    from app.models.visits import Visit
+
+    seed_patients(url, PATIENTS)
+    engine = create_schema(url)
+    bulk_insert(engine, Organization, ({"name": f"Clinic {i}"} for i in range(ORGS)))
+    rng = random.Random(23)
+    now = datetime.utcnow()
+    invoices = max(1, payments // 5)
+    ago = lambda days: now - timedelta(days=rng.randint(0, days), seconds=rng.randint(0, 86399))  # noqa: E731
+    bulk_insert(engine, Case, ({
+        "patient_id": i + 1, "org_id": 1 + i % ORGS, "title": "Wound care",
+    } for i in range(PATIENTS)))
+    bulk_insert(engine, Invoice, ({
+        "patient_id": 1 + i % PATIENTS, "org_id": 1 + i % ORGS, "amount": 1500.0,
+        "status": rng.choice(["pending", "paid", "paid"]), "invoice_date": ago(730),
+    } for i in range(invoices)))
+    add_payments(engine, payments, invoices, rng)
+    bulk_insert(engine, Visit, ({
+        "patient_id": 1 + i % PATIENTS, "org_id": 1 + i % ORGS, "recorded_by": rng.randint(1, 50),
+        "visit_date": ago(730),
+    } for i in range(payments // 5)))
+    bulk_insert(engine, WoundRecord, ({
+        "case_id": 1 + i % PATIENTS, "severity": rng.choice(["mild", "moderate", "severe"]), "created_at": ago(730),
+    } for i in range(payments // 10)))
+    return engine, invoices
+
+
+def add_payments(engine, n: int, invoices: int, rng: random.Random):
+    from app.models.invoices import Payment
+
+    now = datetime.utcnow()
+    bulk_insert(engine, Payment, ({
+        "invoice_id": rng.randint(1, invoices), "amount": 300.0,
+        "paid_at": now - timedelta(days=rng.randint(0, 730)), "method": "mpesa",
+    } for _ in range(n)))
+
+
+def live_kpis(conn):
+    """The KPI set as GROUP BYs on the OLTP tables"""
+    from app.models.cases import Case, WoundRecord
+    from app.models.invoices import Invoice, Payment
+    from app.models.visits import Visit
+
+    def grouped(*keys, measures, source=None, where=None):
+        stmt = select(*keys, *measures).group_by(*keys)
+        if source is not None:
+            stmt = stmt.select_from(source)
+        if where is not None:
+            stmt = stmt.where(where)
+        return conn.execute(stmt).all()
+
+    month = lambda column: func.strftime("%Y-%m", column)  # noqa: E731
+    age = func.julianday("now") - func.julianday(Invoice.invoice_date)
+    bucket = case((age <= 30, "0-30"), (age <= 60, "31-60"), (age <= 90, "61-90"), else_="90+")
+    grouped(month(Payment.paid_at), Invoice.org_id, measures=[func.sum(Payment.amount)],
+            source=Payment.__table__.join(Invoice.__table__, Payment.invoice_id == Invoice.id))
+    grouped(month(Invoice.invoice_date), Invoice.org_id, measures=[func.sum(Invoice.amount), func.sum(Invoice.paid_amount)])
+    grouped(bucket, Invoice.org_id, measures=[func.count(), func.sum(Invoice.amount - Invoice.paid_amount)],
+            where=Invoice.status != "paid")
+    grouped(month(Visit.visit_date), Visit.org_id, Visit.recorded_by, measures=[func.count()])
+    grouped(month(WoundRecord.created_at), Case.org_id, WoundRecord.severity, measures=[func.count()],
+            source=WoundRecord.__table__.join(Case.__table__, WoundRecord.case_id == Case.id))
+
+
+def timed(fn, repeat: int = 1) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=5_000_000)
+    parser.add_argument("--new", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    url = temp_database_url("reports.db")
+    os.environ["REPORT_DIR"] = os.path.join(os.path.dirname(url[len("sqlite:///"):]), "reports")
+    print(f"seeding {args.payments} payments ...")
+    engine, invoices = seed(url, args.payments)
+
+    from app.utils import reports
+
+    with engine.connect() as conn:
+        live_ms = timed(lambda: live_kpis(conn), args.repeat)
+    extract_ms = timed(reports.refresh)
+    add_payments(engine, args.new, invoices, random.Random(5))
+    refresh_ms = timed(reports.refresh)
+    reports._snapshot = None
+    reload_ms = timed(reports.refresh)
+    first_read_ms = timed(lambda: reports.read_kpis(3))
+    read_ms = timed(lambda: reports.read_kpis(3), 1000)
+
+    print()
+    print_table([
+        {"path": "live SQL, all KPIs", "ms": round(live_ms, 1)},
+        {"path": "snapshot: first full extract", "ms": round(extract_ms, 1)},
+        {"path": f"snapshot: refresh after {args.new} new payments", "ms": round(refresh_ms, 1)},
+        {"path": "snapshot: refresh in a process without the rollups", "ms": round(reload_ms, 1)},
+        {"path": "serve a tenant's KPIs (file changed)", "ms": round(first_read_ms, 3)},
+        {"path": "serve a tenant's KPIs (unchanged)", "ms": round(read_ms, 3)},
+    ])
+
+
+if __name__ == "__main__":
+    main()
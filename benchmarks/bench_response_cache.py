@@ -0,0 +1,179 @@
+"""Response cache: hit-path latency and hit ratio on a recorded access pattern.
+
+For each backend (off, memory, redis via the in-process fake) this runs
+the four cached GETs back to back to time the hit path, then replays an
+access trace — mostly reads with a Zipf skew towards popular patients,
+interleaved with patient updates and new cases/visits — reporting the hit
+ratio. Every read that follows a patient update must see the new name;
+the script exits non-zero on a stale read.
+
+    python -m benchmarks.bench_response_cache [--requests 3000] [--write-ratio 0.05]
+    python -m benchmarks.bench_response_cache --save-trace trace.jsonl   # record the synthetic trace
+    python -m benchmarks.bench_response_cache --trace trace.jsonl        # replay a recorded one
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, bulk_insert, create_schema, percentile, print_table, seed_patients, seed_user,
+    serve, temp_database_url,
+)
+
+PATIENTS = 2000
+CASES = 1000
+INVOICES = 1000
+BACKENDS = {
+    "off": {"RESPONSE_CACHE_BACKEND": "off"},
+    "memory": {"RESPONSE_CACHE_BACKEND": "memory"},
+    "redis (fake)": {"RESPONSE_CACHE_BACKEND": "redis", "REDIS_URL": "fake://"},
+}
+HOT_PATHS = [
+    ("get_patient", "/api/patients/7", {}),
+    ("list_cases", "/api/cases/cases/", {"limit": 50}),
+    ("unpaid", "/api/invoices/billing/invoices/unpaid", {"limit": 50}),
+    ("dashboard_summary", "/api/dashboard/dashboard/summary", {}),
+]
+
+
+def seed(url: str):
+    from app.models.cases import Case
+    from app.models.invoices import Invoice
+
+    seed_patients(url, PATIENTS)
+    engine = create_schema(url)
+    bulk_insert(engine, Case, ({"patient_id": 1 + i % PATIENTS, "title": "Wound care"} for i in range(CASES)))
+    bulk_insert(engine, Invoice, ({"patient_id": 1 + i % PATIENTS, "amount": 1500.0} for i in range(INVOICES)))
+    seed_user(url, "bench", "cache-day")
+
+
+def record_trace(requests: int, write_ratio: float, seed: int = 5):
+    """Synthetic clinic day: Zipf-skewed chart opens, list views, a few writes"""
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, PATIENTS + 1)]
+    trace = []
+    for n in range(requests):
+        patient_id = rng.choices(range(1, PATIENTS + 1), weights)[0]
+        if rng.random() < write_ratio:
+            kind = rng.choice(["patient", "case", "visit"])
+            if kind == "patient":
+                trace.append({"method": "PUT", "path": f"/api/patients/{patient_id}", "json": {
+                    "first_name": f"Renamed{n}", "last_name": "Trace", "phone": f"07{n:08d}"}})
+            elif kind == "case":
+                trace.append({"method": "POST", "path": "/api/cases/cases/",
+                              "json": {"patient_id": patient_id, "title": "New wound"}})
+            else:
+                trace.append({"method": "POST", "path": "/api/visits/visits/", "json": {
+                    "patient_id": patient_id, "case_id": 1 + patient_id % CASES,
+                    "visit_date": "2026-03-02T09:00:00"}})
+            continue
+        roll = rng.random()
+        if roll < 0.6:
+            trace.append({"method": "GET", "path": f"/api/patients/{patient_id}"})
+        elif roll < 0.75:
+            trace.append({"method": "GET", "path": "/api/cases/cases/", "params": {"limit": 50}})
+        elif roll < 0.9:
+            trace.append({"method": "GET", "path": "/api/invoices/billing/invoices/unpaid",
+                          "params": {"limit": 50, "patient_id": patient_id}})
+        else:
+            trace.append({"method": "GET", "path": "/api/dashboard/dashboard/summary"})
+    return trace
+
+
+async def hit_path(client: httpx.AsyncClient, headers, rounds: int):
+    rows = []
+    for name, path, params in HOT_PATHS:
+        await client.get(path, params=params, headers=headers)  # fill
+        latencies = []
+        etag = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            r = await client.get(path, params=params, headers=headers)
+            latencies.append(time.perf_counter() - start)
+            etag = r.headers.get("etag")
+        start = time.perf_counter()
+        for _ in range(rounds):
+            r = await client.get(path, params=params, headers={**headers, "If-None-Match": etag or ""})
+        conditional = (time.perf_counter() - start) / rounds
+        rows.append({"route": name, "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+                     "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+                     "if_none_match_ms": round(conditional * 1000, 2), "last_status": r.status_code})
+    return rows
+
+
+async def replay(client: httpx.AsyncClient, headers, trace):
+    hits = reads = stale = errors = 0
+    names = {}
+    start = time.perf_counter()
+    for step in trace:
+        r = await client.request(step["method"], step["path"], params=step.get("params"),
+                                 json=step.get("json"), headers=headers)
+        errors += r.status_code >= 400
+        if step["method"] == "PUT":
+            names[step["path"]] = step["json"]["first_name"]
+        elif step["method"] == "GET":
+            reads += 1
+            hits += r.headers.get("x-cache") == "HIT"
+            if step["path"] in names and r.status_code == 200 and r.json()["first_name"] != names[step["path"]]:
+                stale += 1
+    elapsed = time.perf_counter() - start
+    return {"reads": reads, "hit_ratio": round(hits / reads, 3) if reads else 0.0, "stale_reads": stale,
+            "errors": errors, "replay_s": round(elapsed, 2)}
+
+
+async def run(base_url: str, headers, rounds: int, trace):
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        latency = await hit_path(client, headers, rounds)
+        outcome = await replay(client, headers, trace)
+        outcome["cache"] = (await client.get("/api/status")).json().get("response_cache")
+    return latency, outcome
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    parser.add_argument("--rounds", type=int, default=300, help="hit-path requests per route")
+    parser.add_argument("--trace", help="replay this JSONL trace instead of the synthetic one")
+    parser.add_argument("--save-trace", help="write the synthetic trace to this JSONL file and exit")
+    args = parser.parse_args()
+
+    if args.trace:
+        with open(args.trace) as f:
+            trace = [json.loads(line) for line in f if line.strip()]
+    else:
+        trace = record_trace(args.requests, args.write_ratio)
+    if args.save_trace:
+        with open(args.save_trace, "w") as f:
+            f.writelines(json.dumps(step) + "\n" for step in trace)
+        print(f"wrote {len(trace)} requests to {args.save_trace}")
+        return
+
+    headers = auth_headers()
+    latency_rows, replay_rows = [], []
+    for backend, env in BACKENDS.items():
+        url = temp_database_url(f"cache-{backend.split()[0]}.db")
+        seed(url)
+        with serve("app.main:app", env={"DATABASE_URL": url, **env}) as server:
+            latency, outcome = asyncio.run(run(server.url, headers, args.rounds, trace))
+        latency_rows += [{"backend": backend, **row} for row in latency]
+        cache_stats = outcome.pop("cache")
+        replay_rows.append({"backend": backend, **outcome})
+        print(f"  {backend}: {cache_stats}")
+
+    print("\nhit path (sequential, one connection)")
+    print_table(latency_rows)
+    print("\nreplayed trace")
+    print_table(replay_rows)
+    if any(row["stale_reads"] for row in replay_rows):
+        print("FAIL: a read after a patient update returned the old name")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
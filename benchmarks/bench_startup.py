@@ -0,0 +1,90 @@
+"""Worker cold start: app import profile and boot time with and without schema checks.
+
+Profiles `import app.main` with `python -X importtime` (self time summed
+per top-level package), then boots uvicorn --repeat times on a seeded
+database and times spawn -> first 200 from /health, with SCHEMA_CHECK=always
+(create_all + migration scan on every boot, the old behaviour) and
+SCHEMA_CHECK=auto (skipped once the stored schema version matches).
+
+    python -m benchmarks.bench_startup [--repeat 5] [--top 12]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from typing import List, Tuple
+
+import httpx
+
+from benchmarks.common import ROOT, free_port, print_table, seed_patients, temp_database_url
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+
+def import_profile() -> List[Tuple[str, float]]:
+    """(package, self ms) for one `import app.main`, slowest first"""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    packages = Counter()
+    for match in IMPORTTIME_LINE.finditer(stderr):
+        packages[match.group(3).split(".")[0]] += int(match.group(1))
+    return [(name, us / 1000) for name, us in packages.most_common()]
+
+
+def boot_ms(env: dict) -> float:
+    """Spawn a uvicorn worker and time it to its first /health response"""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env}, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    # one client for every poll: httpx.get() builds a new SSL context per call
+    client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=1)
+    try:
+        deadline = start + 30
+        while time.perf_counter() < deadline:
+            try:
+                client.get("/health")
+                return (time.perf_counter() - start) * 1000
+            except httpx.HTTPError:
+                time.sleep(0.01)
+        raise RuntimeError("app.main did not start")
+    finally:
+        client.close()
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12)
+    args = parser.parse_args()
+
+    profile = import_profile()
+    total = sum(ms for _, ms in profile)
+    print(f"import app.main: {total:.0f} ms (-X importtime self time)")
+    print_table([{"package": name, "self_ms": round(ms, 1), "share": f"{ms / total:.0%}"}
+                 for name, ms in profile[:args.top]])
+
+    url = temp_database_url("startup.db")
+    seed_patients(url, 1000)
+    rows = []
+    for mode in ("always", "auto"):
+        env = {"DATABASE_URL": url, "SCHEMA_CHECK": mode, "SUMMARY_RECONCILE_SECONDS": "0"}
+        boot_ms(env)  # first boot records the schema version
+        times = [boot_ms(env) for _ in range(args.repeat)]
+        rows.append({"SCHEMA_CHECK": mode, "boots": args.repeat,
+                     "p50_ms": round(statistics.median(times)), "min_ms": round(min(times))})
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""500 field devices uploading a day of work: per-action POSTs vs /api/sync.
+
+Each device records --visits visits, each with vitals, an activity log
+and a wound record. "per-action" sends them the old way (one request per
+record, in order, since vitals need the visit id) and then re-downloads
+the patient and case lists; "sync" sends one gzip push and one delta
+pull. Every request is charged a simulated 2G round-trip (--rtt) on top
+of the real server time.
+
+    python -m benchmarks.bench_sync [--devices 500] [--visits 6] [--rtt 0.6]
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import time
+import uuid
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, bulk_insert, create_schema, percentile, print_table, seed_patients, seed_user,
+    serve, temp_database_url,
+)
+
+PATIENTS = 2000
+CASES = 1000
+# 2G uplink/downlink, bytes per second (~40 kbit/s)
+BANDWIDTH = 5000
+
+
+def seed(url: str):
+    from app.models.cases import Case
+
+    seed_patients(url, PATIENTS)
+    bulk_insert(create_schema(url), Case, (
+        {"patient_id": 1 + i % PATIENTS, "title": "Wound care"} for i in range(CASES)
+    ))
+    seed_user(url, "bench", "field-day")
+
+
+def day_of_work(device: int, visits: int):
+    """The records one device collects: [(visit, vitals, activity, wound)]"""
+    work = []
+    for v in range(visits):
+        case_id = 1 + (device * visits + v) % CASES
+        work.append((
+            {"patient_id": 1 + (case_id - 1) % PATIENTS, "case_id": case_id,
+             "visit_date": f"2026-03-02T{8 + v % 9:02d}:00:00", "notes": "Routine dressing change"},
+            {"temperature": 36.8, "pulse": 78, "blood_pressure": "120/80", "respiratory_rate": 16, "spo2": 97},
+            {"activity": "Cleaned and re-dressed wound"},
+            {"case_id": case_id, "description": "Granulating, no signs of infection", "severity": "mild"},
+        ))
+    return work
+
+
+class Device:
+    def __init__(self, client: httpx.AsyncClient, headers, rtt: float):
+        self.client = client
+        self.headers = headers
+        self.rtt = rtt
+        self.requests = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.errors = 0
+        self.retries = 0
+
+    async def call(self, method: str, path: str, **kwargs) -> httpx.Response:
+        body = kwargs.get("content") or (json.dumps(kwargs["json"]).encode() if "json" in kwargs else b"")
+        headers = {**self.headers, **kwargs.pop("headers", {})}
+        for attempt in range(3):
+            try:
+                r = await self.client.request(method, path, headers=headers, **kwargs)
+                break
+            except httpx.TransportError:
+                # server closed an idle keep-alive connection; devices retry
+                self.retries += 1
+        else:
+            raise RuntimeError(f"{method} {path} failed after retries")
+        wire_down = int(r.headers.get("content-length") or len(r.content))
+        self.requests += 1
+        self.bytes_up += len(body)
+        self.bytes_down += wire_down
+        self.errors += r.status_code >= 400
+        # network cost: latency plus transfer time on a 2G link
+        await asyncio.sleep(self.rtt + (len(body) + wire_down) / BANDWIDTH)
+        return r
+
+
+async def per_action(device: Device, work, nurse_id: int):
+    for visit, vitals, activity, wound in work:
+        visit_id = (await device.call("POST", "/api/visits/visits/", json=visit)).json().get("id")
+        await device.call("POST", f"/api/visits/visits/{visit_id}/vitals", json=vitals)
+        await device.call("POST", f"/api/visits/visits/{visit_id}/activity", json={**activity, "nurse_id": nurse_id})
+        await device.call("POST", f"/api/cases/cases/{wound['case_id']}/wounds", json=wound)
+    # refresh: no deltas, so the device re-downloads what it caches
+    await device.call("GET", "/api/patients/", params={"limit": PATIENTS})
+    await device.call("GET", "/api/cases/cases/", params={"limit": CASES})
+
+
+async def sync(device: Device, work, token: str):
+    ops = []
+    for visit, vitals, activity, wound in work:
+        visit_key = str(uuid.uuid4())
+        ops += [
+            {"key": visit_key, "type": "visit", "data": visit},
+            {"key": str(uuid.uuid4()), "type": "vitals", "visit_key": visit_key, "data": vitals},
+            {"key": str(uuid.uuid4()), "type": "activity", "visit_key": visit_key, "data": activity},
+            {"key": str(uuid.uuid4()), "type": "wound", "data": wound},
+        ]
+    body = gzip.compress(json.dumps({"ops": ops}).encode())
+    await device.call("POST", "/api/sync/push", content=body,
+                      headers={"Content-Encoding": "gzip", "Content-Type": "application/json"})
+    while True:
+        page = (await device.call("GET", "/api/sync/pull", params={"token": token})).json()
+        token = page["token"]
+        if not page["has_more"]:
+            break
+
+
+async def start_of_day_token(client: httpx.AsyncClient, headers) -> str:
+    """What every device holds after yesterday's sync"""
+    token = None
+    while True:
+        page = (await client.get("/api/sync/pull", params={"token": token} if token else {}, headers=headers)).json()
+        token = page["token"]
+        if not page["has_more"]:
+            return token
+
+
+async def run(base_url: str, mode: str, devices: int, visits: int, rtt: float, headers):
+    limits = httpx.Limits(max_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        token = await start_of_day_token(client, headers)
+        fleet = [Device(client, headers, rtt) for _ in range(devices)]
+        durations = []
+
+        async def one(n: int):
+            start = time.perf_counter()
+            work = day_of_work(n, visits)
+            if mode == "per-action":
+                await per_action(fleet[n], work, nurse_id=1)
+            else:
+                await sync(fleet[n], work, token)
+            durations.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(n) for n in range(devices)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "mode": mode,
+        "requests": sum(d.requests for d in fleet),
+        "errors": sum(d.errors for d in fleet),
+        "retries": sum(d.retries for d in fleet),
+        "kb_up_per_device": round(sum(d.bytes_up for d in fleet) / devices / 1024, 1),
+        "kb_down_per_device": round(sum(d.bytes_down for d in fleet) / devices / 1024, 1),
+        "device_p50_s": round(percentile(durations, 50), 1),
+        "device_p99_s": round(percentile(durations, 99), 1),
+        "wall_s": round(elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--devices", type=int, default=500)
+    parser.add_argument("--visits", type=int, default=6)
+    parser.add_argument("--rtt", type=float, default=0.6, help="simulated round-trip seconds")
+    args = parser.parse_args()
+
+    headers = auth_headers()
+    rows = []
+    for mode in ("per-action", "sync"):
+        url = temp_database_url(f"sync-{mode}.db")
+        seed(url)
+        with serve("app.main:app", env={"DATABASE_URL": url}) as server:
+            rows.append(asyncio.run(run(server.url, mode, args.devices, args.visits, args.rtt, headers)))
+        print(f"  {rows[-1]}")
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
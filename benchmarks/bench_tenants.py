@@ -0,0 +1,115 @@
+"""Per-tenant latency as the whole database grows, with and without the (org_id, ...) indexes.
+
+Seeds --tenants clinics onboarded one after another (each owns a
+contiguous block of patients, and one case and invoice per patient) for
+each total size in --sizes, then has a tenant-scoped client page through
+the hot list endpoints and the dashboard, for a random tenant per request.
+Run once with migration 0004's indexes and once without them: with them a
+clinic's first page costs the same at any total size; without them SQLite
+walks the other clinics' rows to find it.
+
+    python -m benchmarks.bench_tenants [--sizes 20000 100000 400000] [--tenants 200]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from sqlalchemy import text
+
+from benchmarks.common import bulk_insert, create_schema, fake_patient, percentile, print_table, serve, temp_database_url
+
+ENDPOINTS = {
+    "patients": "/api/patients/?limit=50",
+    "cases": "/api/cases/cases/?limit=50",
+    "unpaid": "/api/invoices/billing/invoices/unpaid?limit=50",
+    "dashboard": "/api/dashboard/dashboard/summary",
+}
+
+
+def seed(url: str, size: int, tenants: int):
+    from app.models.cases import Case
+    from app.models.invoices import Invoice
+    from app.models.organization import Organization
+    from app.models.patients import Patient
+
+    engine = create_schema(url)
+    rng = random.Random(11)
+    start = datetime.utcnow() - timedelta(days=365)
+    step = timedelta(days=365) / size
+    org = lambda i: 1 + i * tenants // size  # noqa: E731
+    bulk_insert(engine, Organization, ({"name": f"Clinic {n}"} for n in range(tenants)))
+    bulk_insert(engine, Patient, (
+        {**fake_patient(i, rng), "org_id": org(i), "created_at": start + i * step} for i in range(size)
+    ))
+    bulk_insert(engine, Case, ({
+        "patient_id": i + 1, "org_id": org(i), "title": "Wound care", "created_at": start + i * step,
+        "status": rng.choice(["open", "open", "closed", "critical"]),
+    } for i in range(size)))
+    bulk_insert(engine, Invoice, ({
+        "patient_id": i + 1, "org_id": org(i), "amount": 1500.0, "created_at": start + i * step,
+        "status": rng.choice(["pending", "paid", "paid"]),
+    } for i in range(size)))
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return engine
+
+
+def drop_tenant_indexes(engine):
+    from app.utils import migrations
+
+    module = migrations.Migration("0004", "tenant_scoping").module
+    with engine.begin() as conn:
+        for name, _, _ in module.INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("ANALYZE"))
+
+
+async def scenario(base_url: str, tenants: int, requests: int):
+    from app.utils.security import create_access_token
+
+    headers = [{"Authorization": f"Bearer {create_access_token({'sub': 'bench', 'org_id': n})}"}
+               for n in range(1, tenants + 1)]
+    rng = random.Random(5)
+    latencies = {name: [] for name in ENDPOINTS}
+    errors = 0
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        for _ in range(requests):
+            tenant = rng.choice(headers)
+            for name, path in ENDPOINTS.items():
+                start = time.perf_counter()
+                errors += (await client.get(path, headers=tenant)).status_code != 200
+                latencies[name].append(time.perf_counter() - start)
+    return errors, {f"{name}_p50_ms": round(percentile(values, 50) * 1000, 1) for name, values in latencies.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000, 400_000])
+    parser.add_argument("--tenants", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint")
+    args = parser.parse_args()
+
+    rows = []
+    for size in args.sizes:
+        url = temp_database_url(f"tenants-{size}.db")
+        engine = seed(url, size, args.tenants)
+        for indexed in (True, False):
+            if not indexed:
+                drop_tenant_indexes(engine)
+            # SCHEMA_CHECK=off: startup must not recreate the dropped indexes
+            env = {"DATABASE_URL": url, "RESPONSE_CACHE_BACKEND": "off", "RATE_LIMIT_BACKEND": "off",
+                   "SCHEMA_CHECK": "off", "SUMMARY_RECONCILE_SECONDS": "0"}
+            with serve("app.main:app", env=env) as server:
+                errors, result = asyncio.run(scenario(server.url, args.tenants, args.requests))
+            rows.append({"total_patients": size, "org_indexes": "yes" if indexed else "no",
+                         "per_tenant": size // args.tenants, **result, "errors": errors})
+            print(f"  {rows[-1]}")
+    print()
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Patient chart: /timeline (selectinload graph) vs per-resource calls.
+
+The per-resource path is what the frontend does today: fetch the patient,
+then its cases, each case's wounds, its visits, each visit's vitals and
+activity, its invoices and each invoice's payments — one call (and one
+query) per resource. The timeline loads the same graph in at most 8
+queries and one call. Each call is charged --rtt of network latency.
+
+    python -m benchmarks.bench_timeline [--patients 200] [--cases 5] [--visits 20] [--rtt 0.15]
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.common import bulk_insert, create_schema, print_table, seed_patients, temp_database_url
+from app.database import to_async_url
+from app.models.cases import Case, WoundRecord
+from app.models.invoices import Invoice, Payment
+from app.models.patients import Patient
+from app.models.visits import NurseActivityLog, Visit, Vitals
+from app.utils import timeline
+from app.utils.query_profile import capture_queries
+
+
+def seed(url: str, patients: int, cases: int, visits: int):
+    seed_patients(url, patients)
+    engine = create_schema(url)
+    rng = random.Random(11)
+    now = datetime.utcnow()
+    bulk_insert(engine, Case, ({"patient_id": 1 + i // cases, "title": "Wound care"} for i in range(patients * cases)))
+    bulk_insert(engine, WoundRecord, ({"case_id": 1 + i // 3, "severity": "mild"} for i in range(patients * cases * 3)))
+    bulk_insert(engine, Visit, ({
+        "patient_id": 1 + i // visits, "case_id": 1 + (i // visits) * cases + i % cases,
+        "visit_date": now - timedelta(days=rng.randint(0, 365)),
+    } for i in range(patients * visits)))
+    bulk_insert(engine, Vitals, ({"visit_id": 1 + i, "pulse": 80} for i in range(patients * visits)))
+    bulk_insert(engine, NurseActivityLog, ({"visit_id": 1 + i, "nurse_id": 1, "activity": "Dressing"}
+                                           for i in range(patients * visits)))
+    bulk_insert(engine, Invoice, ({"patient_id": 1 + i // 4, "amount": 1500.0} for i in range(patients * 4)))
+    bulk_insert(engine, Payment, ({"invoice_id": 1 + i, "amount": 500.0} for i in range(patients * 4)))
+
+
+async def per_resource(engine, patient_id: int) -> int:
+    """Sequential per-resource fetches; returns the number of calls"""
+    calls = 0
+
+    async def call(stmt):
+        nonlocal calls
+        calls += 1
+        async with AsyncSession(engine) as session:
+            return (await session.exec(stmt)).all()
+
+    await call(select(Patient).where(Patient.id == patient_id))
+    for case in await call(select(Case).where(Case.patient_id == patient_id)):
+        await call(select(WoundRecord).where(WoundRecord.case_id == case.id))
+    for visit in await call(select(Visit).where(Visit.patient_id == patient_id)):
+        await call(select(Vitals).where(Vitals.visit_id == visit.id))
+        await call(select(NurseActivityLog).where(NurseActivityLog.visit_id == visit.id))
+    for invoice in await call(select(Invoice).where(Invoice.patient_id == patient_id)):
+        await call(select(Payment).where(Payment.invoice_id == invoice.id))
+    return calls
+
+
+async def one_timeline(engine, patient_id: int) -> int:
+    async with AsyncSession(engine) as session:
+        sections = timeline.parse_sections(None)
+        patient = await timeline.load_timeline(session, patient_id, sections)
+        timeline.timeline_dict(patient, sections)
+    return 1
+
+
+async def measure(url: str, patients: int, rtt: float):
+    engine = create_async_engine(to_async_url(url))
+    rows = []
+    for name, fn in (("per-resource", per_resource), ("timeline", one_timeline)):
+        calls = 0
+        with capture_queries() as log:
+            start = time.perf_counter()
+            for patient_id in range(1, patients + 1):
+                calls += await fn(engine, patient_id)
+            elapsed = time.perf_counter() - start
+        server_ms = elapsed / patients * 1000
+        per_chart_calls = calls / patients
+        rows.append({
+            "path": name,
+            "calls_per_chart": round(per_chart_calls, 1),
+            "queries_per_chart": round(len(log) / patients, 1),
+            "server_ms_per_chart": round(server_ms, 2),
+            "with_rtt_ms": round(server_ms + per_chart_calls * rtt * 1000, 1),
+        })
+    await engine.dispose()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200)
+    parser.add_argument("--cases", type=int, default=5)
+    parser.add_argument("--visits", type=int, default=20)
+    parser.add_argument("--rtt", type=float, default=0.15, help="network round-trip per call, seconds")
+    args = parser.parse_args()
+
+    url = temp_database_url("timeline.db")
+    seed(url, args.patients, args.cases, args.visits)
+    print_table(asyncio.run(measure(url, args.patients, args.rtt)))
+
+
+if __name__ == "__main__":
+    main()
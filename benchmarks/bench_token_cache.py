@@ -0,0 +1,36 @@
+"""verify_token throughput: cold (full jwt.decode + HMAC) vs. cached.
+
+    python -m benchmarks.bench_token_cache [--tokens 100] [--rounds 20000]
+"""
+import argparse
+import time
+
+from benchmarks.common import print_table
+from app.utils.security import create_access_token, token_cache, verify_token, verify_token_cached
+
+
+def measure(fn, tokens, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        fn(tokens[i % len(tokens)])
+    elapsed = time.perf_counter() - start
+    return {"ops_per_s": round(rounds / elapsed), "us_per_op": round(elapsed / rounds * 1e6, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, default=100, help="distinct users polling")
+    parser.add_argument("--rounds", type=int, default=20_000)
+    args = parser.parse_args()
+
+    tokens = [create_access_token({"sub": f"nurse{i}"}) for i in range(args.tokens)]
+
+    token_cache.clear()
+    rows = [{"path": "cold (verify_token)", **measure(verify_token, tokens, args.rounds)}]
+    rows.append({"path": "cached (verify_token_cached)", **measure(verify_token_cached, tokens, args.rounds)})
+    print_table(rows)
+    print("cache:", token_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
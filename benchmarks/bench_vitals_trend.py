@@ -0,0 +1,130 @@
+"""1-year vitals trend: SQL-downsampled series vs shipping every reading.
+
+Seeds --rows readings for one patient spread over a year (plus --others
+times as many for 200 other patients) and times three ways of drawing the trend chart:
+fetching every reading and bucketing in Python (what a client must do
+without a trend API), the GROUP BY downsample behind
+/api/patients/{id}/vitals, and the same query without the
+(patient_id, measured_at) index — for the heavy patient and for a
+typical one (patient 2, --rows * --others / 200 readings).
+
+    python -m benchmarks.bench_vitals_trend [--rows 100000] [--others 4] [--bucket 1d] [--repeat 5]
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.common import bulk_insert, create_schema, print_table, seed_patients, temp_database_url
+from app.database import to_async_url
+from app.models.visits import Visit, Vitals
+from app.utils import vitals
+
+PATIENT = 1
+OTHER_PATIENTS = 200
+
+
+def seed(url: str, rows: int, others: int, until: datetime):
+    seed_patients(url, OTHER_PATIENTS + 1)
+    engine = create_schema(url)
+    bulk_insert(engine, Visit, ({"patient_id": p, "visit_date": until} for p in range(1, OTHER_PATIENTS + 2)))
+    rng = random.Random(21)
+    year = 365 * 86400
+
+    def reading(patient_id: int):
+        systolic = rng.randint(100, 160)
+        return {
+            "visit_id": patient_id, "patient_id": patient_id,
+            "measured_at": until - timedelta(seconds=rng.randint(1, year)),
+            "temperature": round(rng.uniform(36.0, 38.5), 1), "pulse": rng.randint(55, 120),
+            "blood_pressure": f"{systolic}/{systolic - rng.randint(30, 50)}",
+            "systolic": systolic, "diastolic": systolic - 40,
+            "respiratory_rate": rng.randint(12, 24), "spo2": rng.randint(90, 100),
+        }
+
+    # readings arrive in time order, all patients interleaved
+    readings = [reading(PATIENT) for _ in range(rows)]
+    readings += [reading(2 + i % OTHER_PATIENTS) for i in range(rows * others)]
+    readings.sort(key=lambda r: r["measured_at"])
+    bulk_insert(engine, Vitals, readings)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return engine
+
+
+async def python_buckets(session: AsyncSession, since: datetime, until: datetime, bucket: str):
+    """Every reading over the wire, bucketed in Python"""
+    width = vitals.bucket_seconds(bucket)
+    readings = (await session.exec(
+        select(Vitals).where(Vitals.patient_id == PATIENT, Vitals.measured_at >= since, Vitals.measured_at < until)
+    )).all()
+    buckets = {}
+    for r in readings:
+        key = int(r.measured_at.timestamp()) // width
+        buckets.setdefault(key, []).append(r)
+    series = {}
+    for name in vitals.METRICS:
+        values = [[getattr(r, name) for r in buckets[k] if getattr(r, name) is not None] for k in sorted(buckets)]
+        series[name] = {"min": [min(v) for v in values], "max": [max(v) for v in values],
+                        "avg": [round(statistics.fmean(v), 2) for v in values]}
+    payload = [r.model_dump(mode="json") for r in readings]
+    return payload, series
+
+
+async def measure(url: str, since: datetime, until: datetime, bucket: str, repeat: int):
+    engine = create_async_engine(to_async_url(url))
+
+    async def timed(fn):
+        times, size = [], 0
+        for _ in range(repeat):
+            async with AsyncSession(engine) as session:
+                start = time.perf_counter()
+                result = await fn(session)
+                times.append(time.perf_counter() - start)
+            size = len(json.dumps(result, default=str))
+        return {"p50_ms": round(statistics.median(times) * 1000, 1), "response_kb": round(size / 1024, 1)}
+
+    def series(patient_id):
+        return lambda s: vitals.downsample(s, patient_id, since, until, bucket, vitals.METRICS)
+
+    rows = [
+        {"path": "all readings + Python buckets", "patient": PATIENT,
+         **await timed(lambda s: python_buckets(s, since, until, bucket))},
+        {"path": "SQL GROUP BY (indexed)", "patient": PATIENT, **await timed(series(PATIENT))},
+        {"path": "SQL GROUP BY (indexed)", "patient": PATIENT + 1, **await timed(series(PATIENT + 1))},
+    ]
+    async with engine.begin() as conn:
+        await conn.execute(text("DROP INDEX ix_vitals_patient_id_measured_at"))
+    rows.append({"path": "SQL GROUP BY (no index)", "patient": PATIENT, **await timed(series(PATIENT))})
+    rows.append({"path": "SQL GROUP BY (no index)", "patient": PATIENT + 1, **await timed(series(PATIENT + 1))})
+    await engine.dispose()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="readings of the charted patient")
+    parser.add_argument("--others", type=int, default=4, help="other patients' readings, as a multiple of --rows")
+    parser.add_argument("--bucket", default="1d")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    until = datetime.utcnow().replace(microsecond=0)
+    since = until - timedelta(days=365)
+    url = temp_database_url("vitals.db")
+    seed(url, args.rows, args.others, until)
+    print(f"{args.rows} readings for patient {PATIENT} (+{args.rows * args.others} for {OTHER_PATIENTS} others), "
+          f"1 year at {args.bucket} buckets")
+    print_table(asyncio.run(measure(url, since, until, args.bucket, args.repeat)))
+
+
+if __name__ == "__main__":
+    main()
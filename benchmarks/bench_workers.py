@@ -0,0 +1,95 @@
+"""Throughput of `python -m app` from 1 to 8 worker processes on a CPU-bound mix.
+
+Every --login-every'th request is a login (bcrypt at --bcrypt-rounds);
+the rest list 100 patients (query + JSON serialisation). Each worker
+count gets a warm-up, then --duration seconds of load over --concurrency
+connections. Scaling is bounded by the cores available: compare against
+the cpu count printed first.
+
+    python -m benchmarks.bench_workers [--workers 1 2 4 8] [--duration 15] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+
+from benchmarks.common import (
+    auth_headers, percentile, print_table, seed_patients, seed_user, serve, temp_database_url,
+)
+
+LIST = "/api/patients/?limit=100"
+LOGIN = {"username": "nurse", "password": "night-shift"}
+
+
+async def mixed_load(base_url: str, concurrency: int, duration: float, login_every: int, headers):
+    latencies = {"login": [], "list": []}
+    errors = 0
+    sent = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            nonlocal errors, sent
+            while time.perf_counter() < deadline:
+                sent += 1
+                kind = "login" if sent % login_every == 0 else "list"
+                start = time.perf_counter()
+                try:
+                    if kind == "login":
+                        r = await client.post("/api/auth/login", json=LOGIN)
+                    else:
+                        r = await client.get(LIST, headers=headers)
+                    errors += r.status_code >= 400
+                except httpx.HTTPError:
+                    errors += 1
+                latencies[kind].append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    done = len(latencies["login"]) + len(latencies["list"])
+    return {
+        "rps": round(done / elapsed, 1),
+        "logins_per_s": round(len(latencies["login"]) / elapsed, 1),
+        "errors": errors,
+        "list_p50_ms": round(percentile(latencies["list"], 50) * 1000, 1),
+        "list_p99_ms": round(percentile(latencies["list"], 99) * 1000, 1),
+        "login_p99_ms": round(percentile(latencies["login"], 99) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--duration", type=float, default=15)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--login-every", type=int, default=20)
+    parser.add_argument("--bcrypt-rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    # the seeded hash and the server must agree on the cost, or every login rehashes
+    os.environ["BCRYPT_ROUNDS"] = str(args.bcrypt_rounds)
+    url = temp_database_url("workers.db")
+    seed_patients(url, 5000)
+    seed_user(url, "nurse", LOGIN["password"])
+    seed_user(url, "bench", "unused")
+    headers = auth_headers()
+    print(f"cpu count: {os.cpu_count()}")
+
+    rows = []
+    for workers in args.workers:
+        env = {"DATABASE_URL": url, "RESPONSE_CACHE_BACKEND": "off", "SUMMARY_RECONCILE_SECONDS": "0"}
+        with serve("app.main:app", env=env, extra_args=["--workers", str(workers)], launcher=True) as server:
+            # every worker has to finish importing the app before it takes load
+            asyncio.run(mixed_load(server.url, args.concurrency, 2 + workers, args.login_every, headers))
+            result = asyncio.run(mixed_load(server.url, args.concurrency, args.duration, args.login_every, headers))
+        rows.append({"workers": workers, **result})
+        print(f"  {rows[-1]}")
+    print_table(rows)
+
+
+if __name__ == "__main__":
+    main()
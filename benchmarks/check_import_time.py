@@ -0,0 +1,63 @@
+"""Startup budget check: `import app.main` stays under --budget-ms.
+
+Imports the app in --runs fresh interpreters and compares the median wall
+time against the budget, and fails if a dependency that should load on
+first use (passlib/bcrypt, jose, pytest) is imported with the app.
+Exits non-zero on either regression; the slowest packages are listed to
+show where the time went.
+
+    python -m benchmarks.check_import_time [--budget-ms 750] [--runs 5]
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks.bench_startup import import_profile
+
+# imported on first use, never at app import
+DEFERRED = ("jose", "passlib", "bcrypt", "pytest")
+
+PROBE = (
+    "import json, sys, time; start = time.perf_counter(); import app.main; "
+    "print(json.dumps({'ms': (time.perf_counter() - start) * 1000, 'modules': sorted(sys.modules)}))"
+)
+
+
+def measure(runs: int):
+    times, loaded = [], set()
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.splitlines()[-1])
+        times.append(result["ms"])
+        loaded.update(m.split(".")[0] for m in result["modules"])
+    return statistics.median(times), loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=750)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    median_ms, loaded = measure(args.runs)
+    eager = [name for name in DEFERRED if name in loaded]
+    print(f"import app.main: median {median_ms:.0f} ms over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+    print("slowest packages (self time): " + ", ".join(f"{name} {ms:.0f} ms" for name, ms in import_profile()[:8]))
+
+    checks = [
+        (median_ms <= args.budget_ms, "import time within budget"),
+        (not eager, f"deferred dependencies not imported at startup{': ' + ', '.join(eager) if eager else ''}"),
+    ]
+    failed = [label for ok, label in checks if not ok]
+    for ok, label in checks:
+        print(f"{'✓' if ok else '✗'} {label}")
+    if failed:
+        print(f"FAIL: {len(failed)} check(s)")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
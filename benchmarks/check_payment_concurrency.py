@@ -0,0 +1,114 @@
+"""Stress check: 1000 parallel payments against one invoice lose nothing.
+
+Seeds one invoice of --payments x 1.00 and fires --payments concurrent
+POST .../pay callbacks of 1.00 each, with a unique reference, plus
+--replays duplicate callbacks that reuse references from the same burst
+(as M-Pesa does when it retries). A 503 "ledger busy" is retried after
+its Retry-After, as the gateway would. Afterwards the invoice must be paid in
+full, with exactly one payment per reference and the dashboard's unpaid
+counter down by one. Exits non-zero on any mismatch.
+
+    python -m benchmarks.check_payment_concurrency [--payments 1000] [--replays 200] [--concurrency 100]
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+import httpx
+from sqlalchemy import create_engine, func
+from sqlmodel import Session, select
+
+from benchmarks.common import auth_headers, bulk_insert, create_schema, seed_patients, seed_user, serve, temp_database_url
+
+PAY = "/api/invoices/billing/invoice/1/pay"
+
+
+def seed(url: str, payments: int):
+    from app.models.invoices import Invoice
+
+    seed_patients(url, 10)
+    bulk_insert(create_schema(url), Invoice, [{"patient_id": 1, "amount": float(payments)}])
+    seed_user(url, "bench", "pay-day")
+
+
+async def burst(base_url: str, payments: int, replays: int, concurrency: int):
+    headers = auth_headers()
+    references = [f"QX{n:08d}" for n in range(payments)]
+    calls = references + random.Random(9).sample(references, replays)
+    random.Random(10).shuffle(calls)
+    statuses = {}
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        before = (await client.get("/api/dashboard/dashboard/summary", headers=headers)).json()
+
+        async def pay(reference: str):
+            # like the gateway: retry dropped connections and 503 + Retry-After
+            code = "transport"
+            for attempt in range(5):
+                try:
+                    r = await client.post(PAY, headers=headers, json={
+                        "invoice_id": 1, "amount": 1.0, "method": "mpesa", "reference": reference})
+                except httpx.TransportError:
+                    continue
+                code = r.status_code
+                if code != 503:
+                    break
+                statuses["503 (retried)"] = statuses.get("503 (retried)", 0) + 1
+                await asyncio.sleep(float(r.headers.get("retry-after", 1)))
+            statuses[code] = statuses.get(code, 0) + 1
+
+        await asyncio.gather(*(pay(reference) for reference in calls))
+        # the summary is cached for a few seconds; revalidate past it
+        await asyncio.sleep(0.1)
+        after = (await client.get("/api/dashboard/dashboard/summary",
+                                  headers={**headers, "Cache-Control": "no-cache"})).json()
+        invoice = (await client.get("/api/invoices/billing/invoices/unpaid", headers=headers)).json()
+    return statuses, before, after, invoice
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--payments", type=int, default=1000)
+    parser.add_argument("--replays", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=100, help="client connections the 1000 calls share")
+    args = parser.parse_args()
+
+    url = temp_database_url("payments.db")
+    seed(url, args.payments)
+    # no response cache: the check reads the dashboard straight after the burst
+    with serve("app.main:app", env={"DATABASE_URL": url, "RESPONSE_CACHE_BACKEND": "off"}) as server:
+        statuses, before, after, unpaid = asyncio.run(burst(server.url, args.payments, args.replays, args.concurrency))
+
+    from app.models.invoices import Invoice, Payment
+
+    engine = create_engine(url)
+    with Session(engine) as session:
+        invoice = session.get(Invoice, 1)
+        rows = session.exec(select(func.count()).select_from(Payment)).one()
+        references = session.exec(select(func.count(func.distinct(Payment.reference)))).one()
+        total = session.exec(select(func.sum(Payment.amount))).one()
+
+    print(f"responses: {statuses}")
+    print(f"invoice: paid_amount={invoice.paid_amount} of {invoice.amount}, status={invoice.status}")
+    print(f"payments: {rows} rows, {references} distinct references, sum {total}")
+    print(f"unpaid invoices: {before['total_unpaid_invoices']} -> {after['total_unpaid_invoices']}")
+
+    checks = [
+        (statuses.get(200, 0) == args.payments + args.replays, "every callback eventually answered 200"),
+        (rows == args.payments and references == args.payments, "one payment per reference"),
+        (invoice.paid_amount == args.payments and total == args.payments, "no lost or double-counted update"),
+        (invoice.status == "paid" and not unpaid, "invoice marked paid"),
+        (after["total_unpaid_invoices"] == before["total_unpaid_invoices"] - 1, "unpaid counter moved once"),
+    ]
+    failed = [label for ok, label in checks if not ok]
+    for ok, label in checks:
+        print(f"{'✓' if ok else '✗'} {label}")
+    if failed:
+        print(f"FAIL: {len(failed)} check(s)")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""EXPLAIN check: the hot foreign-key and per-tenant queries use the migrations' indexes.
+
+Builds a database the way an existing deployment has it (tables without
+the new indexes), runs the migrations, seeds some rows and asserts each
+query shape's SQLite plan searches the expected index. Exits non-zero on
+the first plan that does not.
+
+    python -m benchmarks.check_query_plans
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+from sqlmodel import select
+
+from benchmarks.common import bulk_insert, create_schema, seed_patients, temp_database_url
+from app.models.cases import Case, WoundRecord
+from app.models.invoices import Invoice, Payment
+from app.models.jobs import Job
+from app.models.organization import Organization
+from app.models.patients import Patient
+from app.models.visits import NurseActivityLog, Visit, Vitals
+from app.utils import migrations
+from app.utils.pagination import keyset
+
+ROWS = 2000
+ORGS = 50
+
+
+def legacy_schema(url: str):
+    """Tables as create_all made them before the indexes were declared"""
+    engine = create_schema(url)
+    module = migrations.Migration("0001", "foreign_key_indexes").module
+    with engine.begin() as conn:
+        for name, _, _ in module.INDEXES:
+            conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
+        conn.execute(text("DELETE FROM schema_migrations"))
+    return engine
+
+
+def seed(engine):
+    rng = random.Random(3)
+    now = datetime.utcnow()
+    bulk_insert(engine, Organization, ({"name": f"Clinic {i}"} for i in range(ORGS)))
+    with engine.begin() as conn:
+        conn.execute(text(f"UPDATE patients SET org_id = 1 + id % {ORGS}"))
+    bulk_insert(engine, Case, ({
+        "patient_id": rng.randint(1, ROWS), "org_id": rng.randint(1, ORGS), "title": "Wound care",
+        "status": rng.choice(["open", "closed", "critical"]),
+    } for _ in range(ROWS)))
+    bulk_insert(engine, Invoice, ({
+        "patient_id": rng.randint(1, ROWS), "org_id": rng.randint(1, ORGS), "amount": 1500.0,
+        "status": rng.choice(["pending", "paid"]),
+    } for _ in range(ROWS)))
+    bulk_insert(engine, Visit, ({
+        "patient_id": rng.randint(1, ROWS), "case_id": rng.randint(1, ROWS),
+        "visit_date": now + timedelta(hours=rng.randint(-500, 500)),
+    } for _ in range(ROWS)))
+    bulk_insert(engine, Vitals, ({
+        "visit_id": rng.randint(1, ROWS), "patient_id": rng.randint(1, ROWS), "pulse": 80,
+        "measured_at": now + timedelta(hours=rng.randint(-500, 500)),
+    } for _ in range(ROWS)))
+    bulk_insert(engine, NurseActivityLog, ({"visit_id": rng.randint(1, ROWS), "nurse_id": 1} for _ in range(ROWS)))
+    bulk_insert(engine, WoundRecord, ({"case_id": rng.randint(1, ROWS)} for _ in range(ROWS)))
+    bulk_insert(engine, Payment, ({"invoice_id": rng.randint(1, ROWS), "amount": 500.0} for _ in range(ROWS)))
+    bulk_insert(engine, Job, ({
+        "type": rng.choice(["invoice_batch", "unpaid_export"]), "status": rng.choice(["succeeded"] * 9 + ["queued"]),
+        "payload": {}, "attempts": 0, "max_attempts": 3, "run_after": now, "created_at": now,
+    } for _ in range(ROWS)))
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+
+def query_shapes():
+    today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [
+        ("unpaid invoices of a patient", "ix_invoices_patient_id_status",
+         keyset(select(Invoice).where(Invoice.status != "paid", Invoice.patient_id == 7), Invoice, None)),
+        ("visits today", "ix_visits_visit_date",
+         select(func.count()).select_from(Visit).where(
+             Visit.visit_date >= today, Visit.visit_date < today + timedelta(days=1))),
+        ("patient visit history", "ix_visits_patient_id_visit_date",
+         select(Visit).where(Visit.patient_id == 7).order_by(Visit.visit_date.desc())),
+        ("visits of a case", "ix_visits_case_id", select(Visit).where(Visit.case_id == 7)),
+        ("cases of a patient", "ix_cases_patient_id", select(Case).where(Case.patient_id == 7)),
+        ("vitals of a visit", "ix_vitals_visit_id", select(Vitals).where(Vitals.visit_id == 7)),
+        ("activity of a visit", "ix_nurse_activity_logs_visit_id",
+         select(NurseActivityLog).where(NurseActivityLog.visit_id == 7)),
+        ("wounds of a case", "ix_wound_records_case_id", select(WoundRecord).where(WoundRecord.case_id == 7)),
+        ("payments of an invoice", "ix_payments_invoice_id", select(Payment).where(Payment.invoice_id == 7)),
+        ("vitals trend of a patient", "ix_vitals_patient_id_measured_at",
+         select(Vitals).where(Vitals.patient_id == 7, Vitals.measured_at >= today - timedelta(days=365))),
+        ("a tenant's patients, oldest first", "ix_patients_org_id_created_at_id",
+         keyset(select(Patient).where(Patient.org_id == 7), Patient, None)),
+        ("a tenant's unpaid invoices", "ix_invoices_org_id_created_at_id",
+         keyset(select(Invoice).where(Invoice.status != "paid", Invoice.org_id == 7), Invoice, None)),
+        ("a tenant's critical cases", "ix_cases_org_id_status",
+         select(func.count()).select_from(Case).where(Case.org_id == 7, Case.status == "critical")),
+        ("due jobs of a type", "ix_jobs_status_type_run_after",
+         select(Job.id).where(Job.status == "queued", Job.type == "invoice_batch", Job.run_after <= datetime.utcnow())
+         .order_by(Job.run_after, Job.id).limit(4)),
+    ]
+
+
+def plan(conn, stmt) -> str:
+    compiled = stmt.compile(dialect=conn.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).all()
+    return " | ".join(row[-1] for row in rows)
+
+
+def main():
+    url = temp_database_url("plans.db")
+    seed_patients(url, ROWS)
+    engine = legacy_schema(url)
+    applied = migrations.upgrade(engine)
+    assert "0001" in applied, f"expected migration 0001 to apply, got {applied}"
+    assert migrations.upgrade(engine) == [], "migrations are not idempotent"
+    seed(engine)
+
+    failures = 0
+    with engine.connect() as conn:
+        for label, index, stmt in query_shapes():
+            detail = plan(conn, stmt)
+            ok = f"INDEX {index}" in detail
+            failures += not ok
+            print(f"{'✓' if ok else '✗'} {label}: {detail}")
+    if failures:
+        print(f"FAIL: {failures} query shape(s) not using their index")
+        sys.exit(1)
+    print("OK: every query shape uses its index")
+
+
+if __name__ == "__main__":
+    main()
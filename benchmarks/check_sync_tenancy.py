@@ -0,0 +1,158 @@
+"""Check: two clinics syncing against one server never see each other's rows.
+
+Seeds two organisations with --patients patients and one case each, then,
+as each clinic's nurse, creates and deletes a patient and pushes a visit
+through /api/sync/push. Clinic 1 also pushes an op reusing clinic 2's
+idempotency key, a vitals op naming clinic 2's visit_key and a reading
+on its own visit that names clinic 2's patient. Each clinic then pulls from scratch, --page entries at a time. Every row and
+tombstone it receives must be its own, and it must receive all of them.
+Exits non-zero on any mismatch.
+
+    python -m benchmarks.check_sync_tenancy [--patients 200] [--page 50]
+"""
+import argparse
+import asyncio
+import random
+import sys
+
+import httpx
+from sqlalchemy import insert
+
+from benchmarks.common import bulk_insert, create_schema, fake_patient, temp_database_url
+
+TENANTS = (1, 2)
+
+
+def seed(url: str, patients: int):
+    from app.models.cases import Case
+    from app.models.organization import Organization
+    from app.models.patients import Patient
+    from app.models.users import User
+    from app.utils.security import hash_password
+
+    engine = create_schema(url)
+    rng = random.Random(3)
+    org = lambda i: TENANTS[i // patients]  # noqa: E731
+    bulk_insert(engine, Organization, ({"name": f"Clinic {n}"} for n in TENANTS))
+    bulk_insert(engine, Patient, ({**fake_patient(i, rng), "org_id": org(i)} for i in range(patients * len(TENANTS))))
+    bulk_insert(engine, Case, ({"patient_id": i + 1, "org_id": org(i), "title": "Wound care"}
+                               for i in range(patients * len(TENANTS))))
+    with engine.begin() as conn:
+        for n in TENANTS:
+            conn.execute(insert(User).values(
+                username=f"nurse{n}", email=f"nurse{n}@example.co.ke", password=hash_password("field-day"),
+                full_name=f"Clinic {n} Nurse", org_id=n,
+            ))
+    return engine
+
+
+def headers(org_id: int):
+    from app.utils.security import create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': f'nurse{org_id}', 'org_id': org_id})}"}
+
+
+async def pull_all(client, org_id: int, page: int):
+    """Every change a fresh device of clinic `org_id` receives: {table: ids}, {table: tombstone ids}"""
+    changes, deleted = {}, {}
+    token = None
+    while True:
+        params = {"limit": page, **({"token": token} if token else {})}
+        body = (await client.get("/api/sync/pull", params=params, headers=headers(org_id))).json()
+        for table, rows in body["changes"].items():
+            changes.setdefault(table, set()).update(row["id"] for row in rows)
+        for table, ids in body["deleted"].items():
+            deleted.setdefault(table, set()).update(ids)
+        token = body["token"]
+        if not body["has_more"]:
+            return changes, deleted
+
+
+async def scenario(page: int):
+    import app.main
+    from app.database import dispose_engines
+    from app.utils import sync
+
+    await sync.ensure_change_log()
+    created, removed, pushes = {}, {}, {}
+    transport = httpx.ASGITransport(app=app.main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://check") as client:
+        for n in TENANTS:
+            auth = headers(n)
+            ids = []
+            for last in ("Kept", "Removed"):
+                r = await client.post("/api/patients/", headers=auth, json={"first_name": "Sync", "last_name": last})
+                ids.append(r.json()["id"])
+            await client.delete(f"/api/patients/{ids[1]}", headers=auth)
+            created[n], removed[n] = ids[0], ids[1]
+            pushes[n] = (await client.post("/api/sync/push", headers=auth, json={"device_id": f"tab-{n}", "ops": [
+                {"key": f"visit-key-{n}", "type": "visit",
+                 "data": {"patient_id": ids[0], "visit_date": "2026-03-02T09:00:00"}},
+            ]})).json()
+        # clinic 1 replays clinic 2's key, hangs vitals off clinic 2's visit and
+        # files a reading on its own visit under clinic 2's patient
+        stolen = (await client.post("/api/sync/push", headers=headers(1), json={"ops": [
+            {"key": "visit-key-2", "type": "visit", "data": {"patient_id": created[1], "visit_date": "2026-03-02T10:00:00"}},
+            {"key": "vitals-key-1", "type": "vitals", "visit_key": "visit-key-2", "data": {"pulse": 80}},
+            {"key": "vitals-key-2", "type": "vitals", "visit_key": "visit-key-1",
+             "data": {"patient_id": created[2], "blood_pressure": "200/100"}},
+        ]})).json()
+        replay = (await client.post("/api/sync/push", headers=headers(2), json={"ops": [
+            {"key": "visit-key-2", "type": "visit", "data": {"patient_id": created[2], "visit_date": "2026-03-02T09:00:00"}},
+        ]})).json()
+        pulled = {n: await pull_all(client, n, page) for n in TENANTS}
+    await dispose_engines()
+    return created, removed, pushes, stolen, replay, pulled
+
+
+def owned(url: str):
+    """Ids each tenant owns per tracked table, read straight from the database"""
+    from sqlmodel import Session, create_engine, select
+    from app.models.cases import Case
+    from app.models.patients import Patient
+    from app.models.visits import Visit
+
+    with Session(create_engine(url)) as session:
+        return {n: {table: set(session.exec(select(model.id).where(model.org_id == n)).all())
+                    for table, model in (("patients", Patient), ("cases", Case), ("visits", Visit))}
+                for n in TENANTS}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--patients", type=int, default=200, help="seeded patients per clinic")
+    parser.add_argument("--page", type=int, default=50, help="change-log entries per pull")
+    args = parser.parse_args()
+
+    url = temp_database_url("sync_tenancy.db")
+    seed(url, args.patients)
+    created, removed, pushes, stolen, replay, pulled = asyncio.run(scenario(args.page))
+    expected = owned(url)
+
+    checks = [
+        (all(pushes[n]["created"] == 1 for n in TENANTS), "each clinic's visit was created"),
+        ([r["error"] for r in stolen["results"][:2]] == ["key already used", "visit_key visit-key-2 not found"],
+         "another clinic's key is neither a duplicate nor a resolvable visit_key"),
+        (stolen["results"][2]["error"] == f"patient_id does not match visit {pushes[1]['results'][0]['id']}",
+         "a reading naming another clinic's patient is rejected"),
+        (replay["duplicates"] == 1 and replay["results"][0]["id"] == pushes[2]["results"][0]["id"],
+         "the owning clinic's retry is still a duplicate"),
+    ]
+    for n in TENANTS:
+        changes, deleted = pulled[n]
+        print(f"clinic {n}: " + ", ".join(f"{t} {len(ids)}" for t, ids in sorted(changes.items()))
+              + f"; deleted {dict((t, sorted(ids)) for t, ids in deleted.items())}")
+        checks += [
+            (all(changes.get(t, set()) == ids for t, ids in expected[n].items()), f"clinic {n} received exactly its rows"),
+            (deleted == {"patients": {removed[n]}}, f"clinic {n} received only its own tombstone"),
+        ]
+    failed = [label for ok, label in checks if not ok]
+    for ok, label in checks:
+        print(f"{'✓' if ok else '✗'} {label}")
+    if failed:
+        print(f"FAIL: {len(failed)} check(s)")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
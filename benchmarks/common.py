@@ -0,0 +1,244 @@
+"""Shared helpers for the benchmark scripts in this directory.
+
+Every benchmark runs against a throwaway SQLite file so results are
+reproducible on a laptop:
+
+    python -m benchmarks.bench_async_stack
+"""
+import asyncio
+import contextlib
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+import httpx
+
+# Benchmarks drive one user / IP far past any client's fair share; only
+# bench_rate_limit measures the limiter
+os.environ.setdefault("RATE_LIMIT_BACKEND", "off")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_NAMES = [
+    "Amina", "Wanjiru", "Achieng", "Njeri", "Akinyi", "Chebet", "Wambui", "Nafula",
+    "Kamau", "Otieno", "Mwangi", "Kiprop", "Ochieng", "Mutua", "Kipchoge", "Baraka",
+    "Atieno", "Auma", "Jepkosgei", "Nyokabi", "Wairimu", "Moraa", "Kerubo", "Zawadi",
+    "Kibet", "Wafula", "Onyango", "Njoroge", "Kiptoo", "Juma", "Omari", "Makena",
+    "Nekesa", "Wanjala", "Barasa", "Cherono", "Muthoni", "Nduta", "Kemunto", "Adhiambo",
+]
+LAST_NAMES = [
+    "Odhiambo", "Kariuki", "Wekesa", "Mutiso", "Njoroge", "Onyango", "Chege", "Koech",
+    "Kimani", "Omondi", "Wafula", "Rotich", "Githinji", "Were", "Kiplagat", "Mburu",
+    "Ouma", "Owino", "Kiprotich", "Korir", "Langat", "Mutai", "Wanyama", "Simiyu",
+    "Nyaga", "Muriuki", "Macharia", "Kinyua", "Ndirangu", "Ngugi", "Okoth", "Obuya",
+    "Kilonzo", "Musyoka", "Mwende", "Ndungu", "Gathoni", "Otiende", "Akoth", "Kibaki",
+]
+
+
+def temp_database_url(name: str = "bench.db") -> str:
+    """Create a fresh SQLite file and export it as DATABASE_URL for subprocesses"""
+    path = os.path.join(tempfile.mkdtemp(prefix="neudebri-bench-"), name)
+    url = f"sqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    return url
+
+
+def kenyan_phone(rng: random.Random) -> str:
+    return "07" + "".join(str(rng.randint(0, 9)) for _ in range(8))
+
+
+def fake_patient(i: int, rng: random.Random) -> Dict:
+    first = rng.choice(FIRST_NAMES)
+    last = rng.choice(LAST_NAMES)
+    return {
+        "first_name": first,
+        "last_name": last,
+        "email": f"{first.lower()}.{last.lower()}.{i}@example.co.ke",
+        "phone": kenyan_phone(rng),
+        "gender": rng.choice(["F", "M"]),
+        "location": rng.choice(["Nairobi", "Kisumu", "Mombasa", "Eldoret", "Nakuru"]),
+    }
+
+
+def create_schema(url: str):
+    """Create every table in the database at `url` and return an engine for it"""
+    from sqlmodel import SQLModel, create_engine
+    import app.main  # noqa: F401 — registers every model on the metadata
+
+    engine = create_engine(url)
+    SQLModel.metadata.create_all(engine)
+    return engine
+
+
+def bulk_insert(engine, model, rows: Iterable[Dict], batch_size: int = 5000) -> None:
+    """executemany `rows` into `model`'s table in batches"""
+    from sqlalchemy import insert
+
+    with engine.begin() as conn:
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                conn.execute(insert(model), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(model), batch)
+
+
+def seed_patients(url: str, count: int, seed: int = 42) -> None:
+    """Create the schema and insert `count` synthetic patients"""
+    from app.models.patients import Patient
+
+    engine = create_schema(url)
+    rng = random.Random(seed)
+    bulk_insert(engine, Patient, (fake_patient(i, rng) for i in range(count)))
+
+
+def seed_user(url: str, username: str, password: str) -> None:
+    """Insert a login-able platform user (bcrypt-hashed password)"""
+    from sqlalchemy import insert
+    from app.models.users import User
+    from app.utils.security import PLATFORM_ROLE, hash_password
+
+    engine = create_schema(url)
+    with engine.begin() as conn:
+        conn.execute(insert(User).values(
+            username=username, email=f"{username}@example.co.ke",
+            password=hash_password(password), full_name="Bench Nurse", role=PLATFORM_ROLE,
+        ))
+
+
+def auth_headers(username: str = "bench") -> Dict[str, str]:
+    from app.utils.security import PLATFORM_ROLE, create_access_token
+    return {"Authorization": f"Bearer {create_access_token({'sub': username, 'role': PLATFORM_ROLE})}"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class Server(NamedTuple):
+    url: str
+    pid: int
+
+
+def peak_rss_mb(pid: int) -> float:
+    """High-water resident set size of a (Linux) process"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return round(int(line.split()[1]) / 1024, 1)
+    return 0.0
+
+
+@contextlib.contextmanager
+def serve(app_path: str, env: Optional[Dict[str, str]] = None, extra_args: Iterable[str] = (),
+          verbose: bool = False, launcher: bool = False):
+    """Run `app_path` under uvicorn in a subprocess and yield its Server(url, pid).
+
+    launcher=True runs the production entry point (`python -m app`) instead.
+    """
+    port = free_port()
+    command = ["-m", "app"] if launcher else ["-m", "uvicorn", app_path, "--log-level", "warning"]
+    proc = subprocess.Popen(
+        [sys.executable, *command, "--port", str(port), *extra_args],
+        cwd=ROOT,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=None if verbose else subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                httpx.get(base_url + "/health", timeout=1)
+                break
+            except httpx.HTTPError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError(f"{app_path} did not start")
+        yield Server(base_url, proc.pid)
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+async def _run_load(base_url, paths, concurrency, total, headers, method, json_body, duration):
+    latencies: List[float] = []
+    errors = 0
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(paths[i % len(paths)])
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                try:
+                    path = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                start = time.perf_counter()
+                try:
+                    r = await client.request(method, path, headers=headers, json=json_body)
+                    if r.status_code >= 400:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - start)
+
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def run_load(base_url: str, paths: List[str], concurrency: int, total: int,
+             headers: Optional[Dict[str, str]] = None, method: str = "GET",
+             json_body=None, duration: float = 60.0) -> Dict:
+    """Fire up to `total` requests over `concurrency` connections (stopping
+    after `duration` seconds); return rps and latency"""
+    return asyncio.run(
+        _run_load(base_url, paths, concurrency, total, headers, method, json_body, duration)
+    )
+
+
+def print_table(rows: List[Dict]) -> None:
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = {c: max(len(c), *(len(str(r.get(c, ""))) for r in rows)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for r in rows:
+        print("  ".join(str(r.get(c, "")).ljust(widths[c]) for c in columns))
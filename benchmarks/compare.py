@@ -0,0 +1,90 @@
+"""Compare two replay results and flag per-endpoint regressions.
+
+An endpoint regresses when its p50 or p95 grows by more than --threshold
+(and by at least --min-ms, so sub-millisecond noise is not flagged) or
+its error count grows. Latency is only judged for endpoints with at least
+--min-samples requests in both runs: a p95 of five requests is noise. Overall throughput dropping by more than the
+threshold is flagged too. Exits non-zero when anything regressed.
+
+    python -m benchmarks.compare baseline.json results.json [--threshold 0.15]
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List
+
+from benchmarks.common import print_table
+
+LATENCIES = ("p50_ms", "p95_ms")
+# results that differ in these were not measured the same way
+COMPARABLE = ("trace", "database", "patients", "orgs", "concurrency", "requests")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _change(old: float, new: float) -> float:
+    return (new - old) / old if old else 0.0
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = 0.15,
+            min_ms: float = 1.0, min_samples: int = 30) -> List[str]:
+    """Print the comparison table; returns the regressions found"""
+    differing = [key for key in COMPARABLE if baseline["meta"].get(key) != current["meta"].get(key)]
+    if differing:
+        print(f"⚠️ runs differ in {', '.join(differing)}: the comparison may not be meaningful")
+
+    rows, regressions = [], []
+    names = sorted(set(baseline["endpoints"]) | set(current["endpoints"]))
+    for name in [*names, "TOTAL"]:
+        old = baseline["total"] if name == "TOTAL" else baseline["endpoints"].get(name)
+        new = current["total"] if name == "TOTAL" else current["endpoints"].get(name)
+        if old is None or new is None:
+            rows.append({"endpoint": name, "verdict": "new" if old is None else "gone"})
+            continue
+        flags = []
+        measured = min(old["requests"], new["requests"]) >= min_samples
+        for key in LATENCIES if measured else ():
+            if _change(old[key], new[key]) > threshold and new[key] - old[key] >= min_ms:
+                flags.append(f"{key} +{_change(old[key], new[key]):.0%}")
+        if new["errors"] > old["errors"]:
+            flags.append(f"errors {old['errors']}->{new['errors']}")
+        if name == "TOTAL" and _change(old["rps"], new["rps"]) < -threshold:
+            flags.append(f"rps {_change(old['rps'], new['rps']):.0%}")
+        regressions += [f"{name}: {flag}" for flag in flags]
+        rows.append({
+            "endpoint": name,
+            "p50_ms": f"{old['p50_ms']} -> {new['p50_ms']}",
+            "p95_ms": f"{old['p95_ms']} -> {new['p95_ms']}",
+            "rps": f"{old['rps']} -> {new['rps']}",
+            "errors": f"{old['errors']} -> {new['errors']}",
+            "verdict": "REGRESSION" if flags else "ok" if measured else "few samples",
+        })
+    print()
+    print_table(rows)
+    print()
+    if regressions:
+        print(f"FAIL: {len(regressions)} regression(s) over {threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+    else:
+        print(f"OK: no endpoint regressed by more than {threshold:.0%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=0.15)
+    parser.add_argument("--min-ms", type=float, default=1.0)
+    parser.add_argument("--min-samples", type=int, default=30)
+    args = parser.parse_args()
+    if compare(load(args.baseline), load(args.current), args.threshold, args.min_ms, args.min_samples):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Synthetic clinic data at a chosen scale, for the replayer and ad-hoc profiling.
+
+Every row is consistent with what the API would have written: children
+carry their patient's org_id, vitals their visit's patient, and each
+invoice's paid_amount and status match its payments. Ids are explicit,
+so the same --seed always yields the same database.
+
+    python -m benchmarks.datagen [--patients 10000] [--orgs 10] [--database sqlite:///clinic.db]
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, NamedTuple
+
+from benchmarks.common import bulk_insert, create_schema, fake_patient, print_table, temp_database_url
+
+# password of every generated user
+PASSWORD = "bench-password"
+# platform user without an organisation: sees every clinic
+ADMIN = "admin"
+
+
+class Scale(NamedTuple):
+    orgs: int = 10
+    users_per_org: int = 5
+    patients: int = 10_000
+    cases_per_patient: float = 1.0
+    visits_per_case: float = 3.0
+    invoices_per_case: float = 1.5
+    # payments of an invoice that has any; a third of invoices have none
+    payments_per_invoice: float = 1.5
+    days: int = 365
+
+
+def username(org_id: int, n: int) -> str:
+    return f"nurse{org_id}_{n}"
+
+
+def _count(rng: random.Random, mean: float) -> int:
+    """A whole number of children averaging `mean`"""
+    whole = int(mean)
+    return whole + (rng.random() < mean - whole)
+
+
+def generate(url: str, scale: Scale = Scale(), seed: int = 42) -> Dict[str, int]:
+    """Create the schema at `url` and fill it; returns rows per table"""
+    from app.models.cases import Case, WoundRecord
+    from app.models.invoices import Invoice, Payment
+    from app.models.organization import Organization
+    from app.models.patients import Patient
+    from app.models.users import User
+    from app.models.visits import NurseActivityLog, Visit, Vitals
+    from app.utils.security import PLATFORM_ROLE, hash_password
+    from app.utils.vitals import parse_blood_pressure
+
+    engine = create_schema(url)
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    ago = lambda: now - timedelta(days=rng.randint(0, scale.days), minutes=rng.randint(0, 1439))  # noqa: E731
+    password = hash_password(PASSWORD)
+    counts: Dict[str, int] = {}
+
+    bulk_insert(engine, Organization, (
+        {"id": org, "name": f"Clinic {org}", "code": f"CL{org:04d}", "location": "Nairobi"}
+        for org in range(1, scale.orgs + 1)
+    ))
+    nurses = {org: [] for org in range(1, scale.orgs + 1)}
+    users = [{"id": 1, "username": ADMIN, "email": "admin@example.co.ke", "password": password,
+              "full_name": "Platform Admin", "org_id": None, "role": PLATFORM_ROLE}]
+    for org in nurses:
+        for n in range(scale.users_per_org):
+            nurses[org].append(len(users) + 1)
+            users.append({"id": len(users) + 1, "username": username(org, n), "email": f"{username(org, n)}@example.co.ke",
+                          "password": password, "full_name": f"Nurse {org}-{n}", "org_id": org})
+    bulk_insert(engine, User, users)
+    counts["organization"], counts["users"] = scale.orgs, len(users)
+
+    def patients():
+        for i in range(scale.patients):
+            yield {**fake_patient(i, rng), "id": i + 1, "org_id": 1 + i % scale.orgs, "created_at": ago()}
+    bulk_insert(engine, Patient, patients())
+    counts["patients"] = scale.patients
+
+    # the children of each case are generated together so their ids and orgs line up
+    rows = {name: [] for name in ("cases", "wounds", "visits", "vitals", "activity", "invoices", "payments")}
+    case_id = visit_id = invoice_id = payment_id = 0
+    for patient_id in range(1, scale.patients + 1):
+        org = 1 + (patient_id - 1) % scale.orgs
+        for _ in range(_count(rng, scale.cases_per_patient)):
+            case_id += 1
+            opened = ago()
+            status = rng.choice(["open", "open", "open", "closed", "critical"])
+            rows["cases"].append({"id": case_id, "patient_id": patient_id, "org_id": org, "title": "Wound care",
+                                  "status": status, "created_at": opened, "updated_at": opened})
+            rows["wounds"].append({"case_id": case_id, "severity": rng.choice(["mild", "moderate", "severe"]),
+                                   "created_at": opened})
+            for _ in range(_count(rng, scale.visits_per_case)):
+                visit_id += 1
+                nurse = rng.choice(nurses[org]) if nurses[org] else None
+                when = opened + timedelta(days=rng.randint(0, 30))
+                rows["visits"].append({"id": visit_id, "patient_id": patient_id, "case_id": case_id, "org_id": org,
+                                       "visit_date": when, "recorded_by": nurse, "created_at": when})
+                pressure = f"{rng.randint(100, 160)}/{rng.randint(60, 100)}"
+                systolic, diastolic = parse_blood_pressure(pressure)
+                rows["vitals"].append({"visit_id": visit_id, "patient_id": patient_id, "pulse": rng.randint(55, 110),
+                                       "temperature": round(rng.uniform(36.0, 38.5), 1), "blood_pressure": pressure,
+                                       "systolic": systolic, "diastolic": diastolic, "measured_at": when})
+                if nurse:
+                    rows["activity"].append({"visit_id": visit_id, "nurse_id": nurse, "activity": "Dressing change",
+                                             "timestamp": when})
+            for _ in range(_count(rng, scale.invoices_per_case)):
+                invoice_id += 1
+                amount = float(rng.choice([500, 1500, 2500, 4000]))
+                billed = opened + timedelta(days=rng.randint(0, 30))
+                paid = 0.0
+                if rng.random() < 2 / 3:
+                    for _ in range(max(1, _count(rng, scale.payments_per_invoice))):
+                        payment_id += 1
+                        part = min(amount - paid, float(rng.choice([500, 1000, amount])))
+                        if part <= 0:
+                            break
+                        paid += part
+                        paid_at = billed + timedelta(days=rng.randint(0, 60))
+                        rows["payments"].append({"id": payment_id, "invoice_id": invoice_id, "amount": part,
+                                                 "method": "mpesa", "reference": f"GEN{payment_id:09d}",
+                                                 "paid_at": paid_at, "created_at": paid_at})
+                status = "pending" if not paid else "paid" if paid >= amount else "partially_paid"
+                rows["invoices"].append({"id": invoice_id, "patient_id": patient_id, "case_id": case_id, "org_id": org,
+                                         "amount": amount, "paid_amount": paid, "status": status,
+                                         "invoice_date": billed, "created_at": billed})
+        if len(rows["visits"]) >= 20_000 or patient_id == scale.patients:
+            for name, model in (("cases", Case), ("wounds", WoundRecord), ("visits", Visit), ("vitals", Vitals),
+                                ("activity", NurseActivityLog), ("invoices", Invoice), ("payments", Payment)):
+                bulk_insert(engine, model, rows[name])
+                counts[name] = counts.get(name, 0) + len(rows[name])
+                rows[name] = []
+    engine.dispose()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--database", help="SQLAlchemy URL of an empty database (default: a temp SQLite file)")
+    parser.add_argument("--patients", type=int, default=Scale().patients)
+    parser.add_argument("--orgs", type=int, default=Scale().orgs)
+    parser.add_argument("--users-per-org", type=int, default=Scale().users_per_org)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    url = args.database or temp_database_url("clinic.db")
+    scale = Scale(orgs=args.orgs, users_per_org=args.users_per_org, patients=args.patients)
+    start = time.perf_counter()
+    counts = generate(url, scale, args.seed)
+    print_table([{"table": table, "rows": n} for table, n in counts.items()])
+    print(f"\n{url} generated in {time.perf_counter() - start:.1f}s (user password: {PASSWORD!r})")
+
+
+if __name__ == "__main__":
+    main()
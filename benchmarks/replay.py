@@ -0,0 +1,295 @@
+"""Replay a request trace against the app in-process; per-endpoint throughput and latency.
+
+A trace is JSON lines, one request shape per line:
+
+    {"name": "patients.get", "method": "GET", "path": "/api/patients/{patient_id}",
+     "weight": 15, "auth": "tenant", "json": null, "expect": [200]}
+
+`weight` is the shape's share of the mix; `auth` is "tenant" (a random
+nurse of a random clinic, the default), "admin" (the unscoped platform
+user) or "none"; `expect` lists the statuses that are not errors (any
+2xx by default). Placeholders in the path and body are filled per
+request: {patient_id}, {case_id}, {visit_id}, {invoice_id} (rows of the
+caller's clinic), {user_id}, {username}, {org_id}, {name}, {now},
+{uuid}, {seq} (a per-run counter) and {run} (the run's id). A string
+that is only a placeholder becomes the value itself, so ids stay ints.
+
+The database comes from benchmarks.datagen (a fresh one at --patients
+unless --database points at an existing one). Requests go through
+httpx's ASGI transport after the app's startup handlers ran, so the
+numbers are the app's own cost, without a server or network. Results
+are written as JSON with --output; --baseline compares them against an
+earlier run (see benchmarks.compare) and exits non-zero on a regression.
+
+    python -m benchmarks.replay [--trace benchmarks/traces/clinic_day.jsonl] [--concurrency 8]
+        [--requests 3000] [--output results.json] [--baseline previous.json --threshold 0.15]
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import FIRST_NAMES, ROOT, percentile, print_table, temp_database_url
+
+DEFAULT_TRACE = os.path.join(ROOT, "benchmarks", "traces", "clinic_day.jsonl")
+PLACEHOLDER = re.compile(r"\{(\w+)\}")
+# placeholders taken from the calling user
+USER_FIELDS = {"user_id": "id", "username": "username", "org_id": "org_id"}
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    shapes = []
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            shape = json.loads(line)
+            missing = {"name", "method", "path"} - set(shape)
+            if missing:
+                raise SystemExit(f"{path}:{number}: missing {', '.join(sorted(missing))}")
+            shape.setdefault("weight", 1)
+            shape.setdefault("auth", "tenant")
+            shapes.append(shape)
+    return shapes
+
+
+class Population:
+    """Ids the placeholders are drawn from, per clinic, and a token per user"""
+
+    def __init__(self, url: str):
+        from sqlalchemy import create_engine, text
+        from app.utils.security import PLATFORM_ROLE, create_access_token
+
+        engine = create_engine(url)
+        self.ids: Dict[str, Dict[Optional[int], List[int]]] = {}
+        with engine.connect() as conn:
+            for name, table in (("patient_id", "patients"), ("case_id", "cases"),
+                                ("visit_id", "visits"), ("invoice_id", "invoices")):
+                by_org = defaultdict(list)
+                for row_id, org_id in conn.execute(text(f"SELECT id, org_id FROM {table}")):
+                    by_org[org_id].append(row_id)
+                    by_org[None].append(row_id)
+                self.ids[name] = by_org
+            self.users = [dict(row._mapping) for row in conn.execute(text("SELECT id, username, org_id FROM users"))]
+        engine.dispose()
+        if not self.users:
+            raise SystemExit("no users in the database: generate it with benchmarks.datagen")
+        self.nurses = [user for user in self.users if user["org_id"] is not None]
+        self.admins = [user for user in self.users if user["org_id"] is None] or self.users
+        self.tokens = {
+            user["id"]: create_access_token({"sub": user["username"],
+                                             **({"org_id": user["org_id"]} if user["org_id"] else {"role": PLATFORM_ROLE})})
+            for user in self.users
+        }
+
+
+class Replayer:
+    def __init__(self, shapes: List[Dict[str, Any]], population: Population, seed: int):
+        self.shapes = shapes
+        self.weights = [shape["weight"] for shape in shapes]
+        self.population = population
+        self.rng = random.Random(seed)
+        self.run = uuid.UUID(int=self.rng.getrandbits(128)).hex[:8]
+        self.seq = itertools.count(1)
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+        self.errors: Counter = Counter()
+
+    def _request(self):
+        shape = self.rng.choices(self.shapes, self.weights)[0]
+        population = self.population
+        pool = population.admins if shape["auth"] == "admin" or not population.nurses else population.nurses
+        user = self.rng.choice(pool)
+        values: Dict[str, Any] = {}
+
+        def value(name: str):
+            if name not in values:
+                if name in population.ids:
+                    ids = population.ids[name].get(user["org_id"]) or population.ids[name][None]
+                    values[name] = self.rng.choice(ids) if ids else 0
+                elif name in USER_FIELDS:
+                    values[name] = user[USER_FIELDS[name]]
+                elif name == "name":
+                    values[name] = self.rng.choice(FIRST_NAMES)
+                elif name == "now":
+                    values[name] = datetime.utcnow().isoformat()
+                elif name == "uuid":
+                    values[name] = str(uuid.UUID(int=self.rng.getrandbits(128)))
+                elif name == "seq":
+                    values[name] = next(self.seq)
+                elif name == "run":
+                    values[name] = self.run
+                else:
+                    raise SystemExit(f"{shape['name']}: unknown placeholder {{{name}}}")
+            return values[name]
+
+        def fill(template):
+            if isinstance(template, str):
+                whole = PLACEHOLDER.fullmatch(template)
+                if whole:
+                    return value(whole.group(1))
+                return PLACEHOLDER.sub(lambda m: str(value(m.group(1))), template)
+            if isinstance(template, list):
+                return [fill(item) for item in template]
+            if isinstance(template, dict):
+                return {key: fill(item) for key, item in template.items()}
+            return template
+
+        headers = {} if shape["auth"] == "none" else {"Authorization": f"Bearer {population.tokens[user['id']]}"}
+        return shape, fill(shape["path"]), fill(shape.get("json")), headers
+
+    async def _worker(self, client: httpx.AsyncClient, count: itertools.count, total: int, record: bool):
+        while next(count) < total:
+            shape, path, body, headers = self._request()
+            start = time.perf_counter()
+            try:
+                response = await client.request(shape["method"], path, json=body, headers=headers)
+                status = response.status_code
+            except Exception as e:  # the app raised instead of answering
+                status = type(e).__name__
+            elapsed = time.perf_counter() - start
+            if not record:
+                continue
+            name = shape["name"]
+            self.samples[name].append(elapsed)
+            self.statuses[name][str(status)] += 1
+            expected = shape.get("expect")
+            ok = status in expected if expected else isinstance(status, int) and 200 <= status < 300
+            self.errors[name] += not ok
+
+    async def replay(self, app, concurrency: int, total: int, warmup: int) -> float:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://replay", timeout=120) as client:
+            if warmup:
+                count = itertools.count()
+                await asyncio.gather(*(self._worker(client, count, warmup, False) for _ in range(concurrency)))
+            count = itertools.count()
+            start = time.perf_counter()
+            await asyncio.gather(*(self._worker(client, count, total, True) for _ in range(concurrency)))
+            return time.perf_counter() - start
+
+    def results(self, elapsed: float) -> Dict[str, Any]:
+        def summary(samples: List[float], errors: int) -> Dict[str, Any]:
+            return {
+                "requests": len(samples),
+                "errors": errors,
+                "rps": round(len(samples) / elapsed, 1),
+                "mean_ms": round(sum(samples) / len(samples) * 1000, 2),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+            }
+
+        endpoints = {
+            name: {**summary(samples, self.errors[name]), "statuses": dict(self.statuses[name])}
+            for name, samples in sorted(self.samples.items())
+        }
+        everything = [s for samples in self.samples.values() for s in samples]
+        return {"total": summary(everything, sum(self.errors.values())), "endpoints": endpoints}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args, url: str, population: Population, shapes) -> Dict[str, Any]:
+    from app.main import app
+    from app.utils import reports
+
+    await app.router.startup()
+    try:
+        # the report endpoints answer 503 until the first snapshot exists
+        await asyncio.to_thread(reports.refresh)
+        replayer = Replayer(shapes, population, args.seed)
+        elapsed = await replayer.replay(app, args.concurrency, args.requests, args.warmup)
+    finally:
+        await app.router.shutdown()
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "database": url.split(":", 1)[0],
+            "trace": os.path.relpath(args.trace, ROOT),
+            "patients": args.patients if not args.database else None,
+            "orgs": args.orgs if not args.database else None,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "seed": args.seed,
+            "elapsed_s": round(elapsed, 2),
+        },
+        **replayer.results(elapsed),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--trace", default=DEFAULT_TRACE)
+    parser.add_argument("--database", help="replay against this (datagen-generated) database instead of a fresh one")
+    parser.add_argument("--patients", type=int, default=10_000)
+    parser.add_argument("--orgs", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--warmup", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="app setting for this run, e.g. RESPONSE_CACHE_BACKEND=off (repeatable)")
+    parser.add_argument("--output", help="write the results here as JSON")
+    parser.add_argument("--baseline", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="slowdown that counts as a regression (0.15: 15%%)")
+    args = parser.parse_args()
+
+    shapes = load_trace(args.trace)
+    workdir = tempfile.mkdtemp(prefix="neudebri-replay-")
+    # app settings are read on import: everything below must be in the environment first
+    os.environ.update(REPORT_DIR=os.path.join(workdir, "reports"), JOB_EXPORT_DIR=os.path.join(workdir, "exports"),
+                      REPORT_REFRESH_SECONDS="0", SUMMARY_RECONCILE_SECONDS="0")
+    os.environ.update(item.split("=", 1) for item in args.env)
+    if args.database:
+        url = os.environ["DATABASE_URL"] = args.database
+    else:
+        from benchmarks.datagen import Scale, generate
+
+        url = temp_database_url("replay.db")
+        print(f"generating {args.patients} patients in {args.orgs} clinics ...")
+        generate(url, Scale(orgs=args.orgs, patients=args.patients), seed=args.seed)
+
+    population = Population(url)
+    results = asyncio.run(run(args, url, population, shapes))
+
+    print()
+    print_table([
+        {"endpoint": name, **{key: value for key, value in figures.items() if key != "statuses"}}
+        for name, figures in [*results["endpoints"].items(), ("TOTAL", results["total"])]
+    ])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nresults written to {args.output}")
+    if args.baseline:
+        from benchmarks.compare import compare, load
+
+        if compare(load(args.baseline), results, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
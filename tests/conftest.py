@@ -0,0 +1,84 @@
+import os
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+# A throwaway SQLite database, set before the app reads its settings.
+# Background work (job worker, periodic refreshes) is off so the only
+# statements a test sees are its own requests'.
+_tmp = tempfile.mkdtemp(prefix="neudebri-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{os.path.join(_tmp, 'test.db')}",
+    "REPORT_DIR": os.path.join(_tmp, "reports"),
+    "RESPONSE_CACHE_BACKEND": "off",
+    "JOB_WORKER_ENABLED": "false",
+    "REPORT_REFRESH_SECONDS": "0",
+    "SUMMARY_RECONCILE_SECONDS": "0",
+    "HASH_POOL_WORKERS": "0",
+    "RATE_LIMIT_USER": "10000/s:10000",
+})
+os.environ.pop("ASYNC_DATABASE_URL", None)
+
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlmodel import Session  # noqa: E402
+
+from app.main import app  # noqa: E402
+from app.utils.query_profile import capture_queries  # noqa: E402
+from app.utils.security import create_access_token  # noqa: E402
+
+@pytest.fixture(scope="session")
+def client():
+    """The app, started (schema created) and served in-process"""
+    with TestClient(app) as test_client:
+        yield test_client
+
+@pytest.fixture(scope="session")
+def clinic(client):
+    """One clinic with a nurse, a patient, a case and a visit; ids and the nurse's auth headers"""
+    from datetime import datetime
+
+    from app.database import engine
+    from app.models.cases import Case
+    from app.models.organization import Organization
+    from app.models.patients import Patient
+    from app.models.users import User
+    from app.models.visits import Visit
+    from app.utils.security import hash_password
+
+    with Session(engine) as session:
+        org = Organization(name="Test Clinic")
+        session.add(org)
+        session.flush()
+        nurse = User(username="nurse", email="nurse@example.co.ke", password=hash_password("test-pass"),
+                     full_name="Test Nurse", org_id=org.id)
+        patient = Patient(first_name="Amina", last_name="Otieno", phone="+254700000001", org_id=org.id)
+        session.add_all([nurse, patient])
+        session.flush()
+        case = Case(patient_id=patient.id, title="Wound care", org_id=org.id)
+        session.add(case)
+        session.flush()
+        visit = Visit(patient_id=patient.id, case_id=case.id, org_id=org.id, visit_date=datetime.utcnow())
+        session.add(visit)
+        session.commit()
+        ids = {"org_id": org.id, "user_id": nurse.id, "patient_id": patient.id, "case_id": case.id,
+               "visit_id": visit.id}
+    token = create_access_token({"sub": "nurse", "org_id": ids["org_id"]})
+    return {**ids, "headers": {"Authorization": f"Bearer {token}"}}
+
+@pytest.fixture
+def query_budget():
+    """Assert the block runs at most `n` SQL statements:
+
+        def test_list(client, query_budget):
+            with query_budget(2):
+                client.get("/api/patients/")
+    """
+    @contextmanager
+    def budget(max_queries: int):
+        with capture_queries() as log:
+            yield log
+        assert len(log) <= max_queries, (
+            f"expected at most {max_queries} queries, ran {len(log)}:\n{log.describe()}"
+        )
+    return budget
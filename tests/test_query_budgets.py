@@ -0,0 +1,38 @@
+# Statement budgets for the write endpoints the N+1 audit covered: a
+# change that adds a lookup per row, or a reload per request, fails here.
+
+def test_create_invoice(client, clinic, query_budget):
+    # patient and case lookups, insert, the two unpaid counters (total and
+    # the clinic's), refresh
+    with query_budget(6):
+        r = client.post("/api/invoices/billing/invoice", headers=clinic["headers"], json={
+            "patient_id": clinic["patient_id"], "case_id": clinic["case_id"], "amount": 1500.0,
+        })
+    assert r.status_code == 200, r.text
+    assert r.json()["org_id"] == clinic["org_id"]
+
+def test_record_vitals(client, clinic, query_budget):
+    # visit lookup, insert, change-log entry, refresh
+    with query_budget(4):
+        r = client.post(f"/api/visits/visits/{clinic['visit_id']}/vitals", headers=clinic["headers"], json={
+            "temperature": 36.8, "pulse": 78, "blood_pressure": "120/80",
+        })
+    assert r.status_code == 200, r.text
+    assert (r.json()["patient_id"], r.json()["systolic"]) == (clinic["patient_id"], 120)
+
+def test_log_activity(client, clinic, query_budget):
+    # visit lookup, insert, refresh
+    with query_budget(3):
+        r = client.post(f"/api/visits/visits/{clinic['visit_id']}/activity", headers=clinic["headers"], json={
+            "nurse_id": clinic["user_id"], "activity": "Cleaned and re-dressed wound",
+        })
+    assert r.status_code == 200, r.text
+
+def test_budget_reports_overrun(client, clinic, query_budget):
+    try:
+        with query_budget(0):
+            client.get(f"/api/patients/{clinic['patient_id']}", headers=clinic["headers"])
+    except AssertionError as e:
+        assert "expected at most 0 queries" in str(e)
+    else:
+        raise AssertionError("an overrun budget passed")
@@ -0,0 +1,39 @@
+import pytest
+
+from app.utils.search import _edit_distance
+
+NAMES = [("Amina", "Otieno"), ("Amani", "Wekesa"), ("Mohamed", "Amin"), ("Wanjiru", "Kariuki"),
+         ("Brian", "Kiplagat"), ("Achieng", "Odhiambo")]
+
+@pytest.fixture(scope="module")
+def patients(client, clinic):
+    ids = {}
+    for first, last in NAMES:
+        r = client.post("/api/patients/", headers=clinic["headers"], json={"first_name": first, "last_name": last})
+        assert r.status_code == 200, r.text
+        ids[f"{first} {last}"] = r.json()["id"]
+    return ids
+
+def search(client, clinic, q):
+    r = client.get("/api/patients/", headers=clinic["headers"], params={"q": q, "limit": 5})
+    assert r.status_code == 200, r.text
+    return [f"{p['first_name']} {p['last_name']}" for p in r.json()]
+
+@pytest.mark.parametrize("q, expected", [
+    ("Amina", "Amina Otieno"),
+    ("Amna", "Amina Otieno"),               # dropped letter, no trigram in common
+    ("Amona Otieno", "Amina Otieno"),        # substituted letter
+    ("Wanjiro Kariuky", "Wanjiru Kariuki"),
+    ("Kiplagt", "Brian Kiplagat"),
+    ("Odiambo", "Achieng Odhiambo"),
+])
+def test_typos_rank_the_patient_first(client, clinic, patients, q, expected):
+    assert search(client, clinic, q)[0] == expected
+
+def test_short_prefix(client, clinic, patients):
+    assert search(client, clinic, "Wa") == ["Wanjiru Kariuki"]
+
+def test_edit_distance():
+    assert _edit_distance("amna", "amina") == 1
+    assert _edit_distance("kariuky", "kariuki") == 1
+    assert _edit_distance("", "abc") == 3